@@ -1,131 +1,471 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, make_response, stream_with_context
 from flask_cors import CORS
-import mysql.connector
-from datetime import datetime, timedelta
-
-app = Flask(__name__)
-CORS(app)
-
-# @app.route('/')
-# def home():
-#     return 'Hello, Render!'
-# --- Database Connection ---
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="root",
-        database="CRMDB"
-    )
+from datetime import date, datetime, timedelta
+from itertools import chain
+import functools
+import os
+
+import bulk_import
+import compression
+import customers
+import db
+import followups
+import frames
+import group_commit
+import idempotency
+import instrumentation
+import inventory
+import kpi
+import profiling
+import reservations
+import sales_rollup
+import schema
+import table_stream
+import table_versions
+from db import pool_stats
+
+# Routes and hooks live on a blueprint; create_app() builds the app, so a
+# pre-forking server can import this module without opening anything
+bp = Blueprint('api', __name__)
+
+# --- Profiling ---
+# Registered first so the profile spans every other hook (teardowns run in reverse)
+@bp.before_app_request
+def begin_profile():
+    profiling.start(request.endpoint or 'api.unknown')
+
+@bp.teardown_app_request
+def end_profile(exc):
+    profiling.stop()
+
+# --- Query Instrumentation ---
+@bp.before_app_request
+def begin_query_scope():
+    instrumentation.begin(request.endpoint or 'api.unknown')
+
+@bp.after_app_request
+def add_server_timing(response):
+    scope = instrumentation.current()
+    if scope is not None:
+        # Streamed bodies query after this point; their time is in /metrics
+        response.headers['Server-Timing'] = (
+            f'db;dur={scope.db_seconds * 1000:.1f};desc="{scope.query_count} queries", '
+            f'pool;dur={scope.acquire_seconds * 1000:.1f}'
+        )
+    return response
+
+@bp.teardown_app_request
+def end_query_scope(exc):
+    instrumentation.end()
+
+# --- Read Routing ---
+@bp.before_app_request
+def bind_db_session():
+    # Clients send X-CRM-Session to read their own writes; otherwise keyed by address
+    db.bind_session(request.headers.get('X-CRM-Session') or request.remote_addr)
+
+# --- Schema Bootstrap ---
+@bp.before_app_request
+def ensure_database_schema():
+    # Migrates on the first request of each process; a cached no-op afterwards
+    schema.ensure_schema()
+
+# --- Response Compression ---
+@bp.after_app_request
+def compress_response(response):
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or not compression.compressible(response.mimetype)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = compression.negotiate(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compression.compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < compression.MIN_SIZE:
+            return response
+        response.set_data(compression.compress_bytes(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# --- Conditional GET ---
+def conditional(tables):
+    """Serve If-None-Match / If-Modified-Since from table_versions before the view runs
+
+    tables is a tuple of table names, or a function of the view's arguments
+    returning one. Unchanged polls get a 304 without reading the tables.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            names = tables(**kwargs) if callable(tables) else tables
+            try:
+                snapshot = table_versions.snapshot(names)
+            except Exception as e:
+                print("❌ Error:", e)
+                snapshot = None
+            if snapshot is None or not snapshot.settled:
+                # Changed moments ago (or untracked): no validators a client could go stale on
+                return view(*args, **kwargs)
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains_weak(snapshot.etag)
+            else:
+                fresh = bool(request.if_modified_since) and snapshot.last_modified <= request.if_modified_since
+            response = Response(status=304) if fresh else make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(snapshot.etag, weak=True)  # weak: the same rows are sent in several encodings
+                response.last_modified = snapshot.last_modified
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
 
 # --- Add Customer API ---
-@app.route('/add_customer', methods=['POST'])
+def _created_body(created) -> dict:
+    # round_trips is left out: it describes one attempt, not the stored outcome
+    return {
+        "status": "success",
+        "message": "Customer, follow-up and sales recorded" if created.vehicle_id else "Customer and follow-up recorded",
+        "customer_id": created.customer_id
+    }
+
+def _replay(stored, request_hash):
+    if stored.fingerprint != request_hash:
+        return jsonify({"status": "error", "message": "Idempotency-Key was already used for a different request"}), 422
+    response = jsonify(stored.body)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response, stored.status_code
+
+@bp.route('/add_customer', methods=['POST'])
 def add_customer():
     data = request.get_json()
+    key = request.headers.get('Idempotency-Key')
+    if key is None:
+        return _add_customer(data)
+
+    # Retries with the same key get the first successful outcome back instead of
+    # a second sale (or a 409 for the phone the first attempt already added)
+    try:
+        key = idempotency.check_key(key)
+        request_hash = idempotency.fingerprint(data)
+        stored = idempotency.lookup(key)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        print("❌ Error:", e)
+        return jsonify({"status": "error", "message": str(e)}), 500
+    if stored is not None:
+        return _replay(stored, request_hash)
+
+    outcome = {}
+    def store_outcome(cursor, created):
+        outcome['stored'] = idempotency.record(cursor, key, request_hash, 200, _created_body(created))
+
+    response, status = _add_customer(data, before_commit=store_outcome)
+    if status == 200:
+        idempotency.remember(key, outcome['stored'])
+        return response, status
+    # A concurrent attempt with this key may have committed first
+    try:
+        stored = idempotency.lookup(key)
+    except Exception as e:
+        print("❌ Error:", e)
+        stored = None
+    return _replay(stored, request_hash) if stored is not None else (response, status)
+
+def _add_customer(data, before_commit=None):
     name = data.get('name')
     email = data.get('email_id')
     phone = data.get('phone_number')
     vehicle_id = data.get('vehicle_id')
     payment_status = data.get('payment_status', 'Pending')
     sale_amount = data.get('sale_amount')
+    reservation = data.get('reservation')
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Validate phone
-        cursor.execute("SELECT customer_id FROM Customer WHERE phone_number = %s", (phone,))
-        if cursor.fetchone():
-            return jsonify({"status": "error", "message": "Phone number already exists"}), 409
-
-        # Vehicle logic
-        if vehicle_id:
-            cursor.execute("SELECT manufacturer, model, year, stock FROM Vehicle WHERE vehicle_id = %s", (vehicle_id,))
-            vehicle = cursor.fetchone()
-            if not vehicle:
-                return jsonify({"status": "error", "message": "Vehicle not found"}), 404
-
-            manufacturer, model, year, stock = vehicle
-            if stock <= 0:
-                return jsonify({"status": "error", "message": "Vehicle is out of stock"}), 400
-
-            model_purchased = f"{manufacturer} {model} ({year})"
-
-            # Decrease stock
-            cursor.execute("UPDATE Vehicle SET stock = stock - 1 WHERE vehicle_id = %s AND stock > 0", (vehicle_id,))
-
-            # Update status if total stock of that model-year is zero
-            cursor.execute("""
-                UPDATE Vehicle v
-                JOIN (
-                    SELECT manufacturer, model, year
-                    FROM Vehicle
-                    GROUP BY manufacturer, model, year
-                    HAVING SUM(stock) <= 0
-                ) AS depleted
-                ON v.manufacturer = depleted.manufacturer AND v.model = depleted.model AND v.year = depleted.year
-                SET v.status = 'Sold'
-            """)
-        else:
-            model_purchased = None
-
-        # Insert Customer
-        if vehicle_id:
-            cursor.execute("""
-                INSERT INTO Customer (name, email_id, phone_number, vehicle_id, model_purchased, created_at)
-                VALUES (%s, %s, %s, %s, %s, NOW())
-            """, (name.strip(), email.strip(), phone.strip(), vehicle_id, model_purchased))
+        if group_commit.ENABLED and not vehicle_id:
+            # Lead-only: committed together with other leads arriving within a few ms
+            created = group_commit.create_lead(name, email, phone, before_commit=before_commit)
         else:
-            cursor.execute("""
-                INSERT INTO Customer (name, email_id, phone_number, created_at)
-                VALUES (%s, %s, %s, NOW())
-            """, (name.strip(), email.strip(), phone.strip()))
+            created = customers.create_customer(
+                name, email, phone, vehicle_id,
+                payment_status=payment_status,
+                sale_amount=sale_amount,
+                reservation=reservation,
+                before_commit=before_commit
+            )
+        print("✅ Customer inserted with ID:", created.customer_id)
+        return jsonify({**_created_body(created), "round_trips": created.round_trips}), 200
 
-        customer_id = cursor.lastrowid
-        print("✅ Customer inserted with ID:", customer_id)
+    except customers.DuplicatePhoneError:
+        return jsonify({"status": "error", "message": "Phone number already exists"}), 409
+    except customers.VehicleNotFoundError:
+        return jsonify({"status": "error", "message": "Vehicle not found"}), 404
+    except customers.ReservationError as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    except customers.ValidationError as e:
+        return jsonify({"status": "error", "message": str(e), "errors": e.errors}), 400
+    except inventory.StockConflictError as e:
+        return jsonify({"status": "error", "message": f"{e}; please retry"}), 409
+    except idempotency.KeyInUseError as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    except Exception as e:
+        print("❌ Error:", e)
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        # Insert Follow-Up
-        follow_up_reason = "Post-sale vehicle service follow-up" if vehicle_id else "Initial lead follow-up"
-        follow_up_days = 30 if vehicle_id else 3
-        cursor.execute("""
-            INSERT INTO Follow_ups (customer_id, follow_up_date, reason, completed)
-            VALUES (%s, NOW() + INTERVAL %s DAY, %s, FALSE)
-        """, (customer_id, follow_up_days, follow_up_reason))
+# --- Vehicle Reservation API ---
+@bp.route('/vehicles/<int:vehicle_id>/reservations', methods=['POST'])
+def reserve_vehicle(vehicle_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        ttl_seconds = int(data.get('ttl_seconds', reservations.RESERVATION_TTL_SECONDS))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "'ttl_seconds' must be an integer"}), 400
 
-        # Insert into Sales
-        cursor.execute("""INSERT INTO Sales (customer_id, vehicle_id, sale_date, payment_status, sale_amount)
-                       VALUES (%s, %s, NOW(), %s, %s""", (customer_id, vehicle_id, payment_status, sale_amount))
+    try:
+        held = reservations.reserve(vehicle_id, ttl_seconds)
+    except customers.VehicleNotFoundError:
+        return jsonify({"status": "error", "message": "Vehicle not found"}), 404
+    except (customers.OutOfStockError, inventory.StockConflictError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    except Exception as e:
+        print("❌ Error:", e)
+        return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({
+        "status": "success",
+        "reservation": held.token,
+        "vehicle_id": held.vehicle_id,
+        "expires_at": held.expires_at.isoformat()
+    }), 201
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+# --- Vehicle Customers API ---
+@bp.route('/vehicles/<int:vehicle_id>/customers', methods=['GET'])
+@conditional(('Customer',))
+def vehicle_customers(vehicle_id):
+    try:
+        page_size = int(request.args.get('limit', 25))
+        token = request.args.get('cursor')
+        before = table_stream.decode_cursor(token, with_created=False)[0] if token else None
+    except (ValueError, table_stream.StreamRequestError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-        return jsonify({"status": "success", "message": "Customer, follow-up and sales recorded"}), 200
+    try:
+        page = customers.fetch_vehicle_customers(vehicle_id, page_size, before)
+        return jsonify({
+            "vehicle_id": page.vehicle_id,
+            "next_cursor": table_stream.encode_cursor((page.next_key,)) if page.next_key else None,
+            "results": [dict(zip(page.columns, row)) for row in page.rows]
+        }), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
+@bp.route('/reservations/<token>', methods=['DELETE'])
+def release_reservation(token):
+    try:
+        if not reservations.release(token):
+            return jsonify({"status": "error", "message": "Reservation not found"}), 404
     except Exception as e:
         print("❌ Error:", e)
         return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"status": "success"}), 200
+
+# --- Bulk Customer Import API ---
+@bp.route('/customers/bulk', methods=['POST'])
+def bulk_add_customers():
+    try:
+        reader = bulk_import.reader_for(request.content_type)
+    except bulk_import.ImportFormatError as e:
+        return jsonify({"status": "error", "message": str(e)}), 415
+    try:
+        chunk_size = int(request.args.get('chunk_size', bulk_import.DEFAULT_CHUNK_SIZE))
+        max_errors = int(request.args.get('max_errors', bulk_import.DEFAULT_MAX_ERRORS))
+    except ValueError:
+        return jsonify({"status": "error", "message": "'chunk_size' and 'max_errors' must be integers"}), 400
+
+    try:
+        # request.stream is read incrementally; the body is never buffered whole
+        report = bulk_import.import_customers(reader(request.stream), chunk_size, max_errors)
+        return jsonify({"status": "success", **report.to_dict()}), 200
+    except UnicodeDecodeError as e:
+        return jsonify({"status": "error", "message": f"Upload must be UTF-8: {e}"}), 400
+    except Exception as e:
+        print("❌ Error:", e)
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# --- Streaming Helpers ---
+def _streamed(chunks, mimetype: str) -> Response:
+    # Pull the first chunk eagerly so connection and query errors still
+    # surface as a 500 instead of a truncated 200 body
+    try:
+        first = next(chunks)
+    except StopIteration:
+        return Response("", mimetype=mimetype)
+    return Response(stream_with_context(chain([first], chunks)), mimetype=mimetype)
 
 # --- View All Tables API (for frontend debugging) ---
-@app.route('/', methods=['GET'])
+@bp.route('/', methods=['GET'])
+@conditional(('Customer', 'Vehicle', 'Follow_ups', 'Sales'))
 def view_all_tables():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
         tables = ['Customer', 'Vehicle', 'Follow_ups', 'Sales']
-        data = {}
+        return _streamed(table_stream.stream_tables_json(tables, current_app.json.dumps), 'application/json')
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# --- Streaming Table Export API ---
+@bp.route('/tables/<table>', methods=['GET'])
+@conditional(lambda table: (table,))
+def stream_table(table):
+    columns = request.args.get('columns')
+    try:
+        limit = request.args.get('limit', type=int)
+        query = table_stream.build_query(
+            table,
+            columns=[c.strip() for c in columns.split(',') if c.strip()] if columns else None,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            since=request.args.get('since')
+        )
+    except table_stream.StreamRequestError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if request.args.get('format') == 'arrow':
+        # Typed columns in Arrow IPC batches; whole tables only, use since for increments
+        if query.limit or query.after:
+            return jsonify({"status": "error", "message": "format=arrow does not take limit or cursor"}), 400
+        if frames.pa is None:
+            return jsonify({"status": "error", "message": "Arrow exports need pyarrow installed"}), 501
+        try:
+            return _streamed(table_stream.stream_arrow(query), 'application/vnd.apache.arrow.stream')
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 500
+
+    try:
+        return _streamed(table_stream.stream_ndjson(query, current_app.json.dumps), 'application/x-ndjson')
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# --- Customer Search API ---
+@bp.route('/customers/search', methods=['GET'])
+@conditional(('Customer', 'Vehicle'))
+def search_customers():
+    term = request.args.get('q', '').strip()
+    if not term:
+        return jsonify({"status": "error", "message": "Query parameter 'q' is required"}), 400
+    try:
+        page_size = int(request.args.get('limit', 50))
+        page_number = int(request.args.get('page', 1))
+    except ValueError:
+        return jsonify({"status": "error", "message": "'limit' and 'page' must be integers"}), 400
+
+    try:
+        page = customers.search_customers(term, page_size, page_number)
+        return jsonify({
+            "page": page.page,
+            "has_next": page.has_next,
+            "results": [dict(zip(page.columns, row)) for row in page.rows]
+        }), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        for table in tables:
-            cursor.execute(f"SELECT * FROM {table}")
-            data[table] = cursor.fetchall()
+# --- Follow-up Work Queue API ---
+@bp.route('/follow_ups/queue', methods=['GET'])
+def follow_up_queue():
+    bucket = request.args.get('bucket', 'overdue')
+    if bucket not in followups.BUCKETS:
+        return jsonify({"status": "error", "message": f"bucket must be one of {', '.join(followups.BUCKETS)}"}), 400
+    try:
+        page_size = int(request.args.get('limit', 50))
+        token = request.args.get('cursor')
+        after = table_stream.decode_cursor(token, with_created=True) if token else None
+    except (ValueError, table_stream.StreamRequestError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-        cursor.close()
-        conn.close()
-        return jsonify(data), 200
+    try:
+        page = followups.fetch_queue(bucket, page_size, after)
+        return jsonify({
+            "bucket": page.bucket,
+            "next_cursor": table_stream.encode_cursor(page.next_key) if page.next_key else None,
+            "results": [dict(zip(page.columns, row)) for row in page.rows]
+        }), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
+@bp.route('/follow_ups/complete', methods=['POST'])
+def complete_follow_ups():
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"status": "error", "message": "'ids' must be a non-empty list"}), 400
+    try:
+        changed = followups.mark_completed(ids)
+    except (ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
+        print("❌ Error:", e)
         return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"status": "success", "completed": changed}), 200
+
+# --- Dashboard KPI API ---
+@bp.route('/metrics/summary', methods=['GET'])
+def metrics_summary():
+    try:
+        return jsonify(kpi.read_summary()), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# --- Sales Trend API ---
+@bp.route('/sales/trend', methods=['GET'])
+def sales_trend():
+    try:
+        granularity = request.args.get('granularity', 'day')
+        start = request.args.get('from')
+        end = request.args.get('to')
+        vehicle_id = request.args.get('vehicle_id')
+        series = sales_rollup.sales_trend(
+            granularity,
+            date.fromisoformat(start) if start else None,
+            date.fromisoformat(end) if end else None,
+            manufacturer=request.args.get('manufacturer') or None,
+            vehicle_id=int(vehicle_id) if vehicle_id else None
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        print("❌ Error:", e)
+        return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({
+        "granularity": granularity,
+        "series": [
+            {"period": point.period.isoformat(), "sales_count": point.sales_count, "revenue": float(point.revenue)}
+            for point in series
+        ]
+    }), 200
+
+# --- Prometheus Metrics ---
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    gauges = {f"crm_pool_{name}": value for name, value in pool_stats().items()}
+    return Response(instrumentation.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
+
+# --- Connection Pool Statistics ---
+@bp.route('/pool/stats', methods=['GET'])
+def view_pool_stats():
+    return jsonify({**pool_stats(), "replicas": db.replica_stats(), "group_commit": group_commit.stats()}), 200
+
+# --- App Factory ---
+def create_app() -> Flask:
+    """Build the API app; gunicorn calls this in each worker (see gunicorn.conf.py)"""
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(bp)
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=False)
+    # Development server only: one process, debug off. Serve production with gunicorn.
+    create_app().run(port=int(os.getenv('PORT', 5000)), debug=False)
@@ -0,0 +1,184 @@
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import cache
+import customers
+import db
+import inventory
+import kpi
+import sales_rollup
+import schema
+import table_versions
+from benchmarks.stats import latency_summary
+
+logger = logging.getLogger(__name__)
+
+# --- Hot Vehicle Contention Benchmark ---
+# Creates a throwaway vehicle with a known stock, lets many threads buy it
+# through customers.create_customer until it runs out, then checks the
+# database for oversells and removes everything it created.
+BENCH_MANUFACTURER = "Benchmark"
+BENCH_PRICE = Decimal("1000000.00")
+
+
+def _create_vehicle(stock: int, model: str) -> int:
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO Vehicle (manufacturer, model, year, price, stock, status) "
+            "VALUES (%s, %s, %s, %s, %s, 'Available')",
+            (BENCH_MANUFACTURER, model, 2099, BENCH_PRICE, stock)
+        )
+        vehicle_id = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO Vehicle_stock (manufacturer, model, year, total_stock) VALUES (%s, %s, %s, %s)",
+            (BENCH_MANUFACTURER, model, 2099, stock)
+        )
+        kpi.record(cursor, vehicles_total=1, vehicles_available=1, vehicle_price_sum=BENCH_PRICE)
+        table_versions.bump(cursor, "Vehicle")
+        conn.commit()
+        cursor.close()
+    cache.invalidate("Vehicle")
+    return vehicle_id
+
+
+def _verify(vehicle_id: int, model: str, initial_stock: int) -> Dict[str, Any]:
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT stock, reserved, status FROM Vehicle WHERE vehicle_id = %s", (vehicle_id,))
+        stock, reserved, status = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM Sales WHERE vehicle_id = %s", (vehicle_id,))
+        sales = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT total_stock FROM Vehicle_stock WHERE manufacturer = %s AND model = %s AND year = %s",
+            (BENCH_MANUFACTURER, model, 2099)
+        )
+        group_stock = cursor.fetchone()[0]
+        cursor.close()
+    return {
+        "final_stock": stock,
+        "final_reserved": reserved,
+        "final_status": status,
+        "group_stock": group_stock,
+        "sales_rows": sales,
+        "oversold": max(sales - initial_stock, 0) + max(-stock, 0),
+        "consistent": stock == initial_stock - sales and group_stock == stock and stock >= 0,
+    }
+
+
+def _cleanup(vehicle_id: int, model: str, phone_prefix: str):
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        # Follow-ups and sales go with their customers (ON DELETE CASCADE)
+        cursor.execute("DELETE FROM Customer WHERE phone_number LIKE %s", (phone_prefix + "%",))
+        cursor.execute("DELETE FROM Vehicle WHERE vehicle_id = %s", (vehicle_id,))
+        cursor.execute(
+            "DELETE FROM Vehicle_stock WHERE manufacturer = %s AND model = %s AND year = %s",
+            (BENCH_MANUFACTURER, model, 2099)
+        )
+        kpi.rebuild_summary(cursor)
+        sales_rollup.rebuild(cursor, date.today() - timedelta(days=1))  # runs may cross midnight
+        table_versions.bump(cursor, *table_versions.TRACKED_TABLES)
+        conn.commit()
+        cursor.close()
+    cache.invalidate("Customer", "Vehicle", "Sales", "Follow_ups")
+
+
+def run(threads: int, stock: int, keep: bool = False) -> Dict[str, Any]:
+    """Sell stock units of one vehicle from threads workers and report the outcome"""
+    schema.ensure_schema()
+    run_id = f"{random.randrange(10 ** 5):05d}"
+    model = f"Contention-{run_id}"
+    phone_prefix = "77" + run_id
+    vehicle_id = _create_vehicle(stock, model)
+
+    lock = threading.Lock()
+    counter = iter(range(10 ** 6))
+    latencies: List[float] = []
+    retries: List[int] = []
+    conflicts = 0
+    errors = 0
+
+    def worker():
+        nonlocal conflicts, errors
+        while True:
+            with lock:
+                phone = f"{phone_prefix}{next(counter):06d}"
+            started = time.perf_counter()
+            try:
+                created = customers.create_customer(
+                    f"Bench {phone}", f"{phone}@bench.invalid", phone, vehicle_id
+                )
+            except customers.OutOfStockError:
+                return
+            except inventory.StockConflictError:
+                with lock:
+                    conflicts += 1
+                continue
+            except Exception as e:
+                logger.error(f"Benchmark sale failed: {e}")
+                with lock:
+                    errors += 1
+                    if errors > stock:
+                        return
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                retries.append(created.stock_retries)
+
+    workers = [threading.Thread(target=worker, name=f"bench-{i}") for i in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    report: Dict[str, Any] = {
+        "threads": threads,
+        "initial_stock": stock,
+        "sales": len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "sales_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "cas_retries_total": sum(retries),
+        "cas_retries_max": max(retries, default=0),
+        "gave_up_conflicts": conflicts,
+        "errors": errors,
+    }
+    if latencies:
+        report["latency_ms"] = latency_summary(latencies)
+    report.update(_verify(vehicle_id, model, stock))
+    report["pool"] = db.pool_stats()
+
+    if not keep:
+        _cleanup(vehicle_id, model, phone_prefix)
+    return report
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Sell one hot vehicle from many threads and prove it is never oversold. "
+                    "Size the pool (CRM_DB_POOL_SIZE + CRM_DB_POOL_OVERFLOW) to at least --threads."
+    )
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="leave the benchmark rows in place")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args.threads, args.stock, args.keep)
+    print(json.dumps(report, indent=2, default=str))
+    if report["oversold"] or not report["consistent"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import cache
+import db
+import inventory
+import kpi
+import sales_rollup
+import schema
+import table_versions
+
+logger = logging.getLogger(__name__)
+
+# --- Synthetic CRM Data ---
+# Appends a realistic-shaped dataset with explicit ids so related rows can be
+# generated without reading anything back. Rows go in through multi-row
+# INSERTs (mysql-connector rewrites executemany into one statement per batch)
+# with unique and foreign key checks off for the loading session, then the
+# derived tables are rebuilt and statistics refreshed.
+BATCH_SIZE = 5000
+PHONE_PREFIX = "6"  # generated phones are 13 digits: PHONE_PREFIX + 12-digit customer id
+
+MANUFACTURERS = {
+    "Tata": ["Nexon", "Altroz", "Tiago", "Harrier", "Safari", "Punch"],
+    "Toyota": ["Glanza", "Urban Cruiser Taisor", "Innova", "Fortuner", "Vellfire"],
+    "Hyundai": ["Creta", "Venue", "i20", "Verna", "Tucson"],
+    "Mahindra": ["XUV700", "Thar", "Scorpio", "XUV300", "Bolero"],
+    "Kia": ["Seltos", "Sonet", "Carens", "EV6", "EV9"],
+    "Maruti": ["Swift", "Baleno", "Brezza", "Dzire", "Ertiga", "Grand Vitara"],
+    "Honda": ["City", "Amaze", "Elevate"],
+    "Renault": ["Triber", "Kiger", "Kwid"],
+    "Nissan": ["Magnite", "X-Trail"],
+}
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Vihaan", "Arjun", "Sai", "Reyansh", "Krishna", "Ishaan", "Rohan",
+               "Ananya", "Diya", "Saanvi", "Aadhya", "Myra", "Ira", "Meera", "Kavya", "Riya", "Tara"]
+LAST_NAMES = ["Sharma", "Verma", "Patel", "Iyer", "Reddy", "Nair", "Khan", "Singh", "Gupta", "Das",
+              "Joshi", "Mehta", "Rao", "Kulkarni", "Banerjee", "Chopra", "Malhotra", "Pillai", "Sethi", "Bose"]
+FOLLOW_UP_REASONS = ["Initial lead follow-up", "Test drive scheduling", "Finance options discussion",
+                     "Post-sale vehicle service follow-up", "Insurance renewal reminder", "Trade-in valuation"]
+PAYMENT_STATUSES = ["Completed", "Completed", "Completed", "Partial", "Pending"]
+
+
+def _next_id(cursor, table: str, key: str) -> int:
+    cursor.execute(f"SELECT COALESCE(MAX({key}), 0) + 1 FROM {table}")
+    return int(cursor.fetchone()[0])
+
+
+def _load(conn, cursor, sql: str, rows: Iterator[tuple], label: str) -> int:
+    started = time.perf_counter()
+    batch: List[tuple] = []
+    loaded = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            loaded += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        loaded += len(batch)
+    elapsed = time.perf_counter() - started
+    logger.info(f"{label}: {loaded} rows in {elapsed:.1f}s ({loaded / elapsed if elapsed else 0:.0f} rows/s)")
+    return loaded
+
+
+def _random_time(rng: random.Random, start: datetime, end: datetime) -> datetime:
+    return start + timedelta(seconds=rng.randrange(int((end - start).total_seconds())))
+
+
+def generate(customers: int, vehicles: int, follow_ups: int, sales: int, seed: int = 42,
+             years: int = 3) -> None:
+    """Append the requested row counts to every CRM table"""
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    history_start = now - timedelta(days=365 * years)
+
+    schema.ensure_schema()
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+        try:
+            first_vehicle = _next_id(cursor, "Vehicle", "vehicle_id")
+            first_customer = _next_id(cursor, "Customer", "customer_id")
+            conn.commit()
+
+            # Vehicles: name and price are kept for buyers and sale amounts below
+            catalogue: List[Tuple[str, Decimal]] = []
+
+            def vehicle_rows():
+                models = [(m, model) for m, names in MANUFACTURERS.items() for model in names]
+                for i in range(vehicles):
+                    manufacturer, model = rng.choice(models)
+                    year = rng.randrange(2015, now.year + 1)
+                    price = Decimal(rng.randrange(500_000, 6_000_000, 1000))
+                    catalogue.append((f"{manufacturer} {model} ({year})", price))
+                    stock = rng.choice([0, 1, 2, 3, 5, 8, 10])
+                    yield (first_vehicle + i, manufacturer, model, year, price,
+                           stock, "Available" if stock > 0 else "Sold",
+                           _random_time(rng, history_start, now))
+
+            _load(conn, cursor, """
+                INSERT INTO Vehicle (vehicle_id, manufacturer, model, year, price, stock, status, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, vehicle_rows(), "Vehicle")
+
+            # Customers: a buyer gets a vehicle_id and at least one sale
+            buyers: List[Tuple[int, int, datetime]] = []
+
+            def customer_rows():
+                buyer_ratio = min(1.0, sales / customers) if customers else 0
+                for i in range(customers):
+                    customer_id = first_customer + i
+                    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                    phone = f"{PHONE_PREFIX}{customer_id:012d}"
+                    created_at = _random_time(rng, history_start, now)
+                    vehicle_id = None
+                    model_purchased = None
+                    if vehicles and rng.random() < buyer_ratio:
+                        vehicle_id = first_vehicle + rng.randrange(vehicles)
+                        buyers.append((customer_id, vehicle_id, created_at))
+                        model_purchased = catalogue[vehicle_id - first_vehicle][0]
+                    email = f"{name.split()[0].lower()}.{customer_id}@example.com"
+                    yield customer_id, name, email, phone, vehicle_id, model_purchased, created_at
+
+            _load(conn, cursor, """
+                INSERT INTO Customer (customer_id, name, email_id, phone_number, vehicle_id, model_purchased,
+                                      created_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, customer_rows(), "Customer")
+
+            def follow_up_rows():
+                for _ in range(follow_ups):
+                    customer_id = first_customer + rng.randrange(customers)
+                    due = _random_time(rng, history_start, now + timedelta(days=60))
+                    completed = due < now and rng.random() < 0.9
+                    yield (customer_id, due, rng.choice(FOLLOW_UP_REASONS), completed,
+                           min(due, now) - timedelta(days=rng.randrange(1, 30)))
+
+            if customers:
+                _load(conn, cursor, """
+                    INSERT INTO Follow_ups (customer_id, follow_up_date, reason, completed, created_at)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, follow_up_rows(), "Follow_ups")
+
+            def sale_rows():
+                for i in range(sales):
+                    customer_id, vehicle_id, bought_at = buyers[i % len(buyers)]
+                    sold_at = min(bought_at + timedelta(days=rng.randrange(0, 14)), now)
+                    yield (customer_id, vehicle_id, sold_at.date(), rng.choice(PAYMENT_STATUSES),
+                           catalogue[vehicle_id - first_vehicle][1], sold_at)
+
+            if buyers:
+                _load(conn, cursor, """
+                    INSERT INTO Sales (customer_id, vehicle_id, sale_date, payment_status, sale_amount, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, sale_rows(), "Sales")
+        finally:
+            cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+
+        logger.info("Rebuilding derived tables")
+        inventory.rebuild_stock_totals(cursor)
+        inventory.rebuild_customer_counts(cursor)
+        kpi.rebuild_summary(cursor)
+        sales_rollup.rebuild(cursor)
+        table_versions.bump(cursor, *table_versions.TRACKED_TABLES)
+        conn.commit()
+        for table in ("Customer", "Vehicle", "Follow_ups", "Sales", "Vehicle_stock",
+                      "Sales_daily_vehicle", "Sales_daily_manufacturer"):
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+        cursor.close()
+
+    cache.clear()
+
+
+def _scaled(values: Sequence[int], scale: float) -> List[int]:
+    return [max(0, int(v * scale)) for v in values]
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Append a synthetic dataset to the CRM database")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--vehicles", type=int, default=20_000)
+    parser.add_argument("--follow-ups", type=int, default=3_000_000)
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every row count, e.g. 0.01 for a smoke run")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    customers, vehicles, follow_ups, sales = _scaled(
+        (args.customers, args.vehicles, args.follow_ups, args.sales), args.scale
+    )
+    generate(customers, vehicles, follow_ups, sales, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import customers
+import db
+import followups
+import frames
+import queries
+import schema
+import table_stream
+
+logger = logging.getLogger(__name__)
+
+# --- DataFrame Memory Benchmark ---
+# Loads what one dashboard session renders, once as pd.read_sql-style object
+# rows and once through frames, and compares deep memory usage and load time.
+EXPORT_ROWS = 50000
+
+
+def _workload() -> List[Tuple[str, str, Tuple[Any, ...]]]:
+    work = [
+        ("vehicle_inventory", queries.VEHICLE_INVENTORY_SQL, ()),
+        ("customer_first_page", customers.CUSTOMER_FIRST_PAGE_SQL, (100,)),
+        ("follow_up_queue_overdue", followups.QUEUE_SQL.format(bucket=followups.BUCKETS["overdue"], after=""), (100,)),
+    ]
+    for quick in queries.QUICK_QUERIES.values():
+        work.append((f"quick: {quick.name}", quick.sql, quick.params))
+    for table in table_stream.STREAMABLE_TABLES:
+        sql, params = table_stream._sql(table_stream.build_query(table, limit=EXPORT_ROWS))
+        work.append((f"export: {table}", sql, tuple(params)))
+    return work
+
+
+def _object_frame(conn, sql: str, params: Tuple[Any, ...]) -> pd.DataFrame:
+    # What pd.read_sql does with a DB-API connection: every row at once, no coercion
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    names = [d[0] for d in cursor.description]
+    rows = cursor.fetchall()
+    cursor.close()
+    return pd.DataFrame.from_records(rows, columns=names)
+
+
+def measure(name: str, sql: str, params: Tuple[Any, ...]) -> Dict[str, Any]:
+    with db.get_connection() as conn:
+        started = time.perf_counter()
+        plain = _object_frame(conn, sql, params)
+        plain_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        typed = frames.read_frame(conn, sql, params)
+        typed_seconds = time.perf_counter() - started
+
+    plain_bytes, typed_bytes = frames.memory_bytes(plain), frames.memory_bytes(typed)
+    return {
+        "name": name,
+        "rows": len(typed),
+        "object_bytes": plain_bytes,
+        "typed_bytes": typed_bytes,
+        "ratio": round(plain_bytes / typed_bytes, 2) if typed_bytes else None,
+        "object_ms": round(plain_seconds * 1000, 1),
+        "typed_ms": round(typed_seconds * 1000, 1),
+        "dtypes": {column: str(dtype) for column, dtype in typed.dtypes.items()},
+    }
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="DataFrame memory per dashboard query, object rows vs typed frames")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "frame_memory.json"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    schema.ensure_schema()
+    results = [measure(*work) for work in _workload()]
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    print(f"{'query':<36}{'rows':>8}{'object MiB':>12}{'typed MiB':>11}{'ratio':>8}")
+    for result in results:
+        print(f"{result['name']:<36}{result['rows']:>8}{result['object_bytes'] / 2**20:>12.2f}"
+              f"{result['typed_bytes'] / 2**20:>11.2f}{result['ratio'] or 0:>7.1f}x")
+    total_object = sum(r["object_bytes"] for r in results)
+    total_typed = sum(r["typed_bytes"] for r in results)
+    print(f"{'total':<44}{total_object / 2**20:>12.2f}{total_typed / 2**20:>11.2f}"
+          f"{total_object / total_typed if total_typed else 0:>7.1f}x")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import cache
+import customers
+import db
+import group_commit
+import kpi
+import schema
+import table_versions
+from benchmarks.stats import latency_summary
+
+logger = logging.getLogger(__name__)
+
+# --- Group Commit Benchmark ---
+# Creates lead-only customers from many threads, once with a transaction per
+# lead (create_customer) and once through a GroupCommitWriter, and compares
+# throughput and per-lead latency. Leads use a run-specific phone prefix and
+# are deleted afterwards. Size the pool to at least --threads.
+PHONE_PREFIX = "66"
+MODES = ("per_request", "group_commit")
+
+
+def _drive(create: Callable[[str], customers.CreatedCustomer], threads: int, leads: int,
+           phone_prefix: str) -> Dict[str, Any]:
+    lock = threading.Lock()
+    counter = iter(range(leads))
+    latencies: List[float] = []
+    errors = 0
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            phone = f"{phone_prefix}{n:07d}"
+            started = time.perf_counter()
+            try:
+                create(phone)
+            except Exception as e:
+                logger.error(f"Benchmark lead failed: {e}")
+                with lock:
+                    errors += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=worker, name=f"bench-{i}") for i in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "leads": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "leads_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def _cleanup(phone_prefix: str):
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        # Follow-ups go with their customers (ON DELETE CASCADE)
+        cursor.execute("DELETE FROM Customer WHERE phone_number LIKE %s", (phone_prefix + "%",))
+        kpi.rebuild_summary(cursor)
+        table_versions.bump(cursor, "Customer", "Follow_ups")
+        conn.commit()
+        cursor.close()
+    cache.invalidate("Customer", "Follow_ups")
+
+
+def run(threads: int, leads: int, max_batch: int, max_wait_ms: float, keep: bool = False) -> Dict[str, Any]:
+    """Create leads from threads workers per request and with group commit"""
+    schema.ensure_schema()
+    run_id = f"{random.randrange(10 ** 3):03d}"
+    report: Dict[str, Any] = {"threads": threads, "max_batch": max_batch, "max_wait_ms": max_wait_ms}
+
+    def per_request(phone: str) -> customers.CreatedCustomer:
+        return customers.create_customer(f"Bench {phone}", f"{phone}@bench.invalid", phone)
+
+    writer = group_commit.GroupCommitWriter(max_batch, max_wait_ms)
+
+    def batched(phone: str) -> customers.CreatedCustomer:
+        return writer.submit(f"Bench {phone}", f"{phone}@bench.invalid", phone)
+
+    try:
+        for i, (mode, create) in enumerate(zip(MODES, (per_request, batched))):
+            prefix = f"{PHONE_PREFIX}{run_id}{i}"
+            report[mode] = _drive(create, threads, leads, prefix)
+            if not keep:
+                _cleanup(prefix)
+    finally:
+        writer.close()
+
+    report["group_commit"]["batching"] = writer.stats()
+    baseline = report["per_request"]["leads_per_second"]
+    if baseline:
+        report["speedup"] = round((report["group_commit"]["leads_per_second"] or 0) / baseline, 2)
+    report["pool"] = db.pool_stats()
+    return report
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Lead creation throughput, one transaction per lead vs group commit")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--leads", type=int, default=2000, help="leads per mode")
+    parser.add_argument("--max-batch", type=int, default=group_commit.MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=group_commit.MAX_WAIT_MS)
+    parser.add_argument("--keep", action="store_true", help="leave the benchmark rows in place")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "group_commit.json"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(args.threads, args.leads, args.max_batch, args.max_wait_ms, args.keep)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(json.dumps(report, indent=2))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from benchmarks.stats import latency_summary
+
+logger = logging.getLogger(__name__)
+
+# --- HTTP Load Benchmark ---
+# Boots the API in-process (or targets --url), seeds leads through the bulk
+# import path, then drives a weighted mix of writes and reads from a thread or
+# process pool. Per-route throughput and latency go to a JSON file with
+# sorted keys so two runs can be compared with a plain diff.
+DEFAULT_MIX = "add_customer=40,add_sale=5,search=20,table_page=15,follow_up_queue=10,metrics=9,view_all=1"
+PHONE_PREFIX = "78"  # every phone is PHONE_PREFIX + run id + worker + counter (15 digits)
+SEED_WORKER = 99
+
+Sample = Tuple[str, float, int]  # (route, seconds, HTTP status or 0 for a transport error)
+
+
+class Traffic:
+    """Builds one request per route against a base URL"""
+
+    def __init__(self, base_url: str, run_id: str, vehicle_ids: List[int], search_terms: List[str],
+                 worker: int = 0):
+        self.base_url = base_url.rstrip("/")
+        self.run_id = run_id
+        self.vehicle_ids = vehicle_ids
+        self.search_terms = search_terms
+        self.worker = worker  # keeps phones unique across processes
+        self._counter = iter(range(10 ** 7))
+        self._lock = threading.Lock()
+
+    def _phone(self) -> str:
+        with self._lock:
+            return f"{PHONE_PREFIX}{self.run_id}{self.worker:02d}{next(self._counter):07d}"
+
+    def _customer(self, **extra) -> Dict[str, Any]:
+        phone = self._phone()
+        return {"name": f"Load {phone}", "email_id": f"{phone}@load.invalid", "phone_number": phone, **extra}
+
+    def add_customer(self, session):
+        return session.post(f"{self.base_url}/add_customer", json=self._customer())
+
+    def add_sale(self, session):
+        if not self.vehicle_ids:
+            return self.add_customer(session)
+        return session.post(f"{self.base_url}/add_customer",
+                            json=self._customer(vehicle_id=random.choice(self.vehicle_ids)))
+
+    def search(self, session):
+        return session.get(f"{self.base_url}/customers/search", params={"q": random.choice(self.search_terms)})
+
+    def table_page(self, session):
+        return session.get(f"{self.base_url}/tables/Customer", params={"limit": 100})
+
+    def follow_up_queue(self, session):
+        bucket = random.choice(("overdue", "due_today", "upcoming"))
+        return session.get(f"{self.base_url}/follow_ups/queue", params={"bucket": bucket})
+
+    def metrics(self, session):
+        return session.get(f"{self.base_url}/metrics/summary")
+
+    def view_all(self, session):
+        response = session.get(f"{self.base_url}/", stream=True)
+        for _ in response.iter_content(chunk_size=65536):
+            pass
+        return response
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Traffic, name) or name.startswith("_"):
+            raise ValueError(f"Unknown route '{name}' in --mix")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def _drive(traffic: Traffic, mix: Dict[str, int], count: int, deadline: Optional[float]) -> List[Sample]:
+    routes, weights = list(mix), list(mix.values())
+    samples: List[Sample] = []
+    with requests.Session() as session:
+        for _ in range(count):
+            if deadline and time.time() >= deadline:
+                break
+            route = random.choices(routes, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = getattr(traffic, route)(session).status_code
+            except requests.RequestException as e:
+                logger.warning(f"{route} failed: {e}")
+                status = 0
+            samples.append((route, time.perf_counter() - started, status))
+    return samples
+
+
+def _drive_in_process(job: Tuple[tuple, Dict[str, int], int, Optional[float], int]) -> List[Sample]:
+    traffic_args, mix, count, deadline, worker = job
+    random.seed(worker)
+    return _drive(Traffic(*traffic_args, worker=worker + 1), mix, count, deadline)
+
+
+# --- Setup and Teardown ---
+def _serve(port: int):
+    from werkzeug.serving import make_server
+    import api
+
+    server = make_server("127.0.0.1", port, api.create_app(), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name="http-load-server", daemon=True)
+    thread.start()
+    return server
+
+
+def _seed(count: int, run_id: str) -> List[str]:
+    import bulk_import
+
+    first_names = ["Aarav", "Diya", "Kabir", "Meera", "Rohan", "Saanvi", "Vihaan", "Isha", "Arjun", "Tara"]
+    last_names = ["Sharma", "Patel", "Iyer", "Khan", "Reddy", "Das", "Gupta", "Nair", "Singh", "Joshi"]
+
+    def records():
+        for i in range(count):
+            name = f"{random.choice(first_names)} {random.choice(last_names)}"
+            phone = f"{PHONE_PREFIX}{run_id}{SEED_WORKER}{i:07d}"
+            yield i + 1, {"name": name, "email_id": f"{phone}@seed.invalid", "phone_number": phone}
+
+    report = bulk_import.import_customers(records())
+    logger.info(f"Seeded {report.inserted} customers in {report.elapsed_seconds:.1f}s")
+    return [name.lower() for name in first_names + last_names]
+
+
+def _vehicle_ids() -> List[int]:
+    import db
+
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT vehicle_id FROM Vehicle WHERE status = 'Available' AND stock > 0")
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    return ids
+
+
+def _cleanup(run_id: str):
+    import cache
+    import db
+    import inventory
+    import kpi
+    import sales_rollup
+    import table_versions
+
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        # Follow-ups and sales go with their customers (ON DELETE CASCADE); stock sold
+        # during the run is not returned
+        cursor.execute("DELETE FROM Customer WHERE phone_number LIKE %s", (f"{PHONE_PREFIX}{run_id}%",))
+        inventory.rebuild_customer_counts(cursor)
+        kpi.rebuild_summary(cursor)
+        sales_rollup.rebuild(cursor, date.today() - timedelta(days=1))  # runs may cross midnight
+        table_versions.bump(cursor, *table_versions.TRACKED_TABLES)
+        conn.commit()
+        cursor.close()
+    cache.clear()
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    by_route: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_route[sample[0]].append(sample)
+
+    def block(items: List[Sample]) -> Dict[str, Any]:
+        statuses = Counter(str(status) for _, _, status in items)
+        return {
+            "requests": len(items),
+            "errors": sum(1 for _, _, status in items if status == 0 or status >= 500),
+            "requests_per_second": round(len(items) / elapsed, 1) if elapsed else None,
+            "latency_ms": latency_summary(seconds for _, seconds, _ in items),
+            "statuses": dict(sorted(statuses.items())),
+        }
+
+    return {"total": block(samples), "routes": {route: block(items) for route, items in sorted(by_route.items())}}
+
+
+def run(base_url: Optional[str], workers: int, requests_total: int, duration: Optional[float], mix: Dict[str, int],
+        seed_customers: int, processes: bool, port: int, keep: bool) -> Dict[str, Any]:
+    """Seed, drive the traffic mix and return the report"""
+    import schema
+
+    run_id = f"{random.randrange(10 ** 4):04d}"
+    schema.ensure_schema()
+    server = None
+    if base_url is None:
+        server = _serve(port)
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        search_terms = _seed(seed_customers, run_id) if seed_customers else ["sharma"]
+        traffic_args = (base_url, run_id, _vehicle_ids(), search_terms)
+        per_worker = max(1, requests_total // workers)
+        deadline = time.time() + duration if duration else None
+
+        started = time.perf_counter()
+        if processes:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                jobs = [(traffic_args, mix, per_worker, deadline, i) for i in range(workers)]
+                results = list(pool.map(_drive_in_process, jobs))
+        else:
+            traffic = Traffic(*traffic_args)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda _: _drive(traffic, mix, per_worker, deadline), range(workers)))
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.shutdown()
+        if not keep:
+            _cleanup(run_id)
+
+    samples = [sample for result in results for sample in result]
+    report = summarize(samples, elapsed)
+    report["run"] = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "target": base_url if server is None else "in-process",
+        "executor": "process" if processes else "thread",
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "seed_customers": seed_customers,
+        "mix": mix,
+    }
+    return report
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load-test the CRM API and report per-route latency")
+    parser.add_argument("--url", help="target a running API instead of booting one in-process")
+    parser.add_argument("--port", type=int, default=5055, help="port for the in-process server")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000, help="total requests across all workers")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds even if requests remain")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight list, e.g. add_customer=3,search=1")
+    parser.add_argument("--seed-customers", type=int, default=5000)
+    parser.add_argument("--processes", action="store_true", help="use a process pool instead of threads")
+    parser.add_argument("--keep", action="store_true", help="leave seeded and created customers in place")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "http_load.json"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = run(args.url, args.workers, args.requests, args.duration, parse_mix(args.mix),
+                 args.seed_customers, args.processes, args.port, args.keep)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True, default=str)
+        f.write("\n")
+
+    print(f"{'route':<18}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for route, block in list(report["routes"].items()) + [("TOTAL", report["total"])]:
+        latency = block["latency_ms"]
+        print(f"{route:<18}{block['requests']:>8}{block['errors']:>6}{block['requests_per_second'] or 0:>9}"
+              f"{latency.get('p50', 0):>9}{latency.get('p95', 0):>9}{latency.get('p99', 0):>9}")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
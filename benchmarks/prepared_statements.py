@@ -0,0 +1,122 @@
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import customers
+import db
+import inventory
+import schema
+from benchmarks.stats import latency_summary
+
+logger = logging.getLogger(__name__)
+
+# --- Prepared Statement Benchmark ---
+# Times each hot statement of a sale as plain text-protocol statements and
+# through the connection's prepared-statement registry. Iterations alternate
+# between the two on the same connection, and every iteration is rolled back,
+# so the database is unchanged apart from AUTO_INCREMENT gaps.
+PHONE_LOOKUP_SQL = "SELECT customer_id FROM Customer WHERE phone_number = %s"
+MODES = ("text", "prepared")
+
+
+def _pick_vehicle(conn) -> inventory.VehicleForSale:
+    cursor = conn.cursor(buffered=True)
+    cursor.execute("SELECT vehicle_id FROM Vehicle ORDER BY vehicle_id LIMIT 1")
+    row = cursor.fetchone()
+    if row is None:
+        raise SystemExit("No vehicles to benchmark against; run benchmarks/datagen.py first")
+    vehicle = inventory.read_vehicle(cursor, row[0])
+    cursor.close()
+    conn.rollback()
+    return vehicle
+
+
+def _iteration(conn, cursor, vehicle: inventory.VehicleForSale, phone: str) -> Dict[str, float]:
+    """One sale's statements, each timed including its result fetch, then rolled back"""
+    timings: Dict[str, float] = {}
+
+    def timed(name: str, sql: str, params: tuple, fetch: bool = False):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        if fetch:
+            cursor.fetchall()
+        timings[name] = time.perf_counter() - started
+
+    group = (vehicle.manufacturer, vehicle.model, vehicle.year)
+    timed("vehicle_lookup", inventory.READ_VEHICLE_SQL.format(held=""), (vehicle.vehicle_id,), fetch=True)
+    timed("phone_lookup", PHONE_LOOKUP_SQL, (phone,), fetch=True)
+    timed("stock_decrement", inventory.SELL_UNIT_SQL.format(reserved=""),
+          (vehicle.status, vehicle.vehicle_id, vehicle.version))
+    timed("group_stock", inventory.GROUP_STOCK_SQL, group, fetch=True)
+    timed("insert_customer", customers.INSERT_CUSTOMER_SQL,
+          ("Benchmark Buyer", "prepared@example.com", phone, vehicle.vehicle_id, vehicle.display_name))
+    customer_id = cursor.lastrowid
+    timed("insert_follow_up", customers.INSERT_FOLLOW_UP_SQL, (customer_id, *customers.SALE_FOLLOW_UP))
+    timed("insert_sale", customers.INSERT_SALE_SQL, (customer_id, vehicle.vehicle_id, "Completed", vehicle.price))
+    conn.rollback()
+    return timings
+
+
+def run(iterations: int, warmup: int) -> Dict[str, Any]:
+    schema.ensure_schema()
+    samples: Dict[str, Dict[str, List[float]]] = {mode: {} for mode in MODES}
+
+    with db.get_connection() as conn:
+        vehicle = _pick_vehicle(conn)
+        cursors = {"text": conn.cursor(buffered=True), "prepared": db.StatementCursor(conn)}
+        for i in range(warmup + iterations):
+            for mode in MODES:
+                phone = f"79{i:09d}{MODES.index(mode):02d}"
+                timings = _iteration(conn, cursors[mode], vehicle, phone)
+                if i < warmup:
+                    continue
+                for name, seconds in timings.items():
+                    samples[mode].setdefault(name, []).append(seconds)
+        for cursor in cursors.values():
+            cursor.close()
+
+    statements = {}
+    for name in samples["text"]:
+        text, prepared = latency_summary(samples["text"][name]), latency_summary(samples["prepared"][name])
+        statements[name] = {
+            "text": text,
+            "prepared": prepared,
+            "p50_speedup": round(text["p50"] / prepared["p50"], 2) if prepared["p50"] else None,
+        }
+    return {
+        "iterations": iterations,
+        "vehicle_id": vehicle.vehicle_id,
+        "statements": statements,
+        "pool": db.pool_stats(),
+    }
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Per-statement latency with and without prepared statements")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "prepared_statements.json"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args.iterations, args.warmup)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    print(f"{'statement':<20}{'text p50':>10}{'p95':>8}{'prepared p50':>14}{'p95':>8}{'speedup':>9}")
+    for name, stats in result["statements"].items():
+        text, prepared = stats["text"], stats["prepared"]
+        print(f"{name:<20}{text['p50']:>8.2f}ms{text['p95']:>8.2f}{prepared['p50']:>12.2f}ms{prepared['p95']:>8.2f}"
+              f"{stats['p50_speedup'] or 0:>8.2f}x")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
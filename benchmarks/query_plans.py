@@ -0,0 +1,185 @@
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import customers
+import db
+import followups
+import kpi
+import queries
+import sales_rollup
+import schema
+import table_stream
+import table_versions
+from queries import NamedQuery
+
+logger = logging.getLogger(__name__)
+
+# --- Query-Plan Regression Suite ---
+# EXPLAINs and times every named dashboard query against the current
+# database (fill it with benchmarks/datagen.py first). A query fails when its
+# plan reads a table in full that it has not declared in full_scans, or when
+# its median latency exceeds its budget.
+FULL_SCAN_MIN_ROWS = 10000  # smaller estimates are tiny tables or LIMITed index walks
+FULL_SCAN_TYPES = ("ALL", "index")
+_TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|LEFT\b|JOIN\b|"
+                              r"ORDER\b|GROUP\b|LIMIT\b|CROSS\b|INNER\b|UNION\b)(\w+))?", re.IGNORECASE)
+
+
+def _sample_keys(cursor) -> Dict[str, Any]:
+    """Real boundary values so keyset and lookup queries are planned realistically"""
+    cursor.execute("""
+        SELECT created_at, customer_id, phone_number FROM Customer
+        ORDER BY created_at DESC, customer_id DESC LIMIT 1 OFFSET 1000
+    """)
+    row = cursor.fetchone()
+    if row is None:  # fewer than 1000 customers; any values plan the same way
+        return {"created_at": datetime.now(), "customer_id": 0, "phone_prefix": "9"}
+    created_at, customer_id, phone = row
+    return {"created_at": created_at, "customer_id": customer_id, "phone_prefix": str(phone)[:4]}
+
+
+def catalogue(cursor) -> List[NamedQuery]:
+    """Every dashboard query with representative parameters and its budget"""
+    keys = _sample_keys(cursor)
+    boundary = (keys["created_at"], keys["created_at"], keys["customer_id"])
+    expression = customers.fulltext_expression("sharma")
+    page = 51
+    tracked = table_versions.TRACKED_TABLES
+    named = [
+        NamedQuery("customer_first_page", customers.CUSTOMER_FIRST_PAGE_SQL, (page,), budget_ms=50),
+        NamedQuery("customer_page_after", customers.CUSTOMER_PAGE_AFTER_SQL, (*boundary, page), budget_ms=50),
+        NamedQuery("customer_page_before", customers.CUSTOMER_PAGE_BEFORE_SQL, (*boundary, page), budget_ms=50),
+        NamedQuery("customer_search_text", customers.CUSTOMER_SEARCH_TEXT_SQL,
+                   (expression, expression, page, 0), budget_ms=300),
+        NamedQuery("customer_search_digits", customers.CUSTOMER_SEARCH_DIGITS_SQL,
+                   (keys["customer_id"], keys["phone_prefix"] + "%", keys["customer_id"], page, 0), budget_ms=100),
+        NamedQuery("customer_search_id", customers.CUSTOMER_SEARCH_ID_SQL, (keys["customer_id"], page, 0),
+                   budget_ms=20),
+        NamedQuery("available_vehicles", queries.AVAILABLE_VEHICLES_SQL, budget_ms=300, full_scans=("Vehicle",)),
+        NamedQuery("vehicle_inventory", queries.VEHICLE_INVENTORY_SQL, budget_ms=300, full_scans=("Vehicle",)),
+        NamedQuery("vehicle_customers", customers.VEHICLE_CUSTOMERS_SQL.format(before=""), (1, page), budget_ms=20),
+        NamedQuery("kpi_summary", kpi.READ_SUMMARY_SQL, budget_ms=20),
+        NamedQuery("table_versions", table_versions.SNAPSHOT_SQL.format(names=", ".join(["%s"] * len(tracked))),
+                   tracked, budget_ms=20),
+        NamedQuery("follow_up_queue_counts", followups.QUEUE_COUNTS_SQL, tuple(followups.BUCKETS), budget_ms=1000),
+    ]
+    for bucket, condition in followups.BUCKETS.items():
+        named.append(NamedQuery(f"follow_up_queue_{bucket}",
+                                followups.QUEUE_SQL.format(bucket=condition, after=""), (page,), budget_ms=50))
+    year = (date.today() - timedelta(days=364), date.today())
+    for granularity, period in sales_rollup.GRANULARITIES.items():
+        named.append(NamedQuery(f"sales_trend_{granularity}", sales_rollup.TREND_SQL.format(
+            period=period, table="Sales_daily_manufacturer", filter=""), year, budget_ms=50))
+    named.append(NamedQuery("sales_trend_manufacturer", sales_rollup.TREND_SQL.format(
+        period=sales_rollup.GRANULARITIES["week"], table="Sales_daily_manufacturer",
+        filter=" AND r.manufacturer = %s"), (*year, "Tata"), budget_ms=50))
+    for table in table_stream.STREAMABLE_TABLES:
+        sql, params = table_stream._sql(table_stream.build_query(table, limit=1000))
+        named.append(NamedQuery(f"table_export_{table}", sql, tuple(params), budget_ms=200))
+    for quick in queries.QUICK_QUERIES.values():
+        named.append(NamedQuery(f"quick: {quick.name}", quick.sql, quick.params, quick.budget_ms, quick.full_scans))
+    return named
+
+
+def _aliases(sql: str) -> Dict[str, str]:
+    aliases = {}
+    for table, alias in _TABLE_REFERENCE.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def full_scans(query: NamedQuery, plan: List[Dict[str, Any]]) -> List[str]:
+    """Tables the plan reads in full that the query has not declared"""
+    aliases = _aliases(query.sql)
+    offending = []
+    for step in plan:
+        table = aliases.get(step.get("table") or "", step.get("table") or "")
+        if table.startswith("<") or table in query.full_scans:
+            continue
+        if step.get("type") in FULL_SCAN_TYPES and (step.get("rows") or 0) >= FULL_SCAN_MIN_ROWS:
+            offending.append(f"{table} ({step['type']}, ~{step['rows']} rows, key={step.get('key')})")
+    return offending
+
+
+def check(query: NamedQuery, repeat: int, budget_scale: float) -> Dict[str, Any]:
+    with db.get_connection() as conn:
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        cursor.execute("EXPLAIN " + query.sql, query.params)
+        plan = [{k: (v.decode() if isinstance(v, bytes) else v) for k, v in row.items()} for row in cursor.fetchall()]
+
+        timings = []
+        for _ in range(repeat + 1):  # the first run only warms the buffer pool
+            started = time.perf_counter()
+            cursor.execute(query.sql, query.params)
+            rows = len(cursor.fetchall())
+            timings.append(time.perf_counter() - started)
+        cursor.close()
+
+    median_ms = statistics.median(timings[1:] or timings) * 1000
+    budget_ms = query.budget_ms * budget_scale
+    scans = full_scans(query, plan)
+    failures = [f"full scan of {scan}" for scan in scans]
+    if median_ms > budget_ms:
+        failures.append(f"median {median_ms:.1f} ms over budget {budget_ms:.0f} ms")
+    return {
+        "name": query.name,
+        "rows": rows,
+        "median_ms": round(median_ms, 2),
+        "budget_ms": round(budget_ms, 1),
+        "plan": plan,
+        "failures": failures,
+    }
+
+
+def run(repeat: int = 5, budget_scale: float = 1.0, only: Optional[str] = None) -> List[Dict[str, Any]]:
+    schema.ensure_schema()
+    with db.get_connection() as conn:
+        cursor = conn.cursor(buffered=True)
+        named = catalogue(cursor)
+        cursor.close()
+    if only:
+        named = [q for q in named if re.search(only, q.name)]
+    return [check(query, repeat, budget_scale) for query in named]
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="EXPLAIN and time every dashboard query against budgets")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every latency budget")
+    parser.add_argument("--only", help="regular expression selecting query names")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "query_plans.json"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args.repeat, args.budget_scale, args.only)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True, default=str)
+        f.write("\n")
+
+    failed = 0
+    for result in results:
+        status = "FAIL" if result["failures"] else "ok"
+        print(f"{status:<5}{result['name']:<36}{result['median_ms']:>10.1f} ms / {result['budget_ms']:>7.0f} ms"
+              f"{result['rows']:>9} rows")
+        for failure in result["failures"]:
+            print(f"       - {failure}")
+        failed += bool(result["failures"])
+    print(f"{len(results) - failed} passed, {failed} failed; plans written to {args.output}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
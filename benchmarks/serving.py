@@ -0,0 +1,118 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from benchmarks import http_load
+
+logger = logging.getLogger(__name__)
+
+# --- Serving Mode Benchmark ---
+# Starts the API under the Flask development server (python api.py) and under
+# gunicorn with gunicorn.conf.py, runs the same http_load traffic mix against
+# each, and compares throughput and latency. Both servers are separate
+# processes on localhost, so the load generator is outside both.
+MODES = ("dev_server", "gunicorn")
+READY_TIMEOUT = 30
+
+
+def _command(mode: str, port: int, web_workers: Optional[int], web_threads: Optional[int]) -> List[str]:
+    if mode == "dev_server":
+        return [sys.executable, "api.py"]
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}"]
+    if web_workers:
+        command += ["--workers", str(web_workers)]
+    if web_threads:
+        command += ["--threads", str(web_threads)]
+    return command
+
+
+def _wait_ready(base_url: str, server: subprocess.Popen):
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode} before it was ready")
+        try:
+            requests.get(f"{base_url}/pool/stats", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} was not ready after {READY_TIMEOUT}s")
+
+
+def _stop(server: subprocess.Popen):
+    server.send_signal(signal.SIGTERM)  # gunicorn drains in-flight requests on TERM
+    try:
+        server.wait(timeout=READY_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def run(port: int, load_workers: int, requests_total: int, duration: Optional[float], mix: Dict[str, int],
+        seed_customers: int, web_workers: Optional[int], web_threads: Optional[int]) -> Dict[str, Any]:
+    """Drive the same mix against each serving mode and return both reports"""
+    report: Dict[str, Any] = {}
+    base_url = f"http://127.0.0.1:{port}"
+    for mode in MODES:
+        server = subprocess.Popen(_command(mode, port, web_workers, web_threads), env={**os.environ, "PORT": str(port)})
+        try:
+            _wait_ready(base_url, server)
+            result = http_load.run(base_url, load_workers, requests_total, duration, mix, seed_customers,
+                                   False, port, False)
+        finally:
+            _stop(server)
+        report[mode] = {"total": result["total"], "routes": result["routes"]}
+        report.setdefault("run", result["run"])["target"] = base_url
+
+    baseline = report["dev_server"]["total"]["requests_per_second"]
+    if baseline:
+        report["speedup"] = round((report["gunicorn"]["total"]["requests_per_second"] or 0) / baseline, 2)
+    report["gunicorn_settings"] = {"workers": web_workers or "gunicorn.conf.py",
+                                   "threads": web_threads or "gunicorn.conf.py"}
+    return report
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="API throughput under the Flask dev server vs gunicorn")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--load-workers", type=int, default=32, help="concurrent client threads")
+    parser.add_argument("--requests", type=int, default=4000, help="total requests per mode")
+    parser.add_argument("--duration", type=float, help="stop each mode after this many seconds")
+    parser.add_argument("--mix", default=http_load.DEFAULT_MIX)
+    parser.add_argument("--seed-customers", type=int, default=5000)
+    parser.add_argument("--web-workers", type=int, help="override CRM_WEB_WORKERS for the gunicorn run")
+    parser.add_argument("--web-threads", type=int, help="override CRM_WEB_THREADS for the gunicorn run")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "serving.json"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    report = run(args.port, args.load_workers, args.requests, args.duration, http_load.parse_mix(args.mix),
+                 args.seed_customers, args.web_workers, args.web_threads)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True, default=str)
+        f.write("\n")
+
+    print(f"{'mode':<12}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for mode in MODES:
+        block = report[mode]["total"]
+        latency = block["latency_ms"]
+        print(f"{mode:<12}{block['requests']:>8}{block['errors']:>6}{block['requests_per_second'] or 0:>9}"
+              f"{latency.get('p50', 0):>9}{latency.get('p95', 0):>9}{latency.get('p99', 0):>9}")
+    if "speedup" in report:
+        print(f"gunicorn / dev server throughput: {report['speedup']}x")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
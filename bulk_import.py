@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+from mysql.connector import Error, IntegrityError
+
+import cache
+import db
+from customers import insert_lead_batch, validate_customer_data
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("CRM_BULK_CHUNK_SIZE", 1000))
+MAX_CHUNK_SIZE = 10000
+DEFAULT_MAX_ERRORS = 1000
+
+# Accepted spellings for each Customer column in uploaded files
+FIELD_ALIASES = {
+    "name": ("name", "customer_name"),
+    "email_id": ("email_id", "email"),
+    "phone_number": ("phone_number", "phone"),
+}
+
+
+class ImportFormatError(Exception):
+    """Raised when an upload cannot be parsed at all"""
+    pass
+
+
+@dataclass
+class ImportReport:
+    """Outcome of a bulk customer import"""
+    rows: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    chunks: int = 0
+    elapsed_seconds: float = 0.0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    errors_truncated: bool = False
+
+    def reject(self, row: int, phone: str, errors: List[str], max_errors: int):
+        self.rejected += 1
+        if len(self.errors) < max_errors:
+            self.errors.append({"row": row, "phone_number": phone, "errors": errors})
+        else:
+            self.errors_truncated = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "rows_per_second": round(self.rows / self.elapsed_seconds, 1) if self.elapsed_seconds else None,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+        }
+
+
+# --- Streaming Readers ---
+def _pick(record: Dict[str, Any], column: str) -> str:
+    for alias in FIELD_ALIASES[column]:
+        value = record.get(alias)
+        if value is not None:
+            return str(value).strip()
+    return ""
+
+
+def read_csv(stream) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (row_number, record) from a binary CSV stream with a header row"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    if reader.fieldnames is None:
+        return
+    for row_number, record in enumerate(reader, start=2):  # row 1 is the header
+        yield row_number, record
+
+
+def read_ndjson(stream) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (line_number, record) from a binary newline-delimited JSON stream"""
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8"), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = {"__error__": f"Invalid JSON: {e}"}
+        if not isinstance(record, dict):
+            record = {"__error__": "Each line must be a JSON object"}
+        yield line_number, record
+
+
+def reader_for(content_type: str):
+    """Pick a streaming reader from a request Content-Type"""
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    if mimetype in ("text/csv", "application/csv"):
+        return read_csv
+    if mimetype in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return read_ndjson
+    raise ImportFormatError(f"Unsupported content type '{mimetype}'; send text/csv or application/x-ndjson")
+
+
+# --- Import ---
+def _insert_chunk(leads: List[Tuple[str, str, str]]) -> Tuple[Dict[str, int], Set[str]]:
+    with db.get_connection() as conn:
+        cursor = conn.cursor(buffered=True)
+        ids, existing = insert_lead_batch(cursor, leads)
+        conn.commit()
+        cursor.close()
+    return ids, existing
+
+
+def _write_row(row: int, lead: Tuple[str, str, str], report: ImportReport, max_errors: int):
+    try:
+        ids, existing = _insert_chunk([lead])
+    except Error as e:
+        report.reject(row, lead[2], [f"Insert failed: {e}"], max_errors)
+        return
+    report.inserted += len(ids)
+    if lead[2] in existing:
+        report.reject(row, lead[2], ["Phone number already exists in database"], max_errors)
+
+
+def _write_chunk(chunk: List[Tuple[int, Tuple[str, str, str]]], report: ImportReport, max_errors: int):
+    leads = [lead for _, lead in chunk]
+    try:
+        try:
+            ids, existing = _insert_chunk(leads)
+        except IntegrityError:
+            # A concurrent writer took one of the phones after our duplicate check;
+            # the chunk rolled back, so running it again will see that phone.
+            ids, existing = _insert_chunk(leads)
+    except Error as e:
+        # One bad row spoils the multi-row INSERT; write the chunk row by row
+        # so only the rows the database refuses are rejected
+        logger.warning(f"Bulk import chunk of {len(chunk)} rolled back ({e}); writing rows singly")
+        for row, lead in chunk:
+            _write_row(row, lead, report, max_errors)
+        return
+
+    report.inserted += len(ids)
+    for row, (_, _, phone) in chunk:
+        if phone in existing:
+            report.reject(row, phone, ["Phone number already exists in database"], max_errors)
+
+
+def import_customers(records: Iterable[Tuple[int, Dict[str, Any]]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     max_errors: int = DEFAULT_MAX_ERRORS) -> ImportReport:
+    """Validate, dedupe and insert lead records in chunked transactions
+
+    records is consumed lazily, so memory stays bounded by the chunk size plus
+    the set of phones already seen in this import.
+    """
+    chunk_size = max(1, min(int(chunk_size), MAX_CHUNK_SIZE))
+    report = ImportReport()
+    started = time.perf_counter()
+    seen_phones = set()
+    chunk: List[Tuple[int, Tuple[str, str, str]]] = []
+
+    for row, record in records:
+        report.rows += 1
+        if "__error__" in record:
+            report.reject(row, "", [record["__error__"]], max_errors)
+            continue
+
+        name, email, phone = _pick(record, "name"), _pick(record, "email_id"), _pick(record, "phone_number")
+        errors = validate_customer_data(name, email, phone)
+        if errors:
+            report.reject(row, phone, errors, max_errors)
+            continue
+        if phone in seen_phones:
+            report.reject(row, phone, ["Duplicate phone number within upload"], max_errors)
+            continue
+        seen_phones.add(phone)
+
+        chunk.append((row, (name, email, phone)))
+        if len(chunk) >= chunk_size:
+            _write_chunk(chunk, report, max_errors)
+            report.chunks += 1
+            chunk = []
+
+    if chunk:
+        _write_chunk(chunk, report, max_errors)
+        report.chunks += 1
+
+    report.elapsed_seconds = time.perf_counter() - started
+    if report.inserted:
+        cache.invalidate("Customer", "Follow_ups")
+    logger.info(f"Bulk import: {report.inserted}/{report.rows} rows inserted in {report.chunks} chunks "
+                f"({report.elapsed_seconds:.2f}s)")
+    return report
@@ -0,0 +1,161 @@
+import functools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Tuple
+
+import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("CRM_CACHE_MAX_ENTRIES", 256))
+CACHE_ENABLED = os.getenv("CRM_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+# A replica may still be missing a write for up to its lag limit after the invalidation
+SETTLE_SECONDS = db.REPLICA_MAX_LAG if db.REPLICA_DSNS else 0.0
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tables")
+
+    def __init__(self, value: Any, expires_at: float, tables: Tuple[str, ...]):
+        self.value = value
+        self.expires_at = expires_at
+        self.tables = tables
+
+
+class QueryCache:
+    """Bounded LRU cache of query results with per-entry TTL and table-based invalidation
+
+    Entries are tagged with the tables they read; a load that races with an
+    invalidation of one of those tables, or finishes within settle_seconds of
+    one, is returned but not stored.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, settle_seconds: float = 0.0):
+        self.max_entries = max_entries
+        self.settle_seconds = settle_seconds
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._invalidated_at: Dict[str, float] = {}
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "expired": 0}
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self._counters["expired"] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry.value
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float,
+                    tables: Iterable[str]) -> Any:
+        """Return the cached value for key; concurrent misses share a single load"""
+        tables = tuple(tables)
+        while True:
+            with self._lock:
+                hit, value = self._lookup(key)
+                if hit:
+                    self._counters["hits"] += 1
+                    return value
+                pending = self._inflight.get(key)
+                if pending is None:
+                    self._counters["misses"] += 1
+                    done = self._inflight[key] = threading.Event()
+                    generations = tuple(self._generations.get(t, 0) for t in tables)
+                    break
+            pending.wait()
+
+        try:
+            value = loader()
+            with self._lock:
+                current = tuple(self._generations.get(t, 0) for t in tables)
+                if current == generations and not self._settling(tables):
+                    self._store(key, value, ttl, tables)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+
+    def _settling(self, tables: Tuple[str, ...]) -> bool:
+        if not self.settle_seconds:
+            return False
+        cutoff = time.monotonic() - self.settle_seconds
+        return any(self._invalidated_at.get(t, float("-inf")) > cutoff for t in tables)
+
+    def _store(self, key: Hashable, value: Any, ttl: float, tables: Tuple[str, ...]):
+        self._entries[key] = _Entry(value, time.monotonic() + ttl, tables)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def invalidate(self, *tables: str) -> int:
+        """Drop every entry that reads any of the given tables"""
+        with self._lock:
+            now = time.monotonic()
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                self._invalidated_at[table] = now
+            stale = [key for key, entry in self._entries.items()
+                     if any(t in entry.tables for t in tables)]
+            for key in stale:
+                del self._entries[key]
+            self._counters["invalidations"] += len(stale)
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} cached queries for {tables}")
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            for table in {t for entry in self._entries.values() for t in entry.tables}:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, **self._counters}
+
+
+# --- Module-level Cache ---
+_cache = QueryCache(settle_seconds=SETTLE_SECONDS)
+
+
+def get_cache() -> QueryCache:
+    return _cache
+
+
+def cached(name: str, ttl: float, tables: Iterable[str]):
+    """Cache a query function's result for ttl seconds, keyed on its arguments
+
+    Exceptions are never cached, so a failed query is retried on the next call.
+    A session that has just written bypasses the cache, like it bypasses replicas.
+    """
+    tables = tuple(tables)
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED or db.is_sticky():
+                return func(*args, **kwargs)
+            key = (name, args, tuple(sorted(kwargs.items())))
+            return _cache.get_or_load(key, lambda: func(*args, **kwargs), ttl, tables)
+        wrapper.cache_tables = tables
+        return wrapper
+    return decorator
+
+
+def invalidate(*tables: str) -> int:
+    """Drop cached results that depend on any of the given tables"""
+    return _cache.invalidate(*tables)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
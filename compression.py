@@ -0,0 +1,105 @@
+import logging
+import os
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# --- Response Compression ---
+# Content negotiation and incremental encoders for API responses. Streamed
+# bodies are compressed as they are produced and flushed every FLUSH_BYTES of
+# input, so clients still receive rows while the export runs.
+MIN_SIZE = int(os.getenv("CRM_COMPRESS_MIN_BYTES", 1024))  # smaller buffered bodies are sent as is
+FLUSH_BYTES = 64 * 1024
+GZIP_LEVEL = int(os.getenv("CRM_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("CRM_BROTLI_QUALITY", 5))  # 11 is far too slow for dynamic responses
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/plain", "text/csv")
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported encoding the client accepts (brotli before gzip), or None"""
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and mimetype in COMPRESSIBLE_TYPES
+
+
+class _Encoder:
+    """compress/flush/finish over zlib (gzip framing) or brotli"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        elif encoding == "gzip":
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+            self._brotli = None
+        else:
+            raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+    def compress(self, data: bytes) -> bytes:
+        return self._zlib.compress(data) if self._zlib else self._brotli.process(data)
+
+    def flush(self) -> bytes:
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH) if self._zlib else self._brotli.flush()
+
+    def finish(self) -> bytes:
+        return self._zlib.flush(zlib.Z_FINISH) if self._zlib else self._brotli.finish()
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    encoder = _Encoder(encoding)
+    return encoder.compress(data) + encoder.finish()
+
+
+def compress_stream(chunks: Iterable[Union[str, bytes]], encoding: str) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk, flushing every FLUSH_BYTES of input"""
+    encoder = _Encoder(encoding)
+    pending = 0
+    try:
+        for chunk in chunks:
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            out = encoder.compress(data)
+            pending += len(data)
+            if pending >= FLUSH_BYTES:
+                out += encoder.flush()
+                pending = 0
+            if out:
+                yield out
+        yield encoder.finish()
+    finally:
+        # A client that disconnects closes this generator; pass that on so the
+        # wrapped stream releases its database connection now, not at GC
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,519 @@
+import logging
+import re
+from dataclasses import dataclass, replace
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from mysql.connector import IntegrityError, errorcode
+
+import cache
+import db
+import inventory
+import kpi
+import reservations
+import sales_rollup
+import table_versions
+
+logger = logging.getLogger(__name__)
+
+
+# --- Custom Exception Classes ---
+class ValidationError(Exception):
+    """Custom exception for data validation"""
+
+    def __init__(self, message: str, errors: Optional[List[str]] = None):
+        super().__init__(message)
+        self.errors = errors or [message]
+
+
+class DuplicatePhoneError(ValidationError):
+    """Raised when the phone number already belongs to a customer"""
+    pass
+
+
+class VehicleNotFoundError(ValidationError):
+    """Raised when the selected vehicle does not exist"""
+    pass
+
+
+class OutOfStockError(ValidationError):
+    """Raised when the selected vehicle has no stock left"""
+    pass
+
+
+class ReservationError(ValidationError):
+    """Raised when a reservation token does not hold a unit of the vehicle"""
+    pass
+
+
+# --- Validation Functions ---
+# Customer column widths (schema.py); longer values fail the INSERT in strict mode
+NAME_MAX_LENGTH = 100
+EMAIL_MAX_LENGTH = 100
+PHONE_MAX_LENGTH = 15
+
+
+def validate_customer_data(name: str, email: str, phone: str) -> List[str]:
+    """Validate customer input data and return list of errors"""
+    errors = []
+    
+    if not name or len(name.strip()) < 2:
+        errors.append("Name must be at least 2 characters long")
+    elif len(name) > NAME_MAX_LENGTH:
+        errors.append(f"Name must be at most {NAME_MAX_LENGTH} characters long")
+    
+    if not email or '@' not in email or '.' not in email:
+        errors.append("Valid email address is required")
+    elif len(email) > EMAIL_MAX_LENGTH:
+        errors.append(f"Email address must be at most {EMAIL_MAX_LENGTH} characters long")
+    
+    if not phone or not phone.isdigit() or len(phone) < 10:
+        errors.append("Phone number must be at least 10 digits and contain only numbers")
+    elif len(phone) > PHONE_MAX_LENGTH:
+        errors.append(f"Phone number must be at most {PHONE_MAX_LENGTH} digits")
+    
+    return errors
+
+PAGE_SIZES = (25, 50, 100, 250)
+MAX_PAGE_SIZE = max(PAGE_SIZES)
+
+PageKey = Tuple[datetime, int]  # (created_at, customer_id) of a boundary row
+
+CUSTOMER_LIST_COLUMNS = """
+    c.customer_id,
+    c.name,
+    c.email_id,
+    c.phone_number,
+    CASE
+        WHEN v.vehicle_id IS NOT NULL
+        THEN CONCAT(v.manufacturer, ' ', v.model, ' (', v.year, ')')
+        ELSE COALESCE(c.model_purchased, 'No vehicle assigned')
+    END as vehicle_purchased,
+    v.price as vehicle_price,
+    c.created_at
+"""
+
+# Keyset pagination over idx_customer_created (created_at, customer_id), newest first.
+# The boundary comparison is spelled out instead of using a row constructor so the
+# optimizer always treats it as a range scan on the index.
+CUSTOMER_PAGE_AFTER_SQL = f"""
+    SELECT {CUSTOMER_LIST_COLUMNS}
+    FROM Customer c
+    LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
+    WHERE c.created_at < %s OR (c.created_at = %s AND c.customer_id < %s)
+    ORDER BY c.created_at DESC, c.customer_id DESC
+    LIMIT %s
+"""
+
+CUSTOMER_PAGE_BEFORE_SQL = f"""
+    SELECT {CUSTOMER_LIST_COLUMNS}
+    FROM Customer c
+    LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
+    WHERE c.created_at > %s OR (c.created_at = %s AND c.customer_id > %s)
+    ORDER BY c.created_at ASC, c.customer_id ASC
+    LIMIT %s
+"""
+
+CUSTOMER_FIRST_PAGE_SQL = f"""
+    SELECT {CUSTOMER_LIST_COLUMNS}
+    FROM Customer c
+    LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
+    ORDER BY c.created_at DESC, c.customer_id DESC
+    LIMIT %s
+"""
+
+
+@dataclass(frozen=True)
+class CustomerPage:
+    """One page of the customer listing plus the keys needed to move from it"""
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+    first_key: Optional[PageKey]
+    last_key: Optional[PageKey]
+    has_next: bool
+    has_prev: bool
+
+
+def _row_key(columns: List[str], row: Tuple[Any, ...]) -> PageKey:
+    return row[columns.index("created_at")], row[columns.index("customer_id")]
+
+
+@cache.cached("customer_page", ttl=30, tables=("Customer", "Vehicle"))
+def fetch_customer_page(page_size: int = 50, cursor: Optional[PageKey] = None,
+                        direction: str = "next") -> CustomerPage:
+    """Fetch one page of customers, newest first, relative to a boundary key
+
+    direction="next" returns the rows after cursor, "prev" the rows before it.
+    Only page_size + 1 rows are read, so cost does not grow with the table.
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    if direction not in ("next", "prev"):
+        raise ValueError(f"Unknown page direction: {direction}")
+
+    with db.get_read_connection() as conn:
+        cur = conn.cursor()
+        if cursor is None:
+            cur.execute(CUSTOMER_FIRST_PAGE_SQL, (page_size + 1,))
+        elif direction == "next":
+            created_at, customer_id = cursor
+            cur.execute(CUSTOMER_PAGE_AFTER_SQL, (created_at, created_at, customer_id, page_size + 1))
+        else:
+            created_at, customer_id = cursor
+            cur.execute(CUSTOMER_PAGE_BEFORE_SQL, (created_at, created_at, customer_id, page_size + 1))
+        columns = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+        cur.close()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "prev" and cursor is not None:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, cursor is not None
+
+    return CustomerPage(
+        columns=columns,
+        rows=rows,
+        first_key=_row_key(columns, rows[0]) if rows else None,
+        last_key=_row_key(columns, rows[-1]) if rows else None,
+        has_next=has_next,
+        has_prev=has_prev,
+    )
+
+
+# --- Vehicle Customer Drilldown ---
+# The inventory grid only carries Vehicle.customers_assigned; a vehicle's buyers
+# are read here when it is expanded. idx_vehicle entries end in the primary key,
+# so one vehicle's customers are a single index range already in customer_id order.
+VEHICLE_CUSTOMERS_SQL = """
+    SELECT c.customer_id, c.name, c.email_id, c.phone_number, c.created_at
+    FROM Customer c
+    WHERE c.vehicle_id = %s{before}
+    ORDER BY c.customer_id DESC
+    LIMIT %s
+"""
+
+VEHICLE_CUSTOMERS_BEFORE_SQL = " AND c.customer_id < %s"
+
+
+@dataclass(frozen=True)
+class VehicleCustomersPage:
+    """One page of the customers assigned to a vehicle, newest first"""
+    vehicle_id: int
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+    next_key: Optional[int]  # customer_id to continue below
+
+
+@cache.cached("vehicle_customers", ttl=30, tables=("Customer",))
+def fetch_vehicle_customers(vehicle_id: int, page_size: int = 25,
+                            before: Optional[int] = None) -> VehicleCustomersPage:
+    """Customers assigned to a vehicle with customer_id below before, newest first"""
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    params: List[Any] = [int(vehicle_id)]
+    if before is not None:
+        params.append(int(before))
+    params.append(page_size + 1)
+    sql = VEHICLE_CUSTOMERS_SQL.format(before=VEHICLE_CUSTOMERS_BEFORE_SQL if before is not None else "")
+
+    with db.get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+        cursor.close()
+
+    next_key = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_key = rows[-1][columns.index("customer_id")]
+    return VehicleCustomersPage(vehicle_id=int(vehicle_id), columns=columns, rows=rows, next_key=next_key)
+
+
+# --- Customer Search ---
+# Digit-only terms match customer_id exactly (PRIMARY) or phone_number by prefix
+# (the UNIQUE phone index); anything else goes through ft_customer_name_email.
+# Shorter digit terms only match customer_id: a 1-3 digit phone prefix covers
+# a large slice of the index and would be ranked and sorted on every keystroke.
+FULLTEXT_MIN_TOKEN = 3  # InnoDB innodb_ft_min_token_size default
+PHONE_PREFIX_MIN_DIGITS = 4
+_FULLTEXT_OPERATORS = re.compile(r'[+\-<>()~*"@.,;:!?\'\\]+')
+
+CUSTOMER_SEARCH_DIGITS_SQL = f"""
+    SELECT {CUSTOMER_LIST_COLUMNS}, 2 AS relevance
+    FROM Customer c
+    LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
+    WHERE c.customer_id = %s
+    UNION ALL
+    SELECT {CUSTOMER_LIST_COLUMNS}, 1 AS relevance
+    FROM Customer c
+    LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
+    WHERE c.phone_number LIKE %s AND c.customer_id <> %s
+    ORDER BY relevance DESC, customer_id DESC
+    LIMIT %s OFFSET %s
+"""
+
+CUSTOMER_SEARCH_ID_SQL = f"""
+    SELECT {CUSTOMER_LIST_COLUMNS}, 2 AS relevance
+    FROM Customer c
+    LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
+    WHERE c.customer_id = %s
+    LIMIT %s OFFSET %s
+"""
+
+CUSTOMER_SEARCH_TEXT_SQL = f"""
+    SELECT {CUSTOMER_LIST_COLUMNS},
+        MATCH(c.name, c.email_id) AGAINST (%s IN BOOLEAN MODE) AS relevance
+    FROM Customer c
+    LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
+    WHERE MATCH(c.name, c.email_id) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY relevance DESC, c.customer_id DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+@dataclass(frozen=True)
+class SearchPage:
+    """One page of ranked customer search results"""
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+    page: int
+    has_next: bool
+
+
+def fulltext_expression(term: str) -> Optional[str]:
+    """Boolean-mode expression requiring every word of term as a prefix, or None"""
+    words = [w for w in _FULLTEXT_OPERATORS.sub(" ", term).split() if len(w) >= FULLTEXT_MIN_TOKEN]
+    if not words:
+        return None
+    return " ".join(f"+{w}*" for w in words)
+
+
+@cache.cached("customer_search", ttl=30, tables=("Customer", "Vehicle"))
+def search_customers(term: str, page_size: int = 50, page: int = 1) -> SearchPage:
+    """Ranked, paginated customer search pushed down to MySQL indexes"""
+    term = term.strip()
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    page = max(1, int(page))
+    offset = (page - 1) * page_size
+
+    if term.isdigit() and len(term) < PHONE_PREFIX_MIN_DIGITS:
+        sql = CUSTOMER_SEARCH_ID_SQL
+        params = (int(term), page_size + 1, offset)
+    elif term.isdigit():
+        sql = CUSTOMER_SEARCH_DIGITS_SQL
+        params = (int(term), f"{term}%", int(term), page_size + 1, offset)
+    else:
+        expression = fulltext_expression(term)
+        if expression is None:
+            return SearchPage(columns=[], rows=[], page=page, has_next=False)
+        sql = CUSTOMER_SEARCH_TEXT_SQL
+        params = (expression, expression, page_size + 1, offset)
+
+    with db.get_read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        columns = [d[0] for d in cur.description][:-1]  # drop relevance
+        rows = [row[:-1] for row in cur.fetchall()]
+        cur.close()
+
+    return SearchPage(
+        columns=columns,
+        rows=rows[:page_size],
+        page=page,
+        has_next=len(rows) > page_size,
+    )
+
+
+# --- Customer Creation ---
+INSERT_CUSTOMER_SQL = """
+    INSERT INTO Customer (name, email_id, phone_number, vehicle_id, model_purchased, created_at)
+    VALUES (%s, %s, %s, %s, %s, NOW())
+"""
+
+INSERT_FOLLOW_UP_SQL = """
+    INSERT INTO Follow_ups (customer_id, follow_up_date, reason, completed)
+    VALUES (%s, NOW() + INTERVAL %s DAY, %s, FALSE)
+"""
+
+INSERT_SALE_SQL = """
+    INSERT INTO Sales (customer_id, vehicle_id, sale_date, payment_status, sale_amount)
+    VALUES (%s, %s, NOW(), %s, %s)
+"""
+
+LEAD_FOLLOW_UP = (3, "Initial lead follow-up")
+SALE_FOLLOW_UP = (30, "Post-sale vehicle service follow-up")
+
+
+@dataclass(frozen=True)
+class CreatedCustomer:
+    """Outcome of create_customer"""
+    customer_id: int
+    vehicle_id: Optional[int]
+    model_purchased: Optional[str]
+    sale_amount: Optional[Decimal]
+    round_trips: int
+    stock_retries: int = 0
+
+
+class RoundTripCursor:
+    """Cursor proxy that counts the statements sent to the server"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.round_trips = 0
+
+    def execute(self, operation, params=None):
+        self.round_trips += 1
+        return self._cursor.execute(operation, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def create_customer(name: str, email: str, phone: str, vehicle_id: Optional[int] = None,
+                    payment_status: str = "Completed",
+                    sale_amount: Optional[Decimal] = None,
+                    reservation: Optional[str] = None,
+                    before_commit: Optional[Callable[[Any, CreatedCustomer], None]] = None) -> CreatedCustomer:
+    """Create a customer, its follow-up and (for a purchase) the sale in one transaction
+
+    Stock is taken with a versioned compare-and-swap (see inventory.sell_unit),
+    so concurrent sales of one vehicle never wait on a lock taken at read time.
+    reservation is the token of a hold on the vehicle, which is consumed.
+    Duplicate phones are detected by the UNIQUE constraint rather than a
+    separate lookup. A lead takes 5 round trips including the KPI counter and
+    table version updates and COMMIT; a sale takes 11 including the two sales
+    rollups, plus one for a reservation, one when it sells out its model-year
+    and three per lost stock race. A sale that finds only held stock releases
+    the vehicle's expired holds first (reservations.release_expired). Every
+    statement here has a fixed shape, so they run as the connection's
+    prepared statements.
+    before_commit(cursor, created) runs last inside the transaction, e.g. to
+    store an idempotency key with the outcome; whatever it raises rolls back.
+    Raises ValidationError (or a subclass) for anything the caller can fix,
+    and inventory.StockConflictError when the vehicle stays too contended.
+    """
+    name, email, phone = (name or "").strip(), (email or "").strip(), (phone or "").strip()
+    errors = validate_customer_data(name, email, phone)
+    if errors:
+        raise ValidationError("; ".join(errors), errors)
+
+    with db.get_connection() as conn:
+        cursor = RoundTripCursor(conn.statement_cursor())
+        vehicle = None
+        stock_retries = 0
+
+        if vehicle_id:
+            outcome = inventory.sell_unit(conn, cursor, vehicle_id, reservation)
+            if not outcome.applied and not reservation and outcome.vehicle is not None and outcome.vehicle.reserved > 0:
+                # Expired holds count as reserved until swept; reclaim this vehicle's before refusing
+                conn.rollback()
+                if reservations.release_expired(conn, vehicle_id):
+                    retries = outcome.retries
+                    outcome = inventory.sell_unit(conn, cursor, vehicle_id)
+                    outcome = replace(outcome, retries=outcome.retries + retries)
+            stock_retries = outcome.retries
+            cursor.round_trips += stock_retries  # one ROLLBACK per lost race
+            if outcome.vehicle is None:
+                raise VehicleNotFoundError("Selected vehicle not found.")
+            if not outcome.applied:
+                if reservation:
+                    raise ReservationError("Reservation has expired or is for another vehicle.")
+                raise OutOfStockError("Vehicle is out of stock.")
+            vehicle = outcome.vehicle
+
+        model_purchased = vehicle.display_name if vehicle else None
+        try:
+            cursor.execute(INSERT_CUSTOMER_SQL, (name, email, phone, vehicle_id or None, model_purchased))
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise DuplicatePhoneError("Phone number already exists in database")
+            raise
+        customer_id = cursor.lastrowid
+
+        follow_up_days, follow_up_reason = SALE_FOLLOW_UP if vehicle else LEAD_FOLLOW_UP
+        cursor.execute(INSERT_FOLLOW_UP_SQL, (customer_id, follow_up_days, follow_up_reason))
+
+        if vehicle:
+            if sale_amount is None:
+                sale_amount = vehicle.price
+            cursor.execute(INSERT_SALE_SQL, (customer_id, vehicle_id, payment_status, sale_amount))
+            sales_rollup.record_sale(cursor, vehicle_id, vehicle.manufacturer, sale_amount)
+            kpi.record(cursor, total_customers=1, customers_with_vehicles=1, sales_count=1,
+                       total_sales_value=sale_amount, **inventory.sale_status_deltas(vehicle))
+        else:
+            kpi.record(cursor, total_customers=1)
+        table_versions.bump(cursor, "Customer", "Follow_ups", *(("Vehicle", "Sales") if vehicle else ()))
+
+        created = CreatedCustomer(
+            customer_id=customer_id,
+            vehicle_id=vehicle_id if vehicle else None,
+            model_purchased=model_purchased,
+            sale_amount=sale_amount if vehicle else None,
+            round_trips=cursor.round_trips,
+            stock_retries=stock_retries,
+        )
+        if before_commit is not None:
+            before_commit(cursor, created)
+
+        conn.commit()
+        cursor.round_trips += 1
+        cursor.close()
+
+    cache.invalidate("Customer", "Follow_ups", *(("Vehicle", "Sales") if vehicle else ()))
+    logger.debug(f"Created customer {customer_id} in {cursor.round_trips} round trips")
+    return replace(created, round_trips=cursor.round_trips)
+
+
+# --- Batched Lead Insertion ---
+def _multi_row_values(template: str, count: int) -> str:
+    return ", ".join([template] * count)
+
+
+def insert_lead_batch(cursor, leads: List[Tuple[str, str, str]]) -> Tuple[Dict[str, int], Set[str]]:
+    """Insert lead-only customers and their follow-ups inside the caller's transaction
+
+    leads are (name, email, phone) tuples with unique, validated phones. Uses
+    one duplicate check, one multi-row INSERT per table, one id lookup and one
+    KPI counter and table version update whatever the batch size. Returns the
+    new ids by phone and the phones that already existed (those leads are
+    skipped).
+    """
+    if not leads:
+        return {}, set()
+
+    phones = [phone for _, _, phone in leads]
+    in_list = ", ".join(["%s"] * len(phones))
+    cursor.execute(f"SELECT phone_number FROM Customer WHERE phone_number IN ({in_list})", phones)
+    existing = {row[0] for row in cursor.fetchall()}
+
+    fresh = [lead for lead in leads if lead[2] not in existing]
+    if not fresh:
+        return {}, existing
+
+    cursor.execute(
+        "INSERT INTO Customer (name, email_id, phone_number) VALUES "
+        + _multi_row_values("(%s, %s, %s)", len(fresh)),
+        [value for lead in fresh for value in lead]
+    )
+
+    fresh_phones = [phone for _, _, phone in fresh]
+    in_list = ", ".join(["%s"] * len(fresh_phones))
+    cursor.execute(
+        f"SELECT phone_number, customer_id FROM Customer WHERE phone_number IN ({in_list})",
+        fresh_phones
+    )
+    ids = dict(cursor.fetchall())
+
+    follow_up_days, follow_up_reason = LEAD_FOLLOW_UP
+    cursor.execute(
+        "INSERT INTO Follow_ups (customer_id, follow_up_date, reason, completed) VALUES "
+        + _multi_row_values("(%s, NOW() + INTERVAL %s DAY, %s, FALSE)", len(fresh)),
+        [value for phone in fresh_phones for value in (ids[phone], follow_up_days, follow_up_reason)]
+    )
+    kpi.record(cursor, total_customers=len(fresh))
+    table_versions.bump(cursor, "Customer", "Follow_ups")
+    return ids, existing
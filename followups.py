@@ -0,0 +1,129 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import cache
+import db
+import table_versions
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZES = (25, 50, 100)
+MAX_PAGE_SIZE = 500
+MAX_COMPLETE_BATCH = 1000
+
+QueueKey = Tuple[datetime, int]  # (follow_up_date, id) of the last row on a page
+
+# --- Work Queue ---
+# Open follow-ups by due date, all served by idx_followups_queue
+# (completed, follow_up_date, id) as a single range scan.
+BUCKETS = {
+    "overdue": "f.follow_up_date < CURDATE()",
+    "due_today": "f.follow_up_date >= CURDATE() AND f.follow_up_date < CURDATE() + INTERVAL 1 DAY",
+    "upcoming": "f.follow_up_date >= CURDATE() + INTERVAL 1 DAY",
+}
+BUCKET_LABELS = {"overdue": "Overdue", "due_today": "Due Today", "upcoming": "Upcoming"}
+
+QUEUE_SQL = """
+    SELECT
+        f.id,
+        f.customer_id,
+        c.name AS customer_name,
+        c.phone_number,
+        f.follow_up_date,
+        f.reason,
+        f.created_at
+    FROM Follow_ups f
+    JOIN Customer c ON c.customer_id = f.customer_id
+    WHERE f.completed = FALSE AND {bucket}{after}
+    ORDER BY f.follow_up_date, f.id
+    LIMIT %s
+"""
+
+AFTER_SQL = " AND (f.follow_up_date > %s OR (f.follow_up_date = %s AND f.id > %s))"
+
+# One COUNT per bucket; params are the bucket names, in BUCKETS order
+QUEUE_COUNTS_SQL = " UNION ALL ".join(
+    f"SELECT %s, COUNT(*) FROM Follow_ups f WHERE f.completed = FALSE AND {condition}"
+    for condition in BUCKETS.values()
+)
+
+
+@dataclass(frozen=True)
+class QueuePage:
+    """One page of a follow-up work queue bucket"""
+    bucket: str
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+    next_key: Optional[QueueKey]
+
+
+def _check_bucket(bucket: str):
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown follow-up bucket '{bucket}'; expected one of {', '.join(BUCKETS)}")
+
+
+@cache.cached("follow_up_queue", ttl=30, tables=("Follow_ups", "Customer"))
+def fetch_queue(bucket: str, page_size: int = 50, after: Optional[QueueKey] = None) -> QueuePage:
+    """Open follow-ups in a bucket, earliest due first, starting after a boundary key"""
+    _check_bucket(bucket)
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    params: List[Any] = []
+    if after is not None:
+        params.extend([after[0], after[0], after[1]])
+    params.append(page_size + 1)
+    sql = QUEUE_SQL.format(bucket=BUCKETS[bucket], after=AFTER_SQL if after is not None else "")
+
+    with db.get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+        cursor.close()
+
+    next_key = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_key = (last[columns.index("follow_up_date")], last[columns.index("id")])
+    return QueuePage(bucket=bucket, columns=columns, rows=rows, next_key=next_key)
+
+
+@cache.cached("follow_up_queue_counts", ttl=30, tables=("Follow_ups",))
+def fetch_queue_counts() -> Dict[str, int]:
+    """Number of open follow-ups in each bucket, from index-only range counts"""
+    with db.get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(QUEUE_COUNTS_SQL, list(BUCKETS))
+        counts = {bucket: int(count) for bucket, count in cursor.fetchall()}
+        cursor.close()
+    return counts
+
+
+# --- Completion ---
+def mark_completed(ids: Iterable[int]) -> int:
+    """Mark many follow-ups completed with one UPDATE; returns the rows changed"""
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        return 0
+    if len(ids) > MAX_COMPLETE_BATCH:
+        raise ValueError(f"At most {MAX_COMPLETE_BATCH} follow-ups can be completed at once")
+
+    in_list = ", ".join(["%s"] * len(ids))
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"UPDATE Follow_ups SET completed = TRUE WHERE id IN ({in_list}) AND completed = FALSE",
+            ids
+        )
+        changed = cursor.rowcount
+        if changed:
+            table_versions.bump(cursor, "Follow_ups")
+        conn.commit()
+        cursor.close()
+
+    cache.invalidate("Follow_ups")
+    logger.info(f"Marked {changed} follow-up(s) completed")
+    return changed
@@ -0,0 +1,218 @@
+import io
+import logging
+import os
+from datetime import date
+from decimal import Decimal
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from mysql.connector import FieldType
+from mysql.connector.constants import FieldFlag
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow as pa
+except ImportError:  # only needed for Arrow exports; streamlit already depends on it
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# --- Typed Result Frames ---
+# Builds DataFrames column by column from fetchmany() chunks instead of
+# pd.read_sql's object rows. ENUM and low-cardinality text becomes
+# categorical, DECIMAL float64, integers the narrowest width and dates
+# datetime64, so a page holds a few numpy buffers instead of one Python
+# object per cell, and only one chunk of rows is ever held as tuples.
+CHUNK_SIZE = int(os.getenv("CRM_FRAME_CHUNK_SIZE", 5000))
+CATEGORY_COLUMNS = frozenset({"manufacturer", "model", "status", "payment_status", "reason", "model_purchased",
+                              "vehicle"})
+CATEGORY_MAX_RATIO = 0.5  # other text becomes categorical when at most this share of its values is distinct
+
+INT, FLOAT, DATETIME, CATEGORY, TEXT = "int", "float", "datetime", "category", "text"
+
+_INT_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24, FieldType.YEAR}
+_DECIMAL_TYPES = {FieldType.DECIMAL, FieldType.NEWDECIMAL}
+_FLOAT_TYPES = {FieldType.FLOAT, FieldType.DOUBLE}
+_DATETIME_TYPES = {FieldType.DATE, FieldType.NEWDATE, FieldType.DATETIME, FieldType.TIMESTAMP}
+_CATEGORY_TYPES = {FieldType.ENUM, FieldType.SET}
+
+
+# --- Column Kinds ---
+def _first_value(values: Sequence[Any]) -> Any:
+    return next((v for v in values if v is not None), None)
+
+
+def _decimal_kind(values: Sequence[Any]) -> str:
+    # SUM() and COUNT-like aggregates of integers come back as DECIMAL with no scale
+    first = _first_value(values)
+    return INT if isinstance(first, Decimal) and first.as_tuple().exponent >= 0 else FLOAT
+
+
+def description_kind(name: str, type_code: int, flags: int, values: Sequence[Any]) -> str:
+    """Column kind from cursor.description, looking at values only for DECIMAL"""
+    if type_code in _INT_TYPES:
+        return INT
+    if type_code in _DECIMAL_TYPES:
+        return _decimal_kind(values)
+    if type_code in _FLOAT_TYPES:
+        return FLOAT
+    if type_code in _DATETIME_TYPES:
+        return DATETIME
+    if type_code in _CATEGORY_TYPES or flags & FieldFlag.ENUM or name in CATEGORY_COLUMNS:
+        return CATEGORY
+    return TEXT
+
+
+def value_kind(name: str, values: Sequence[Any]) -> str:
+    """Column kind inferred from Python values, for rows fetched elsewhere"""
+    first = _first_value(values)
+    if isinstance(first, (bool, int)):
+        return INT
+    if isinstance(first, Decimal):
+        return _decimal_kind(values)
+    if isinstance(first, float):
+        return FLOAT
+    if isinstance(first, date):
+        return DATETIME
+    return CATEGORY if name in CATEGORY_COLUMNS else TEXT
+
+
+def _chunk_column(kind: str, values: Sequence[Any]):
+    if kind == INT:
+        if any(v is None for v in values):
+            return pd.array([None if v is None else int(v) for v in values], dtype="Int64")
+        return np.fromiter((int(v) for v in values), dtype=np.int64, count=len(values))
+    if kind == FLOAT:
+        return np.fromiter((np.nan if v is None else float(v) for v in values), dtype=np.float64, count=len(values))
+    if kind == DATETIME:
+        return pd.to_datetime(list(values)).to_numpy(dtype="datetime64[ns]")
+    if kind == CATEGORY:
+        return pd.Categorical(values)
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+# --- Frame Building ---
+class FrameBuilder:
+    """Accumulates row chunks as typed column chunks and joins them into one DataFrame"""
+
+    def __init__(self, names: Sequence[str], kinds: Sequence[str]):
+        self.names = list(names)
+        self.kinds = list(kinds)
+        self._chunks: List[List[Any]] = [[] for _ in self.names]
+        self.rows = 0
+
+    def add(self, rows: Sequence[Tuple[Any, ...]]):
+        if not rows:
+            return
+        for i, values in enumerate(zip(*rows)):
+            self._chunks[i].append(_chunk_column(self.kinds[i], values))
+        self.rows += len(rows)
+
+    def build(self, infer_categories: bool = True) -> pd.DataFrame:
+        if not self.rows:
+            return pd.DataFrame(columns=self.names)
+        columns = {}
+        for name, kind, chunks in zip(self.names, self.kinds, self._chunks):
+            if kind == CATEGORY:
+                column = pd.Series(union_categoricals(chunks) if len(chunks) > 1 else chunks[0])
+            else:
+                column = pd.concat([pd.Series(chunk) for chunk in chunks], ignore_index=True)
+            if kind == INT and column.dtype == np.int64:
+                column = pd.to_numeric(column, downcast="integer")
+            elif kind == TEXT and infer_categories and column.nunique() <= CATEGORY_MAX_RATIO * len(column):
+                column = column.astype("category")
+            columns[name] = column
+        self._chunks = [[] for _ in self.names]
+        self.rows = 0
+        return pd.DataFrame(columns)
+
+
+def frame_from_rows(columns: Sequence[str], rows: Sequence[Tuple[Any, ...]]) -> pd.DataFrame:
+    """Typed DataFrame for rows already fetched, e.g. a cached page"""
+    if not rows:
+        return pd.DataFrame(columns=list(columns))
+    kinds = [value_kind(name, values) for name, values in zip(columns, zip(*rows))]
+    builder = FrameBuilder(columns, kinds)
+    builder.add(rows)
+    return builder.build()
+
+
+def _builder_for(cursor, rows: Sequence[Tuple[Any, ...]]) -> FrameBuilder:
+    names, kinds = [], []
+    columns = list(zip(*rows)) if rows else [()] * len(cursor.description)
+    for desc, values in zip(cursor.description, columns):
+        flags = desc[7] if len(desc) > 7 and desc[7] else 0
+        names.append(desc[0])
+        kinds.append(description_kind(desc[0], desc[1], flags, values))
+    return FrameBuilder(names, kinds)
+
+
+def iter_frames(conn, sql: str, params: Optional[Sequence[Any]] = None, chunk_size: int = CHUNK_SIZE,
+                infer_categories: bool = True) -> Iterator[Tuple[FrameBuilder, pd.DataFrame]]:
+    """Typed DataFrames of at most chunk_size rows each, with the builder describing their columns"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params or ())
+        builder = None
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if builder is None:
+                builder = _builder_for(cursor, rows)
+            if not rows:
+                break
+            builder.add(rows)
+            yield builder, builder.build(infer_categories)
+    finally:
+        cursor.close()
+
+
+def read_frame(conn, sql: str, params: Optional[Sequence[Any]] = None,
+               chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """Run a query and return its result as one typed DataFrame, fetched chunk by chunk"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params or ())
+        rows = cursor.fetchmany(chunk_size)
+        builder = _builder_for(cursor, rows)
+        while rows:
+            builder.add(rows)
+            rows = cursor.fetchmany(chunk_size)
+        return builder.build()
+    finally:
+        cursor.close()
+
+
+def memory_bytes(frame: pd.DataFrame) -> int:
+    """Bytes held by a DataFrame, counting the Python objects in object columns"""
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+# --- Arrow Export ---
+def arrow_schema(builder: FrameBuilder) -> "pa.Schema":
+    """Arrow types for a builder's columns, fixed for the whole stream"""
+    types = {INT: pa.int64(), FLOAT: pa.float64(), DATETIME: pa.timestamp("ns"),
+             CATEGORY: pa.dictionary(pa.int32(), pa.string()), TEXT: pa.string()}
+    return pa.schema([(name, types[kind]) for name, kind in zip(builder.names, builder.kinds)])
+
+
+def iter_arrow_stream(conn, sql: str, params: Optional[Sequence[Any]] = None,
+                      chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Arrow IPC stream bytes, one record batch per chunk (dictionaries are replaced per batch)"""
+    if pa is None:
+        raise RuntimeError("Arrow exports need pyarrow installed")
+    sink = io.BytesIO()
+    writer = None
+    for builder, frame in iter_frames(conn, sql, params, chunk_size, infer_categories=False):
+        if writer is None:
+            schema = arrow_schema(builder)
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is not None:
+        writer.close()
+        yield sink.getvalue()
@@ -0,0 +1,192 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional
+
+import cache
+import db
+from customers import (CreatedCustomer, DuplicatePhoneError, RoundTripCursor, ValidationError, create_customer,
+                       insert_lead_batch, validate_customer_data)
+
+logger = logging.getLogger(__name__)
+
+# --- Group Commit ---
+# Opt-in write mode for lead-only customers (no vehicle). Callers hand their
+# lead to one writer thread per process and wait; the writer takes whatever
+# arrives within MAX_WAIT_MS of the first lead, up to MAX_BATCH, and inserts
+# the whole batch with insert_lead_batch in one transaction, so a burst of
+# lead forms pays for one COMMIT (one redo log flush) instead of one each.
+# If anything in a batch fails, its leads are written one by one instead so
+# every caller still gets its own customer_id or its own error.
+ENABLED = os.getenv("CRM_GROUP_COMMIT", "false").strip().lower() in ("1", "true", "yes", "on")
+MAX_BATCH = int(os.getenv("CRM_GROUP_COMMIT_MAX_BATCH", 64))
+MAX_WAIT_MS = float(os.getenv("CRM_GROUP_COMMIT_MAX_WAIT_MS", 5))
+
+BeforeCommit = Callable[[Any, CreatedCustomer], None]
+
+
+@dataclass
+class _Pending:
+    name: str
+    email: str
+    phone: str
+    before_commit: Optional[BeforeCommit]
+    future: Future
+
+
+class GroupCommitWriter:
+    """Background thread that commits queued lead creations in batches"""
+
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._counters = {"leads": 0, "batches": 0, "fallback_batches": 0}
+        self._counters_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, name: str, email: str, phone: str,
+               before_commit: Optional[BeforeCommit] = None) -> CreatedCustomer:
+        """Queue a validated lead and wait for the batch it lands in to commit"""
+        pending = _Pending(name, email, phone, before_commit, Future())
+        self._queue.put(pending)
+        return pending.future.result()
+
+    def close(self):
+        """Write what is queued, then stop the thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        counters["queued"] = self._queue.qsize()
+        counters["mean_batch"] = round(counters["leads"] / counters["batches"], 2) if counters["batches"] else 0.0
+        return counters
+
+    # --- Writer Thread ---
+    def _collect(self, first: _Pending) -> List[_Pending]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                self._queue.put(None)  # let _run see the stop after this batch
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            try:
+                self._write(batch)
+            except BaseException as e:  # never leave a caller waiting
+                logger.error(f"Group commit batch of {len(batch)} failed: {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def _write(self, batch: List[_Pending]):
+        # Later copies of a phone within the batch lose, as they would have
+        # against the UNIQUE index one transaction later
+        writable: Dict[str, _Pending] = {}
+        for pending in batch:
+            if pending.phone in writable:
+                pending.future.set_exception(DuplicatePhoneError("Phone number already exists in database"))
+            else:
+                writable[pending.phone] = pending
+
+        try:
+            with db.get_connection() as conn:
+                cursor = RoundTripCursor(conn.cursor(buffered=True))
+                ids, existing = insert_lead_batch(cursor, [(p.name, p.email, p.phone) for p in writable.values()])
+                created = {
+                    phone: CreatedCustomer(ids[phone], None, None, None, round_trips=cursor.round_trips)
+                    for phone in ids
+                }
+                for phone, outcome in created.items():
+                    if writable[phone].before_commit is not None:
+                        writable[phone].before_commit(cursor, outcome)
+                conn.commit()
+                cursor.round_trips += 1
+                cursor.close()
+        except Exception as e:
+            # A phone taken since the duplicate check, or a before_commit hook
+            # refusing, spoils the whole batch; retry each lead on its own
+            logger.info(f"Group commit batch of {len(writable)} rolled back ({e}); writing leads singly")
+            self._count(fallback_batches=1)
+            for pending in writable.values():
+                self._write_one(pending)
+            return
+
+        if created:
+            cache.invalidate("Customer", "Follow_ups")
+        self._count(batches=1, leads=len(created))
+        for phone, pending in writable.items():
+            if phone in existing:
+                pending.future.set_exception(DuplicatePhoneError("Phone number already exists in database"))
+            else:
+                # round_trips is the batch's, shared by every lead in it
+                pending.future.set_result(replace(created[phone], round_trips=cursor.round_trips))
+
+    def _write_one(self, pending: _Pending):
+        try:
+            pending.future.set_result(
+                create_customer(pending.name, pending.email, pending.phone, before_commit=pending.before_commit)
+            )
+        except Exception as e:
+            pending.future.set_exception(e)
+
+    def _count(self, **deltas: int):
+        with self._counters_lock:
+            for name, value in deltas.items():
+                self._counters[name] += value
+
+
+# --- Process Writer ---
+_writer: Optional[GroupCommitWriter] = None
+_writer_pid: Optional[int] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> GroupCommitWriter:
+    """This process's writer, started on first use (and again in a forked child)"""
+    global _writer, _writer_pid
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer, _writer_pid = GroupCommitWriter(), os.getpid()
+        return _writer
+
+
+def create_lead(name: str, email: str, phone: str,
+                before_commit: Optional[BeforeCommit] = None) -> CreatedCustomer:
+    """create_customer for a lead without a vehicle, committed with whatever else is queued
+
+    Raises the same ValidationError subclasses as create_customer.
+    """
+    name, email, phone = (name or "").strip(), (email or "").strip(), (phone or "").strip()
+    errors = validate_customer_data(name, email, phone)
+    if errors:
+        raise ValidationError("; ".join(errors), errors)
+    created = get_writer().submit(name, email, phone, before_commit)
+    db.mark_write()  # the writer thread committed outside this session's context
+    return created
+
+
+def stats() -> Dict[str, Any]:
+    """Batching counters of this process's writer; empty before its first lead"""
+    writer = _writer
+    return writer.stats() if writer is not None and _writer_pid == os.getpid() else {}
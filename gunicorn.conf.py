@@ -0,0 +1,49 @@
+import logging
+import multiprocessing
+import os
+
+# --- Production Serving ---
+# gunicorn -c gunicorn.conf.py
+#
+# Pre-forked workers, each running a few request threads. The app is not
+# preloaded: every worker imports api and calls create_app() after the fork,
+# so each one opens its own database pool (up to CRM_DB_POOL_SIZE +
+# CRM_DB_POOL_OVERFLOW connections; keep that at or above CRM_WEB_THREADS).
+#
+# Graceful reload: `kill -HUP <master pid>` starts new workers with the current
+# code and config, then stops the old ones once their in-flight requests finish
+# (up to graceful_timeout). `kill -TERM` drains the same way before exiting.
+wsgi_app = "api:create_app()"
+bind = os.getenv("CRM_WEB_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+workers = int(os.getenv("CRM_WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("CRM_WEB_THREADS", 4))
+worker_class = "gthread"
+preload_app = False
+
+# A worker that stops answering the master for this long is killed and
+# replaced. gthread workers heartbeat from their main loop, so this catches a
+# wedged worker, not one slow request: queries are bounded by
+# CRM_DB_STATEMENT_TIMEOUT_MS and pool waits by CRM_DB_POOL_TIMEOUT.
+timeout = int(os.getenv("CRM_WEB_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("CRM_WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Workers import db after the fork and inherit this, so under gunicorn every
+# SELECT (streamed exports included) is cancelled after 30s unless overridden
+os.environ.setdefault("CRM_DB_STATEMENT_TIMEOUT_MS", "30000")
+
+# Recycle workers now and then so slow leaks cannot build up; jitter keeps
+# them from restarting together
+max_requests = int(os.getenv("CRM_WEB_MAX_REQUESTS", 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("CRM_WEB_ACCESS_LOG") or None  # "-" for stdout
+loglevel = os.getenv("CRM_WEB_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # Nothing is preloaded, so there is no parent pool to drop; db resets
+    # itself after any fork regardless (db._reset_after_fork)
+    logging.basicConfig(level=logging.INFO)
+    server.log.info(f"Worker {worker.pid} started with {threads} threads")
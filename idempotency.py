@@ -0,0 +1,150 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# --- Idempotency Keys ---
+# A client may send an Idempotency-Key with a write. The first successful
+# attempt stores its response under the key in the same transaction as the
+# write, so a retry after a timeout gets that response back from one primary
+# key lookup instead of running the write again. Recent keys are also kept in
+# a small per-process LRU. Keys expire after KEY_TTL_SECONDS; expired rows are
+# deleted by `python idempotency.py purge` (run from cron) and can be reused.
+KEY_TTL_SECONDS = int(os.getenv("CRM_IDEMPOTENCY_TTL", 24 * 3600))
+LRU_SIZE = int(os.getenv("CRM_IDEMPOTENCY_CACHE_SIZE", 1024))
+MAX_KEY_LENGTH = 255
+PURGE_BATCH_SIZE = 1000
+
+LOOKUP_SQL = """
+    SELECT fingerprint, status_code, response, UNIX_TIMESTAMP(expires_at)
+    FROM Idempotency_key
+    WHERE idem_key = %s AND expires_at > NOW()
+"""
+
+# Takes over an expired row in place; a live one is left as is (rowcount 0).
+# expires_at is assigned last because later assignments see its new value.
+RECORD_SQL = """
+    INSERT INTO Idempotency_key (idem_key, fingerprint, status_code, response, expires_at)
+    VALUES (%s, %s, %s, %s, NOW() + INTERVAL %s SECOND)
+    ON DUPLICATE KEY UPDATE
+        fingerprint = IF(expires_at <= NOW(), VALUES(fingerprint), fingerprint),
+        status_code = IF(expires_at <= NOW(), VALUES(status_code), status_code),
+        response = IF(expires_at <= NOW(), VALUES(response), response),
+        expires_at = IF(expires_at <= NOW(), VALUES(expires_at), expires_at)
+"""
+
+
+class KeyInUseError(Exception):
+    """Raised when a live idempotency key already holds another attempt's outcome"""
+    pass
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    """The outcome of the first attempt made with a key"""
+    fingerprint: str  # hash of the request the key was first used with
+    status_code: int
+    body: Dict[str, Any]
+    expires_at: float  # epoch seconds
+
+
+_lru: "OrderedDict[str, StoredResponse]" = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def check_key(key: str) -> str:
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    return key
+
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of a JSON request body"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def remember(key: str, stored: StoredResponse):
+    """Keep a committed outcome in this process's LRU"""
+    with _lru_lock:
+        _lru[key] = stored
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def lookup(key: str) -> Optional[StoredResponse]:
+    """Stored outcome for a live key, from the LRU or the primary"""
+    with _lru_lock:
+        stored = _lru.get(key)
+        if stored is not None:
+            if stored.expires_at > time.time():
+                _lru.move_to_end(key)
+                return stored
+            del _lru[key]
+
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(LOOKUP_SQL, (key,))
+        row = cursor.fetchone()
+        cursor.close()
+    if row is None:
+        return None
+    request_hash, status_code, response, expires_at = row
+    stored = StoredResponse(request_hash, int(status_code), json.loads(response), float(expires_at))
+    remember(key, stored)
+    return stored
+
+
+def record(cursor, key: str, request_hash: str, status_code: int, body: Dict[str, Any],
+           ttl_seconds: int = KEY_TTL_SECONDS) -> StoredResponse:
+    """Store an outcome under key inside the caller's transaction
+
+    Raises KeyInUseError if a live row already has the key; a concurrent
+    attempt holding it uncommitted makes this wait for that transaction.
+    """
+    cursor.execute(RECORD_SQL, (key, request_hash, status_code, json.dumps(body, default=str), ttl_seconds))
+    if cursor.rowcount == 0:
+        raise KeyInUseError("Idempotency-Key was already used")
+    return StoredResponse(request_hash, status_code, body, time.time() + ttl_seconds)
+
+
+def purge_expired(limit: int = PURGE_BATCH_SIZE) -> int:
+    """Delete expired keys limit rows per transaction; returns how many"""
+    purged = 0
+    while True:
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM Idempotency_key WHERE expires_at <= NOW() ORDER BY expires_at LIMIT %s",
+                           (limit,))
+            deleted = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        purged += deleted
+        if deleted < limit:
+            return purged
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="API idempotency keys")
+    parser.add_argument("command", choices=["purge"])
+    parser.add_argument("--limit", type=int, default=PURGE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"Purged {purge_expired(args.limit)} expired idempotency key(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("crm.slow_queries")
+
+# --- Configuration ---
+ENABLED = os.getenv("CRM_QUERY_INSTRUMENTATION", "true").strip().lower() in ("1", "true", "yes", "on")
+SLOW_QUERY_SECONDS = float(os.getenv("CRM_SLOW_QUERY_MS", 200)) / 1000
+SLOW_QUERY_LOG = os.getenv("CRM_SLOW_QUERY_LOG")  # file path; otherwise slow queries go to normal logging
+MAX_SCOPE_QUERIES = 500  # per request/rerun records kept for the summary
+
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_query_logger.addHandler(_handler)
+    slow_query_logger.setLevel(logging.WARNING)
+
+
+# --- Records ---
+@dataclass
+class QueryRecord:
+    """One statement: execute plus any fetches of its results"""
+    name: str
+    sql: str
+    started: float
+    seconds: float = 0.0
+    rows: int = 0
+    finished: bool = False
+
+
+@dataclass
+class Scope:
+    """Queries issued during one Flask request or Streamlit rerun"""
+    name: str
+    started: float = field(default_factory=time.perf_counter)
+    queries: List[QueryRecord] = field(default_factory=list)
+    query_count: int = 0
+    db_seconds: float = 0.0
+    acquire_seconds: float = 0.0
+    rows: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        by_name: Dict[str, List[float]] = {}
+        for record in self.queries:
+            totals = by_name.setdefault(record.name, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += record.seconds
+            totals[2] += record.rows
+        return {
+            "scope": self.name,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "queries": self.query_count,
+            "db_ms": round(self.db_seconds * 1000, 1),
+            "acquire_ms": round(self.acquire_seconds * 1000, 1),
+            "rows": self.rows,
+            "by_query": [
+                {"name": name, "calls": calls, "ms": round(seconds * 1000, 1), "rows": rows}
+                for name, (calls, seconds, rows) in sorted(by_name.items(), key=lambda item: -item[1][1])
+            ],
+        }
+
+
+_scope: contextvars.ContextVar[Optional[Scope]] = contextvars.ContextVar("crm_query_scope", default=None)
+_query_name: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("crm_query_name", default=None)
+
+
+# --- Process-wide Metrics ---
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets: Tuple[float, ...] = HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield "_bucket", f'le="{bound}"', running
+        running += self.counts[-1]
+        yield "_bucket", 'le="+Inf"', running
+        yield "_sum", "", self.total
+        yield "_count", "", running
+
+
+class _Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.query_seconds: Dict[str, Histogram] = {}
+        self.query_rows: Dict[str, int] = {}
+        self.slow_queries: Dict[str, int] = {}
+        self.acquire_seconds = Histogram()
+        self.scope_db_seconds: Dict[str, Histogram] = {}
+        self.scope_queries: Dict[str, int] = {}
+
+    def record_query(self, record: QueryRecord):
+        with self.lock:
+            self.query_seconds.setdefault(record.name, Histogram()).observe(record.seconds)
+            self.query_rows[record.name] = self.query_rows.get(record.name, 0) + record.rows
+            if record.seconds >= SLOW_QUERY_SECONDS:
+                self.slow_queries[record.name] = self.slow_queries.get(record.name, 0) + 1
+
+    def record_scope(self, scope: Scope):
+        with self.lock:
+            self.scope_db_seconds.setdefault(scope.name, Histogram()).observe(scope.db_seconds)
+            self.scope_queries[scope.name] = self.scope_queries.get(scope.name, 0) + scope.query_count
+
+
+_metrics = _Metrics()
+
+
+# --- Query Naming ---
+_SKIP_MODULES = ("instrumentation", "db", "pandas", "mysql", "contextlib", "sqlalchemy", "cache")
+_SKIP_FUNCTIONS = ("execute", "executemany", "__getattr__", "<lambda>")
+
+
+def _caller_name() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.split(".")[0] not in _SKIP_MODULES and frame.f_code.co_name not in _SKIP_FUNCTIONS:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+@contextmanager
+def named(name: str):
+    """Label every statement issued in the block, overriding the calling function's name"""
+    token = _query_name.set(name)
+    try:
+        yield
+    finally:
+        _query_name.reset(token)
+
+
+# --- Recording ---
+def _finish(record: QueryRecord):
+    if record.finished:
+        return
+    record.finished = True
+    _metrics.record_query(record)
+    scope = _scope.get()
+    if scope is not None:
+        scope.db_seconds += record.seconds
+        scope.rows += record.rows
+    if record.seconds >= SLOW_QUERY_SECONDS:
+        sql = " ".join(record.sql.split())
+        slow_query_logger.warning(
+            f"slow query {record.name}: {record.seconds * 1000:.1f} ms, {record.rows} rows"
+            f"{f' [{scope.name}]' if scope else ''}: {sql[:500]}"
+        )
+
+
+def record_acquire(seconds: float):
+    """Time spent waiting for a pooled connection"""
+    if not ENABLED:
+        return
+    with _metrics.lock:
+        _metrics.acquire_seconds.observe(seconds)
+    scope = _scope.get()
+    if scope is not None:
+        scope.acquire_seconds += seconds
+
+
+class InstrumentedCursor:
+    """Cursor proxy timing each statement and counting the rows it returns"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._record: Optional[QueryRecord] = None
+
+    def _start(self, sql: str):
+        if self._record is not None:
+            _finish(self._record)
+        self._record = QueryRecord(_query_name.get() or _caller_name(), sql, time.perf_counter())
+        scope = _scope.get()
+        if scope is not None:
+            scope.query_count += 1
+            if len(scope.queries) < MAX_SCOPE_QUERIES:
+                scope.queries.append(self._record)
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._record is not None:
+                self._record.seconds += time.perf_counter() - started
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._start(operation)
+        result = self._timed(lambda: self._cursor.execute(operation, params, *args, **kwargs))
+        if self._cursor.description is None and self._cursor.rowcount and self._cursor.rowcount > 0:
+            self._record.rows = self._cursor.rowcount  # rows changed by DML
+        return result
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._start(operation)
+        result = self._timed(lambda: self._cursor.executemany(operation, seq_params, *args, **kwargs))
+        if self._cursor.rowcount and self._cursor.rowcount > 0:
+            self._record.rows = self._cursor.rowcount
+        return result
+
+    def _fetched(self, rows):
+        if self._record is not None and rows:
+            self._record.rows += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None and self._record is not None:
+            self._record.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        return self._fetched(self._timed(lambda: self._cursor.fetchmany(size) if size else self._cursor.fetchmany()))
+
+    def fetchall(self):
+        return self._fetched(self._timed(self._cursor.fetchall))
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        if self._record is not None:
+            _finish(self._record)
+            self._record = None
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def wrap_cursor(cursor):
+    """Instrument a DB-API cursor when instrumentation is enabled"""
+    return InstrumentedCursor(cursor) if ENABLED else cursor
+
+
+# --- Scopes ---
+def begin(name: str) -> Scope:
+    """Start collecting queries for a request or rerun in the current context"""
+    if _scope.get() is not None:
+        end()  # the previous rerun stopped early (st.rerun, st.stop or an error)
+    scope = Scope(name)
+    _scope.set(scope)
+    return scope
+
+
+def current() -> Optional[Scope]:
+    return _scope.get()
+
+
+def end() -> Optional[Dict[str, Any]]:
+    """Close the current scope and return its summary"""
+    scope = _scope.get()
+    if scope is None:
+        return None
+    for record in scope.queries:
+        _finish(record)  # statements whose cursor was never closed
+    _scope.set(None)
+    _metrics.record_scope(scope)
+    summary = scope.summary()
+    logger.debug(f"{scope.name}: {summary['queries']} queries, {summary['db_ms']} ms in MySQL, "
+                 f"{summary['acquire_ms']} ms waiting for connections")
+    return summary
+
+
+# --- Prometheus Exposition ---
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(gauges: Optional[Dict[str, float]] = None) -> str:
+    """Metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines: List[str] = []
+
+    def histogram(metric: str, help_text: str, label: Optional[str], series: Dict[str, Histogram]):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for key, hist in sorted(series.items()):
+            base = f'{label}="{_escape(key)}"' if label else ""
+            for suffix, extra, value in hist.samples():
+                labels = ",".join(part for part in (base, extra) if part)
+                lines.append(f"{metric}{suffix}{{{labels}}} {value}" if labels else f"{metric}{suffix} {value}")
+
+    def counter(metric: str, help_text: str, label: str, series: Dict[str, float]):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for key, value in sorted(series.items()):
+            lines.append(f'{metric}{{{label}="{_escape(key)}"}} {value}')
+
+    with _metrics.lock:
+        histogram("crm_query_duration_seconds", "Statement time including result fetches", "query",
+                  _metrics.query_seconds)
+        counter("crm_query_rows_total", "Rows returned or changed", "query", _metrics.query_rows)
+        counter("crm_slow_queries_total", f"Statements slower than {SLOW_QUERY_SECONDS}s", "query",
+                _metrics.slow_queries)
+        histogram("crm_connection_acquire_seconds", "Time waiting for a pooled connection", None,
+                  {"": _metrics.acquire_seconds})
+        histogram("crm_scope_db_seconds", "MySQL time per request or rerun", "scope", _metrics.scope_db_seconds)
+        counter("crm_scope_queries_total", "Statements issued per request or rerun", "scope",
+                _metrics.scope_queries)
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,249 @@
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Dict, Optional, Tuple
+
+from db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+# --- Stock Depletion ---
+# Vehicle_stock holds SUM(stock) per (manufacturer, model, year) so a sale only
+# touches its own model-year group instead of aggregating the whole inventory.
+#
+# Vehicle rows carry a version that every stock, hold or status change bumps.
+# Writers read a snapshot without locking, decide in Python, then apply the
+# change with UPDATE ... WHERE version = <snapshot version>. A lost race
+# matches no row and is retried against a fresh snapshot, so row locks are
+# only held from the guarded UPDATE to COMMIT and stock can never go negative.
+CAS_MAX_RETRIES = int(os.getenv("CRM_STOCK_CAS_RETRIES", 8))
+CAS_BACKOFF_SECONDS = float(os.getenv("CRM_STOCK_CAS_BACKOFF", 0.002))
+
+READ_VEHICLE_SQL = """
+    SELECT v.manufacturer, v.model, v.year, v.price, v.stock, v.reserved, v.status, v.version{held}
+    FROM Vehicle v
+    WHERE v.vehicle_id = %s
+"""
+
+# Whether the snapshot includes an unexpired hold with the given token
+HELD_COLUMN_SQL = """,
+        EXISTS (
+            SELECT 1 FROM Vehicle_reservation r
+            WHERE r.vehicle_id = v.vehicle_id AND r.token = %s AND r.expires_at > NOW()
+        )"""
+
+# Decrements the vehicle and its group total in one guarded statement. Every
+# unit sold goes to a new customer, so the inventory grid's buyer count is
+# kept here too rather than counted from Customer on each render.
+SELL_UNIT_SQL = """
+    UPDATE Vehicle v
+    LEFT JOIN Vehicle_stock s
+        ON s.manufacturer = v.manufacturer AND s.model = v.model AND s.year = v.year
+    SET v.stock = v.stock - 1, {reserved}v.status = %s, v.version = v.version + 1,
+        v.customers_assigned = v.customers_assigned + 1,
+        s.total_stock = s.total_stock - 1
+    WHERE v.vehicle_id = %s AND v.version = %s
+"""
+
+SET_RESERVED_SQL = """
+    UPDATE Vehicle SET reserved = %s, status = %s, version = version + 1
+    WHERE vehicle_id = %s AND version = %s
+"""
+
+GROUP_STOCK_SQL = """
+    SELECT s.total_stock FROM Vehicle_stock s
+    WHERE s.manufacturer = %s AND s.model = %s AND s.year = %s
+"""
+
+# Joins from the single Vehicle_stock row, so nothing in Vehicle is read or
+# locked unless the group has actually run out.
+MARK_GROUP_SOLD_SQL = """
+    UPDATE Vehicle_stock s
+    JOIN Vehicle v
+        ON v.manufacturer = s.manufacturer AND v.model = s.model AND v.year = s.year
+    SET v.status = 'Sold', v.version = v.version + 1
+    WHERE s.manufacturer = %s AND s.model = %s AND s.year = %s
+    AND s.total_stock <= 0
+    AND v.status <> 'Sold'
+"""
+
+
+class StockConflictError(DatabaseError):
+    """Raised when a vehicle kept changing under every compare-and-swap attempt"""
+    pass
+
+
+@dataclass(frozen=True)
+class VehicleForSale:
+    """A vehicle snapshot read at the start of a stock-changing transaction"""
+    vehicle_id: int
+    manufacturer: str
+    model: str
+    year: int
+    price: Decimal
+    stock: int
+    reserved: int  # units held by unexpired reservations
+    status: str
+    version: int
+    held: bool = False  # the caller's reservation token holds a unit
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.manufacturer} {self.model} ({self.year})"
+
+    @property
+    def free_stock(self) -> int:
+        return self.stock - self.reserved
+
+
+@dataclass(frozen=True)
+class CasOutcome:
+    """Result of a versioned change to one vehicle"""
+    vehicle: Optional[VehicleForSale]  # snapshot the change was decided on; None if no such vehicle
+    applied: bool
+    retries: int
+
+
+def read_vehicle(cursor, vehicle_id: int, token: Optional[str] = None) -> Optional[VehicleForSale]:
+    """Unlocked snapshot of a vehicle, optionally checking a reservation token"""
+    if token:
+        cursor.execute(READ_VEHICLE_SQL.format(held=HELD_COLUMN_SQL), (token, vehicle_id))
+    else:
+        cursor.execute(READ_VEHICLE_SQL.format(held=""), (vehicle_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    manufacturer, model, year, price, stock, reserved, status, version, *held = row
+    return VehicleForSale(vehicle_id, manufacturer, model, year, price, stock, reserved, status, version,
+                          held=bool(held and held[0]))
+
+
+def next_status(status: str, stock: int, reserved: int) -> str:
+    """Status after a stock or hold change; 'Sold' is only set for sold-out groups"""
+    if status == "Sold":
+        return status
+    if reserved > 0 and stock - reserved <= 0:
+        return "Reserved"
+    if status == "Reserved":
+        return "Available"
+    return status
+
+
+def with_vehicle_version(conn, cursor, vehicle_id: int, change: Callable[[VehicleForSale], Optional[bool]],
+                         token: Optional[str] = None) -> CasOutcome:
+    """Apply change to a fresh snapshot until its version guard holds
+
+    change runs the guarded UPDATE(s) and returns True when they matched,
+    False when the version moved on, or None when the snapshot rules the change
+    out (no stock, no hold). Must be the first work in the transaction: a lost
+    race is rolled back so the next read gets a new snapshot.
+    """
+    for attempt in range(CAS_MAX_RETRIES + 1):
+        vehicle = read_vehicle(cursor, vehicle_id, token)
+        if vehicle is None:
+            return CasOutcome(None, False, attempt)
+        applied = change(vehicle)
+        if applied is None or applied:
+            return CasOutcome(vehicle, bool(applied), attempt)
+        conn.rollback()
+        time.sleep(random.uniform(0, CAS_BACKOFF_SECONDS * (2 ** attempt)))
+    raise StockConflictError(f"Vehicle {vehicle_id} is busy; gave up after {CAS_MAX_RETRIES} retries")
+
+
+def sell_unit(conn, cursor, vehicle_id: int, token: Optional[str] = None) -> CasOutcome:
+    """Take one unit of a vehicle out of stock inside the caller's transaction
+
+    Without a token only unreserved stock can be sold; with the token of an
+    unexpired hold the held unit is sold and the hold removed. When the last
+    unit of the model-year group goes, every vehicle in that group is marked
+    'Sold'. Not applied when there is nothing sellable.
+    """
+    def change(vehicle: VehicleForSale) -> Optional[bool]:
+        if token:
+            if not vehicle.held or vehicle.stock <= 0:
+                return None
+            reserved = vehicle.reserved - 1
+        else:
+            if vehicle.free_stock <= 0:
+                return None
+            reserved = vehicle.reserved
+        status = next_status(vehicle.status, vehicle.stock - 1, reserved)
+        cursor.execute(
+            SELL_UNIT_SQL.format(reserved="v.reserved = v.reserved - 1, " if token else ""),
+            (status, vehicle.vehicle_id, vehicle.version)
+        )
+        return cursor.rowcount > 0
+
+    outcome = with_vehicle_version(conn, cursor, vehicle_id, change, token)
+    if not outcome.applied:
+        return outcome
+
+    vehicle = outcome.vehicle
+    if token:
+        cursor.execute("DELETE FROM Vehicle_reservation WHERE token = %s", (token,))
+
+    # The UPDATE locked the group row, so this read sees every committed sale
+    group = (vehicle.manufacturer, vehicle.model, vehicle.year)
+    cursor.execute(GROUP_STOCK_SQL, group)
+    row = cursor.fetchone()
+    if row is not None and row[0] <= 0:
+        cursor.execute(MARK_GROUP_SOLD_SQL, group)
+        logger.info(f"{vehicle.display_name} sold out; {cursor.rowcount} vehicle(s) marked Sold")
+    return outcome
+
+
+def _dashboard_flags(stock: int, status: str) -> Tuple[int, int]:
+    # Mirrors kpi.rebuild_summary: (counted available, counted sold)
+    return int(stock > 0 and status == "Available"), int(stock <= 0 or status == "Sold")
+
+
+def status_deltas(vehicle: VehicleForSale, stock: int, status: str) -> Dict[str, int]:
+    """KPI counter changes when a vehicle moves from its snapshot to stock/status
+
+    Marking the rest of a sold-out group adds nothing because those vehicles
+    are already at zero stock.
+    """
+    available_before, sold_before = _dashboard_flags(vehicle.stock, vehicle.status)
+    available_after, sold_after = _dashboard_flags(stock, status)
+    deltas = {}
+    if available_after != available_before:
+        deltas["vehicles_available"] = available_after - available_before
+    if sold_after != sold_before:
+        deltas["vehicles_sold"] = sold_after - sold_before
+    return deltas
+
+
+def sale_status_deltas(vehicle: VehicleForSale) -> Dict[str, int]:
+    """KPI counter changes when one unit of the snapshot vehicle is sold"""
+    reserved = vehicle.reserved - 1 if vehicle.held else vehicle.reserved
+    return status_deltas(vehicle, vehicle.stock - 1, next_status(vehicle.status, vehicle.stock - 1, reserved))
+
+
+def rebuild_stock_totals(cursor):
+    """Recompute Vehicle_stock from Vehicle, e.g. after bulk inventory loads"""
+    cursor.execute("DELETE FROM Vehicle_stock")
+    cursor.execute("""
+        INSERT INTO Vehicle_stock (manufacturer, model, year, total_stock)
+        SELECT manufacturer, model, year, COALESCE(SUM(stock), 0)
+        FROM Vehicle
+        GROUP BY manufacturer, model, year
+    """)
+
+
+def rebuild_customer_counts(cursor):
+    """Recompute Vehicle.customers_assigned from Customer, e.g. after bulk loads or deletes"""
+    cursor.execute("UPDATE Vehicle SET customers_assigned = 0 WHERE customers_assigned <> 0")
+    cursor.execute("""
+        UPDATE Vehicle v
+        JOIN (
+            SELECT vehicle_id, COUNT(*) AS assigned
+            FROM Customer
+            WHERE vehicle_id IS NOT NULL
+            GROUP BY vehicle_id
+        ) c ON c.vehicle_id = v.vehicle_id
+        SET v.customers_assigned = c.assigned
+    """)
@@ -0,0 +1,123 @@
+import argparse
+import logging
+import random
+from typing import Any, Dict, List, Optional
+
+import db
+import inventory
+
+logger = logging.getLogger(__name__)
+
+# --- Dashboard KPI Counters ---
+# Counters live in SUMMARY_SLOTS rows and each write bumps one random slot, so
+# concurrent customer/sale transactions rarely wait on the same row lock.
+# Reads add up the slots: a fixed handful of rows whatever the table sizes.
+SUMMARY_SLOTS = 16
+
+COUNTERS = (
+    "total_customers",
+    "customers_with_vehicles",
+    "sales_count",
+    "total_sales_value",
+    "vehicles_total",
+    "vehicles_available",
+    "vehicles_sold",
+    "vehicle_price_sum",
+)
+
+READ_SUMMARY_SQL = "SELECT " + ", ".join(f"COALESCE(SUM({c}), 0)" for c in COUNTERS) + " FROM Dashboard_summary"
+
+
+def record(cursor, **deltas):
+    """Apply counter deltas inside the caller's transaction with a single UPDATE"""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown KPI counter(s): {', '.join(sorted(unknown))}")
+    assignments = ", ".join(f"{name} = {name} + %s" for name in deltas)
+    cursor.execute(
+        f"UPDATE Dashboard_summary SET {assignments} WHERE slot = %s",
+        (*deltas.values(), random.randrange(SUMMARY_SLOTS))
+    )
+
+
+def read_summary() -> Dict[str, Any]:
+    """Current KPI values, including the derived leads and average price"""
+    with db.get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(READ_SUMMARY_SQL)
+        values = dict(zip(COUNTERS, cursor.fetchone()))
+        cursor.close()
+
+    summary = {name: int(values[name]) for name in COUNTERS
+               if name not in ("total_sales_value", "vehicle_price_sum")}
+    summary["total_sales_value"] = float(values["total_sales_value"])
+    summary["leads_only"] = summary["total_customers"] - summary["customers_with_vehicles"]
+    summary["avg_vehicle_price"] = (
+        float(values["vehicle_price_sum"]) / summary["vehicles_total"] if summary["vehicles_total"] else 0.0
+    )
+    return summary
+
+
+def rebuild_summary(cursor):
+    """Recompute every counter from the base tables into slot 0"""
+    cursor.execute("DELETE FROM Dashboard_summary")
+    cursor.executemany(
+        "INSERT INTO Dashboard_summary (slot) VALUES (%s)",
+        [(slot,) for slot in range(SUMMARY_SLOTS)]
+    )
+    cursor.execute("""
+        UPDATE Dashboard_summary d
+        CROSS JOIN (
+            SELECT
+                COUNT(*) AS total_customers,
+                COALESCE(SUM(vehicle_id IS NOT NULL OR model_purchased IS NOT NULL), 0) AS customers_with_vehicles
+            FROM Customer
+        ) c
+        CROSS JOIN (
+            SELECT COUNT(*) AS sales_count, COALESCE(SUM(sale_amount), 0) AS total_sales_value
+            FROM Sales
+        ) s
+        CROSS JOIN (
+            SELECT
+                COUNT(*) AS vehicles_total,
+                COALESCE(SUM(stock > 0 AND status = 'Available'), 0) AS vehicles_available,
+                COALESCE(SUM(stock <= 0 OR status = 'Sold'), 0) AS vehicles_sold,
+                COALESCE(SUM(price), 0) AS vehicle_price_sum
+            FROM Vehicle
+        ) v
+        SET d.total_customers = c.total_customers,
+            d.customers_with_vehicles = c.customers_with_vehicles,
+            d.sales_count = s.sales_count,
+            d.total_sales_value = s.total_sales_value,
+            d.vehicles_total = v.vehicles_total,
+            d.vehicles_available = v.vehicles_available,
+            d.vehicles_sold = v.vehicles_sold,
+            d.vehicle_price_sum = v.vehicle_price_sum
+        WHERE d.slot = 0
+    """)
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="CRM dashboard KPI counters")
+    parser.add_argument("command", choices=["rebuild", "show"])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "rebuild":
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            rebuild_summary(cursor)
+            inventory.rebuild_customer_counts(cursor)
+            conn.commit()
+        print("KPI counters and vehicle customer counts rebuilt")
+    for name, value in read_summary().items():
+        print(f"{name:<26} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,36 @@
 import streamlit as st
-import mysql.connector
 from mysql.connector import Error
 import pandas as pd
 from datetime import datetime, timedelta
 import requests
 import logging
 from contextlib import contextmanager
+import os
+import uuid
 from typing import Optional, List, Tuple
-from flask import Flask
 
-app = Flask(__name__)
+import cache
+import customers
+import db
+import followups
+import frames
+import instrumentation
+import kpi
+import profiling
+import queries
+import schema
+from customers import ValidationError
+from db import DatabaseError, PoolTimeoutError
 
-@app.route('/')
-def home():
-    return 'Hello, Render!'
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Profile this rerun when CRM_PROFILE is set; stopped at the footer
+profiling.start("streamlit")
+# Collect every query issued during this rerun; summarised at the footer
+instrumentation.begin("streamlit")
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="CRM Dashboard",
@@ -25,6 +38,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Reads stay on the primary briefly after this session writes (see db.get_read_connection)
+db.bind_session(st.session_state.setdefault("db_session", uuid.uuid4().hex))
+
 # --- Custom CSS for Navbar ---
 st.markdown("""
     <style>
@@ -78,89 +94,34 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# --- Custom Exception Classes ---
-class DatabaseError(Exception):
-    """Custom exception for database operations"""
-    pass
-
-class ValidationError(Exception):
-    """Custom exception for data validation"""
-    pass
-
 # --- Database Connection with Error Handling ---
 @contextmanager
-def get_db_connection():
-    """Context manager for database connections with automatic cleanup"""
-    connection = None
+def get_db_connection(read_only: bool = False):
+    """Context manager that borrows a pooled connection and returns it on exit
+
+    read_only connections may come from a replica (see db.get_read_connection).
+    """
+    connect = db.get_read_connection if read_only else db.get_connection
     try:
-        connection = mysql.connector.connect(
-            host="127.0.0.1",
-            port=3306,
-            user="root",
-            password="root",
-            database="CRMDB",
-            autocommit=False
-        )
-        if connection.is_connected():
+        with connect() as connection:
             yield connection
-    except Error as e:
+    except (Error, PoolTimeoutError) as e:
         logger.error(f"Database connection error: {e}")
         st.error(f"Database connection failed: {e}")
         raise DatabaseError(f"Failed to connect to database: {e}")
-    finally:
-        if connection and connection.is_connected():
-            connection.close()
-
-# --- Validation Functions ---
-def validate_customer_data(name: str, email: str, phone: str) -> List[str]:
-    """Validate customer input data and return list of errors"""
-    errors = []
-    
-    if not name or len(name.strip()) < 2:
-        errors.append("Name must be at least 2 characters long")
-    
-    if not email or '@' not in email or '.' not in email:
-        errors.append("Valid email address is required")
-    
-    if not phone or not phone.isdigit() or len(phone) < 10:
-        errors.append("Phone number must be at least 10 digits and contain only numbers")
-    
-    return errors
-
-def validate_phone_uniqueness(phone: str, exclude_customer_id: Optional[int] = None) -> bool:
-    """Check if phone number is unique in database"""
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            if exclude_customer_id:
-                cursor.execute(
-                    "SELECT customer_id FROM Customer WHERE phone_number = %s AND customer_id != %s", 
-                    (phone, exclude_customer_id)
-                )
-            else:
-                cursor.execute("SELECT customer_id FROM Customer WHERE phone_number = %s", (phone,))
-            
-            return cursor.fetchone() is None
-    except Exception as e:
-        logger.error(f"Error checking phone uniqueness: {e}")
-        return False
 
 # --- Vehicle Management Functions ---
+@cache.cached("available_vehicles", ttl=30, tables=("Vehicle",))
+def _fetch_available_vehicles() -> List[Tuple[int, str, float]]:
+    with get_db_connection(read_only=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute(queries.AVAILABLE_VEHICLES_SQL)
+        return cursor.fetchall()
+
 def get_available_vehicles() -> List[Tuple[int, str, float]]:
     """Fetch available vehicles from database"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            query = """
-    SELECT vehicle_id, CONCAT(manufacturer, ' ', model, ' (', year, ')') as display_name, price
-    FROM Vehicle 
-    WHERE status = 'Available' AND stock > 0 
-    ORDER BY manufacturer, model, year
-"""
-
-            cursor.execute(query)
-            vehicles = cursor.fetchall()
-            return vehicles
+        return _fetch_available_vehicles()
     except Exception as e:
         logger.error(f"Error fetching vehicles: {e}")
         st.error(f"Failed to fetch available vehicles: {e}")
@@ -179,108 +140,26 @@ def check_vehicle_availability(vehicle_id: int) -> bool:
         return False
 
 # --- Customer Management Functions ---
-# --- Fixed Customer Addition Function with Proper Vehicle Update ---
 def add_customer_to_db(name: str, email: str, phone: str, vehicle_id: Optional[int] = None) -> bool:
     """Add customer to database with proper vehicle stock and status management"""
     try:
-        # Validate input
-        errors = validate_customer_data(name, email, phone)
-        if errors:
-            for error in errors:
-                st.error(error)
-            return False
-
-        # Check phone uniqueness
-        if not validate_phone_uniqueness(phone):
-            st.error("Phone number already exists in database")
-            return False
-
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            model_purchased = None
-
-            if vehicle_id:
-                # Check vehicle availability and stock
-                cursor.execute("SELECT manufacturer, model, year, stock FROM Vehicle WHERE vehicle_id = %s", (vehicle_id,))
-                vehicle = cursor.fetchone()
-                if not vehicle:
-                    st.error("Selected vehicle not found.")
-                    return False
-
-                manufacturer, model, year, stock = vehicle
-
-                if stock <= 0:
-                    st.error("Vehicle is out of stock.")
-                    return False
-
-                # Build model name
-                model_purchased = f"{manufacturer} {model} ({year})"
-
-                # Decrease stock
-                cursor.execute("""
-                    UPDATE Vehicle
-                    SET stock = stock - 1
-                    WHERE vehicle_id = %s AND stock > 0
-                """, (vehicle_id,))
-
-                # Update status to 'Sold' where stock is 0 for that model/year
-                cursor.execute("""UPDATE Vehicle v
-                               JOIN (SELECT manufacturer, model, year FROM Vehicle
-                               GROUP BY manufacturer, model, year
-                               HAVING SUM(stock) <= 0) 
-                               AS depleted
-                               ON v.manufacturer = depleted.manufacturer
-                               AND v.model = depleted.model
-                               AND v.year = depleted.year
-                               SET v.status = 'Sold' """)
-
-            # Insert customer
-            if vehicle_id:
-                cursor.execute("""
-                    INSERT INTO Customer (name, email_id, phone_number, vehicle_id, model_purchased, created_at)
-                    VALUES (%s, %s, %s, %s, %s, NOW())
-                """, (name.strip(), email.strip(), phone.strip(), vehicle_id, model_purchased))
-            else:
-                cursor.execute("""
-                    INSERT INTO Customer (name, email_id, phone_number, created_at)
-                    VALUES (%s, %s, %s, NOW())
-                """, (name.strip(), email.strip(), phone.strip()))
-
-            # Insert follow-up
-            if vehicle_id:
-                cursor.execute("""
-                    INSERT INTO Follow_ups (customer_id, follow_up_date, reason, completed)
-                    VALUES (LAST_INSERT_ID(), NOW() + INTERVAL 30 DAY, 'Post-sale vehicle service follow-up', FALSE)
-                """)
-            else:
-                cursor.execute("""
-                    INSERT INTO Follow_ups (customer_id, follow_up_date, reason, completed)
-                    VALUES (LAST_INSERT_ID(), NOW() + INTERVAL 3 DAY, 'Initial lead follow-up', FALSE)
-                """)
-            # Insert into Sales if vehicle was purchased
-            if vehicle_id:
-                cursor.execute("SELECT price FROM Vehicle WHERE vehicle_id = %s", (vehicle_id,))
-                result = cursor.fetchone()
-                if result:
-                    sale_amount = result[0]
-                    cursor.execute("""INSERT INTO Sales (customer_id, vehicle_id, sale_date, payment_status, sale_amount)
-                                   VALUES (LAST_INSERT_ID(), %s, NOW(), %s, %s)""", (vehicle_id, 'Completed', sale_amount))
-
-            conn.commit()
-            st.success("Customer added successfully!")
-
-            if vehicle_id:
-                logger.info(f"Customer '{name}' added with vehicle ID {vehicle_id}")
-                st.rerun()
-
-            return True
-
+        created = customers.create_customer(name, email, phone, vehicle_id)
+    except ValidationError as e:
+        for error in e.errors:
+            st.error(error)
+        return False
     except Exception as e:
         logger.error(f"Error adding customer: {e}")
         st.error(f"Failed to add customer: {e}")
         return False
 
+    st.success("Customer added successfully!")
+    if vehicle_id:
+        logger.info(f"Customer '{name}' added with vehicle ID {vehicle_id} "
+                    f"({created.round_trips} database round trips)")
+        st.rerun()
+    return True
+
 # --- Enhanced Vehicle Availability Check ---
 def check_vehicle_availability(vehicle_id: int) -> bool:
     """Check if a vehicle is still available with detailed logging"""
@@ -317,238 +196,136 @@ def check_vehicle_availability(vehicle_id: int) -> bool:
 #         logger.error(f"Error updating vehicle status: {e}")
 #         return False
 
-def get_customers_with_vehicles() -> pd.DataFrame:
-    """Retrieve all customers with their vehicle information"""
+@cache.cached("vehicle_inventory", ttl=30, tables=("Vehicle",))
+def get_vehicle_inventory() -> pd.DataFrame:
+    """Vehicle inventory with the number of customers assigned to each vehicle"""
+    with get_db_connection(read_only=True) as conn:
+        return frames.read_frame(conn, queries.VEHICLE_INVENTORY_SQL)
+
+# --- Vehicle Customer Drilldown ---
+def goto_vehicle_customers(before):
+    """Page past before in the expanded vehicle's customers, or back one page when before is None"""
+    stack = st.session_state.vehicle_customers
+    if before is None:
+        if stack:
+            stack.pop()
+    else:
+        stack.append(before)
+
+def get_vehicle_customers(vehicle_id: int, page_size: int) -> Optional[customers.VehicleCustomersPage]:
+    """Fetch the page of a vehicle's customers the current session is positioned on"""
+    if st.session_state.get("vehicle_customers_id") != vehicle_id:
+        st.session_state.vehicle_customers_id = vehicle_id
+        st.session_state.vehicle_customers = []
+    stack = st.session_state.vehicle_customers
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Check if vehicle_id column exists
-            cursor.execute("""
-                SELECT COUNT(*) 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_SCHEMA = 'CRMDB' 
-                AND TABLE_NAME = 'Customer' 
-                AND COLUMN_NAME = 'vehicle_id'
-            """)
-            
-            has_vehicle_id = cursor.fetchone()[0] > 0
-            
-            if has_vehicle_id:
-                # New query with vehicle_id column
-                query = """
-                    SELECT 
-                        c.customer_id,
-                        c.name,
-                        c.email_id,
-                        c.phone_number,
-                        CASE 
-                            WHEN v.vehicle_id IS NOT NULL 
-                            THEN CONCAT(v.manufacturer, ' ', v.model, ' (', v.year, ')')
-                            ELSE COALESCE(c.model_purchased, 'No vehicle assigned')
-                        END as vehicle_purchased,
-                        v.price as vehicle_price,
-                        c.created_at
-                    FROM Customer c
-                    LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
-                    ORDER BY c.created_at DESC
-                """
-            else:
-                # Fallback query for old schema
-                query = """
-                    SELECT 
-                        c.customer_id,
-                        c.name,
-                        c.email_id,
-                        c.phone_number,
-                        COALESCE(c.model_purchased, 'No vehicle assigned') as vehicle_purchased,
-                        NULL as vehicle_price,
-                        c.created_at
-                    FROM Customer c
-                    ORDER BY c.created_at DESC
-                """
-            
-            df = pd.read_sql(query, conn)
-            return df
+        return customers.fetch_vehicle_customers(vehicle_id, page_size, stack[-1] if stack else None)
+    except Exception as e:
+        logger.error(f"Error fetching customers of vehicle {vehicle_id}: {e}")
+        st.error(f"Failed to fetch customers: {e}")
+        return None
+
+# --- Customer Listing Pagination ---
+def reset_customer_page():
+    """Return the customer listing to its first page"""
+    st.session_state.customer_page = {"cursor": None, "direction": "next", "number": 1}
+
+def goto_customer_page(cursor, direction: str):
+    """Move the customer listing one page forward or back from a boundary row"""
+    state = st.session_state.customer_page
+    state["cursor"] = cursor
+    state["direction"] = direction
+    state["number"] += 1 if direction == "next" else -1
+    if state["number"] <= 1:
+        reset_customer_page()
+
+def get_customer_page(page_size: int) -> Optional[customers.CustomerPage]:
+    """Fetch the customer page the current session is positioned on"""
+    if "customer_page" not in st.session_state:
+        reset_customer_page()
+    state = st.session_state.customer_page
+    try:
+        page = customers.fetch_customer_page(page_size, state["cursor"], state["direction"])
+        if not page.rows and state["cursor"] is not None:
+            # Boundary rows vanished; start over from the newest customers
+            reset_customer_page()
+            page = customers.fetch_customer_page(page_size)
+        return page
     except Exception as e:
-        logger.error(f"Error fetching customers: {e}")
+        logger.error(f"Error fetching customer page: {e}")
         st.error(f"Failed to fetch customer data: {e}")
-        return pd.DataFrame()
+        return None
 
-# --- Database Migration Functions ---
-def migrate_database():
-    """Safely migrate existing database to new schema"""
+def goto_search_page(number: int):
+    """Jump to a page of the current search results"""
+    st.session_state.customer_search["page"] = max(1, number)
+
+def get_search_page(term: str, page_size: int) -> Optional[customers.SearchPage]:
+    """Fetch the search results page the current session is positioned on"""
+    state = st.session_state.setdefault("customer_search", {"term": term, "page": 1})
+    if state["term"] != term:
+        state.update(term=term, page=1)
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Check if vehicle_id column exists in Customer table
-            cursor.execute("""
-                SELECT COUNT(*) 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_SCHEMA = 'CRMDB' 
-                AND TABLE_NAME = 'Customer' 
-                AND COLUMN_NAME = 'vehicle_id'
-            """)
-            
-            vehicle_id_exists = cursor.fetchone()[0] > 0
-            
-            if not vehicle_id_exists:
-                st.info("🔄 Upgrading database schema...")
-                
-                # Add vehicle_id column to existing Customer table
-                cursor.execute("""
-                    ALTER TABLE Customer 
-                    ADD COLUMN vehicle_id BIGINT NULL
-                """)
-                
-                # Add updated_at column if it doesn't exist
-                cursor.execute("""
-                    SELECT COUNT(*) 
-                    FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_SCHEMA = 'CRMDB' 
-                    AND TABLE_NAME = 'Customer' 
-                    AND COLUMN_NAME = 'updated_at'
-                """)
-                
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute("""
-                        ALTER TABLE Customer 
-                        ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-                    """)
-                
-                # Add indexes for better performance
-                try:
-                    cursor.execute("CREATE INDEX idx_vehicle ON Customer(vehicle_id)")
-                except Error:
-                    pass  # Index might already exist
-                
-                conn.commit()
-                st.success("✅ Database schema updated successfully!")
-                logger.info("Database migration completed successfully")
-            
+        return customers.search_customers(term, page_size, state["page"])
     except Exception as e:
-        logger.error(f"Error during database migration: {e}")
-        st.error(f"Database migration failed: {e}")
+        logger.error(f"Error searching customers: {e}")
+        st.error(f"Customer search failed: {e}")
+        return None
+
+# --- Follow-up Work Queue ---
+def goto_queue_page(bucket: str, after):
+    """Advance a queue tab past after, or step back one page when after is None"""
+    st.session_state.pop(f"followup_editor_{bucket}", None)
+    stack = st.session_state.followup_queue[bucket]
+    if after is None:
+        if stack:
+            stack.pop()
+    else:
+        stack.append(after)
 
+def get_queue_page(bucket: str, page_size: int) -> Optional[followups.QueuePage]:
+    """Fetch the page of a queue tab the current session is positioned on"""
+    state = st.session_state.setdefault("followup_queue", {b: [] for b in followups.BUCKETS})
+    stack = state[bucket]
+    try:
+        page = followups.fetch_queue(bucket, page_size, stack[-1] if stack else None)
+        if not page.rows and stack:
+            # Everything past the boundary was completed; start the tab over
+            stack.clear()
+            page = followups.fetch_queue(bucket, page_size)
+        return page
+    except Exception as e:
+        logger.error(f"Error fetching {bucket} follow-ups: {e}")
+        st.error(f"Failed to fetch follow-ups: {e}")
+        return None
 
-# --- Table Reset Section (ENABLE/DISABLE AS NEEDED) ---
-def initialize_tables():
-    """Clear and reinitialize database tables with improved schema"""
+def get_queue_counts() -> dict:
+    """Open follow-up counts for the queue tab labels"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            # Disable foreign key checks temporarily to avoid constraint issues during truncation
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
-
-            # Truncate tables in the correct order (children first due to FK constraints)
-            # cursor.execute("TRUNCATE TABLE Sales")
-            # cursor.execute("TRUNCATE TABLE Follow_ups")
-            # cursor.execute("TRUNCATE TABLE Vehicle")
-            # cursor.execute("TRUNCATE TABLE Customer")
-
-            # Re-enable foreign key checks
-            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
-
-            # Now recreate and repopulate tables
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Customer (
-                customer_id BIGINT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                email_id VARCHAR(100),
-                phone_number VARCHAR(15) UNIQUE NOT NULL,
-                model_purchased VARCHAR(100),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-            
-            cursor.execute("""
-           
-            CREATE TABLE IF NOT EXISTS Vehicle (
-                vehicle_id BIGINT AUTO_INCREMENT PRIMARY KEY,
-                manufacturer VARCHAR(50) NOT NULL,
-                model VARCHAR(50) NOT NULL,
-                year INT NOT NULL,
-                price DECIMAL(12,2) NOT NULL,
-                stock INT DEFAULT 5,
-                status ENUM('Available', 'Sold', 'Reserved') DEFAULT 'Available',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                INDEX idx_status (status),
-                INDEX idx_model (manufacturer, model)
-            )
-            """)
-            #Insert sample vehicle data again
-            vehicle_data = [
-                ("Ford", "Mustang", 2020, 2750000.00, "Available"),
-                ("Tata", "Altroz", 2023, 1200000.00, "Available"),
-                ("Tata", "Nexon", 2023, 1350000.00, "Available"),
-                ("Tata", "Tiago", 2023, 1100000.00, "Available"),
-                ("Toyota", "Urban Cruiser Taisor", 2023, 1700000.00, "Available"),
-                ("Toyota", "Glanza", 2023, 1600000.00, "Available"),
-                ("Hyundai", "Creta", 2022, 2100000.00, "Available"),
-                ("Mahindra", "XUV700", 2023, 2600000.00, "Available"),
-                ("Kia", "Seltos", 2020, 1950000.00, "Available"),
-                ("Nissan", "Magnite", 2022, 1650000.00, "Available"),
-                ("Toyota", "Vellfire", 2023, 3500000.00, "Available"),
-                ("Renault", "Triber", 2023, 1250000.00, "Available"),
-                ("Kia", "EV9", 2023, 4000000.00, "Available")
-            ]
-            # vehicle_data = []
-
-            insert_query = """
-                INSERT INTO Vehicle (manufacturer, model, year, price, status) 
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            # Insert query with ON DUPLICATE KEY UPDATE
-            insert_query = """INSERT INTO Vehicle (manufacturer, model, year, price, status) VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE price=VALUES(price), status=VALUES(status)
-"""
-            cursor.executemany(insert_query, vehicle_data)
-
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Interactions (
-                interaction_id BIGINT AUTO_INCREMENT PRIMARY KEY,
-                customer_id BIGINT,
-                vehicle_id BIGINT,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                type TEXT,
-                notes TEXT,
-                FOREIGN KEY (customer_id) REFERENCES Customer(customer_id) ON DELETE CASCADE,
-                FOREIGN KEY (vehicle_id) REFERENCES Vehicle(vehicle_id) ON DELETE SET NULL
-            )
-            """)
-
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Follow_ups (
-                id BIGINT AUTO_INCREMENT PRIMARY KEY,
-                customer_id BIGINT NOT NULL,
-                follow_up_date TIMESTAMP NOT NULL,
-                reason TEXT NOT NULL,
-                completed BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES Customer(customer_id) ON DELETE CASCADE
-            )
-            """)
-
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Sales (
-                id BIGINT AUTO_INCREMENT PRIMARY KEY,
-                customer_id BIGINT NOT NULL,
-                vehicle_id BIGINT NOT NULL,
-                sale_date DATE NOT NULL,
-                payment_status ENUM('Pending', 'Partial', 'Completed') DEFAULT 'Pending',
-                sale_amount DECIMAL(12,2),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES Customer(customer_id) ON DELETE CASCADE,
-                FOREIGN KEY (vehicle_id) REFERENCES Vehicle(vehicle_id) ON DELETE CASCADE
-            )
-            """)
+        return followups.fetch_queue_counts()
+    except Exception as e:
+        logger.error(f"Error counting follow-ups: {e}")
+        return {}
 
-            conn.commit()
-            logger.info("Database reset and tables initialized successfully")
+def complete_follow_ups(bucket: str, ids: List[int]):
+    """Mark the follow-ups ticked in a queue tab completed"""
+    # Editor edits are keyed by row position, so drop them before the rows shift
+    st.session_state.pop(f"followup_editor_{bucket}", None)
+    try:
+        changed = followups.mark_completed(ids)
+        st.success(f"✅ Marked {changed} follow-up(s) completed")
+    except Exception as e:
+        logger.error(f"Error completing follow-ups: {e}")
+        st.error(f"Failed to update follow-ups: {e}")
 
+def get_kpi_summary() -> Optional[dict]:
+    """Dashboard KPI counters for the metric tiles"""
+    try:
+        return kpi.read_summary()
     except Exception as e:
-        logger.error(f"Error initializing tables: {e}")
-        st.error(f"Failed to initialize database: {e}")
+        logger.error(f"Error fetching KPI summary: {e}")
+        st.error(f"Failed to fetch dashboard metrics: {e}")
+        return None
 
 # --- Navbar ---
 st.markdown("""
@@ -566,12 +343,19 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- Initialize Database ---
-initialize_tables()
-migrate_database()  # Add this line to run migration
+# Migrations run once per process; later reruns reuse the cached capabilities
+try:
+    schema.ensure_schema()
+except Exception as e:
+    logger.error(f"Error initializing database schema: {e}")
+    st.error(f"Failed to initialize database: {e}")
 
 # --- Navigation ---
 query_params = st.query_params
 selected_page = query_params.get("nav", "home")
+instrumentation.current().name = f"streamlit.{selected_page}"
+if profiling.current() is not None:
+    profiling.current().name = f"streamlit.{selected_page}"
 
 # --- Pages ---
 if selected_page == "home":
@@ -634,36 +418,49 @@ elif selected_page == "add":
 elif selected_page == "view":
     st.header("👥 Customer Records")
     
-    # Add refresh button
+    # Add refresh button and page size control
     col1, col2, col3 = st.columns([1, 1, 2])
     with col1:
         if st.button("🔄 Refresh Data"):
+            cache.invalidate("Customer")
+            reset_customer_page()
             st.rerun()
+    with col2:
+        page_size = st.selectbox(
+            "Rows per page",
+            customers.PAGE_SIZES,
+            index=customers.PAGE_SIZES.index(50),
+            key="customer_page_size",
+            on_change=reset_customer_page
+        )
     
-    # Fetch and display customers
-    df = get_customers_with_vehicles()
-    if not df.empty:
-        # Add search functionality
-        search_term = st.text_input("🔍 Search customers...", placeholder="Search by name, email, or phone")
-        if search_term:
-            mask = df.astype(str).apply(lambda x: x.str.contains(search_term, case=False, na=False)).any(axis=1)
-            df = df[mask]
-        
-        # Display metrics
+    # Display metrics
+    summary = get_kpi_summary()
+    if summary:
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Customers", len(df))
+            st.metric("Total Customers", summary["total_customers"])
         with col2:
-            customers_with_vehicles = len(df[df['vehicle_purchased'] != 'No vehicle assigned'])
-            st.metric("Customers with Vehicles", customers_with_vehicles)
+            st.metric("Customers with Vehicles", summary["customers_with_vehicles"])
         with col3:
-            if 'vehicle_price' in df.columns:
-                total_sales = df['vehicle_price'].fillna(0).sum()
-                st.metric("Total Sales Value", f"₹{total_sales:,.0f}")
+            st.metric("Total Sales Value", f"₹{summary['total_sales_value']:,.0f}")
         with col4:
-            leads_only = len(df[df['vehicle_purchased'] == 'No vehicle assigned'])
-            st.metric("Leads Only", leads_only)
-        
+            st.metric("Leads Only", summary["leads_only"])
+    
+    # Add search functionality
+    search_term = st.text_input("🔍 Search customers...", placeholder="Search by name, email, or phone")
+    page = None
+    search_page = None
+    if search_term:
+        # Ranked search runs in MySQL; only the requested page comes back
+        search_page = get_search_page(search_term, page_size)
+        df = frames.frame_from_rows(search_page.columns, search_page.rows) if search_page else pd.DataFrame()
+    else:
+        # Fetch one page of customers
+        page = get_customer_page(page_size)
+        df = frames.frame_from_rows(page.columns, page.rows) if page else pd.DataFrame()
+    
+    if not df.empty:
         # Display data
         st.dataframe(
             df,
@@ -685,6 +482,38 @@ elif selected_page == "view":
                 )
             }
         )
+        
+        # Page navigation
+        if search_page:
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                st.button("⬅️ Previous", disabled=search_page.page <= 1, use_container_width=True,
+                          on_click=goto_search_page, args=(search_page.page - 1,))
+            with col2:
+                st.markdown(
+                    f"<div style='text-align: center;'>Results page {search_page.page}</div>",
+                    unsafe_allow_html=True
+                )
+            with col3:
+                st.button("Next ➡️", disabled=not search_page.has_next, use_container_width=True,
+                          on_click=goto_search_page, args=(search_page.page + 1,))
+        if page:
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                st.button("⬅️ Previous", disabled=not page.has_prev, use_container_width=True,
+                          on_click=goto_customer_page, args=(page.first_key, "prev"))
+            with col2:
+                st.markdown(
+                    f"<div style='text-align: center;'>Page {st.session_state.customer_page['number']}</div>",
+                    unsafe_allow_html=True
+                )
+            with col3:
+                st.button("Next ➡️", disabled=not page.has_next, use_container_width=True,
+                          on_click=goto_customer_page, args=(page.last_key, "next"))
+    elif search_term and not search_term.strip().isdigit() and customers.fulltext_expression(search_term) is None:
+        st.info(f"Enter at least {customers.FULLTEXT_MIN_TOKEN} characters of a name or email to search.")
+    elif search_term:
+        st.info("No customers match your search.")
     else:
         st.info("No customer records found. Add some customers to get started!")
 
@@ -693,72 +522,96 @@ elif selected_page == "vehicles":
     st.header("🚗 Vehicle Management")
 
     try:
-        with get_db_connection() as conn:
-            # Display vehicle inventory with customer information
-            query = """SELECT
-            v.vehicle_id,
-            v.manufacturer,
-            v.model,
-            v.year,
-            v.price,
-            v.stock,
-            CASE 
-            WHEN v.stock <= 0 THEN 'Sold'
-            ELSE v.status
-            END AS status,
-            COUNT(c.customer_id) as customers_assigned,
-            GROUP_CONCAT(c.name SEPARATOR ', ') as customer_names
-            FROM Vehicle v
-            LEFT JOIN Customer c ON v.vehicle_id = c.vehicle_id
-            GROUP BY v.vehicle_id, v.manufacturer, v.model, v.year, v.price, v.stock, v.status
-            ORDER BY v.manufacturer, v.model, v.year"""
-
-            df = pd.read_sql(query, conn)
+        # Display vehicle inventory with customer information
+        df = get_vehicle_inventory()
+
+        if not df.empty:
+            # Vehicle statistics
+            summary = get_kpi_summary() or {}
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Vehicles", summary.get("vehicles_total", 0))
+            with col2:
+                st.metric("Available", summary.get("vehicles_available", 0))
+            with col3:
+                st.metric("Sold", summary.get("vehicles_sold", 0))
+            with col4:
+                st.metric("Avg Price", f"₹{summary.get('avg_vehicle_price', 0):,.0f}")
+            
+            # Display vehicles with enhanced information
+            display_columns = {"vehicle_id": "ID",
+                                                  "manufacturer": "Make",
+                                                  "model": "Model",
+                                                  "year": "Year",
+                                                  "price": st.column_config.NumberColumn("Price (₹)",format="₹%.0f"),
+                                                  "stock": st.column_config.NumberColumn("Stock",format="%d"),
+                                                  "status": st.column_config.SelectboxColumn("Status", options=["Available", "Sold", "Reserved"]),
+                                                  "customers_assigned": "Customers"}
             
-            if not df.empty:
-                # Vehicle statistics
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("Total Vehicles", len(df))
-                with col2:
-                    available_count = len(df[df['status'] == 'Available'])
-                    st.metric("Available", available_count)
-                with col3:
-                    sold_count = len(df[df['status'] == 'Sold'])
-                    st.metric("Sold", sold_count)
-                with col4:
-                    avg_price = df['price'].mean()
-                    st.metric("Avg Price", f"₹{avg_price:,.0f}")
-                
-                # Display vehicles with enhanced information
-                display_columns = {"vehicle_id": "ID",
-                                                      "manufacturer": "Make",
-                                                      "model": "Model",
-                                                      "year": "Year",
-                                                      "price": st.column_config.NumberColumn("Price (₹)",format="₹%.0f"),
-                                                      "stock": st.column_config.NumberColumn("Stock",format="%d"),
-                                                      "status": st.column_config.SelectboxColumn("Status", options=["Available", "Sold", "Reserved"]),
-                                                      "customers_assigned": "Customers",
-                                                      "customer_names": "customer_names"}
-                
-                st.dataframe(
-                    df,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config=display_columns
+            st.dataframe(
+                df,
+                use_container_width=True,
+                hide_index=True,
+                column_config=display_columns
+            )
+
+            # Customers load only for the vehicle picked here, a page at a time
+            st.subheader("👥 Customers by Vehicle")
+            assigned = df[df["customers_assigned"] > 0]
+            labels = {
+                int(row.vehicle_id): f"{row.manufacturer} {row.model} ({row.year}) - {row.customers_assigned} customer(s)"
+                for row in assigned.itertuples(index=False)
+            }
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                expanded_vehicle = st.selectbox(
+                    "Vehicle",
+                    options=list(labels),
+                    index=None,
+                    format_func=lambda x: labels[x],
+                    placeholder="Choose a vehicle to list its customers"
                 )
-                
+            with col2:
+                customer_page_size = st.selectbox("Rows per page", customers.PAGE_SIZES, key="vehicle_customers_page_size")
+
+            if expanded_vehicle is not None:
+                buyers = get_vehicle_customers(expanded_vehicle, customer_page_size)
+                if buyers and buyers.rows:
+                    st.dataframe(
+                        frames.frame_from_rows(buyers.columns, buyers.rows),
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            "customer_id": "ID",
+                            "name": "Name",
+                            "email_id": "Email",
+                            "phone_number": "Phone",
+                            "created_at": st.column_config.DatetimeColumn("Created", format="DD/MM/YYYY HH:mm")
+                        }
+                    )
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.button("⬅️ Previous", key="vehicle_customers_prev", use_container_width=True,
+                                  disabled=not st.session_state.vehicle_customers,
+                                  on_click=goto_vehicle_customers, args=(None,))
+                    with col2:
+                        st.button("Next ➡️", key="vehicle_customers_next", use_container_width=True,
+                                  disabled=buyers.next_key is None,
+                                  on_click=goto_vehicle_customers, args=(buyers.next_key,))
+                elif buyers:
+                    st.info("No customers are assigned to this vehicle.")
+            
     #             # Manual status update section
     #             st.subheader("🔧 Manual Status Update")
     #             col1, col2, col3 = st.columns(3)
-                
+            
     #             with col1:
     #                 vehicle_ids = df['vehicle_id'].tolist()
     #                 selected_vehicle_id = st.selectbox("Select Vehicle", vehicle_ids)
-                
+            
     #             with col2:
     #                 new_status = st.selectbox("New Status", ["Available", "Sold", "Reserved"])
-                
+            
     #             with col3:
     #                 if st.button("Update Status"):
     #                     if update_vehicle_status(selected_vehicle_id, new_status):
@@ -766,10 +619,10 @@ elif selected_page == "vehicles":
     #                         st.rerun()
     #                     else:
     #                         st.error("Failed to update vehicle status")
-                
+            
     #         else:
     #             st.info("No vehicles in inventory")
-                
+            
     except Exception as e:
      st.error(f"Error loading vehicle data: {e}")
      logger.error(f"Vehicle page error: {e}")
@@ -777,76 +630,71 @@ elif selected_page == "vehicles":
 elif selected_page == "activities":
     st.header("📞 Customer Activities: Follow-Ups")
 
-    with get_db_connection() as conn:
-        # --- Follow-ups ---
-        st.subheader("📅 Follow-Ups")
-        df_followups = pd.read_sql("""
-            SELECT 
-                f.id,
-                c.name AS customer_name,
-                f.follow_up_date,
-                f.reason,
-                f.completed,
-                f.created_at
-            FROM Follow_ups f
-            JOIN Customer c ON f.customer_id = c.customer_id
-            ORDER BY f.follow_up_date DESC
-        """, conn)
-        
-        if not df_followups.empty:
-            st.dataframe(
-                df_followups,
+    # --- Follow-up Work Queue ---
+    page_size = st.selectbox("Rows per page", followups.PAGE_SIZES, index=1, key="followup_page_size")
+    counts = get_queue_counts()
+    tabs = st.tabs([
+        f"{label} ({counts[bucket]})" if bucket in counts else label
+        for bucket, label in followups.BUCKET_LABELS.items()
+    ])
+
+    for tab, bucket in zip(tabs, followups.BUCKET_LABELS):
+        with tab:
+            queue_page = get_queue_page(bucket, page_size)
+            if queue_page is None:
+                continue
+            if not queue_page.rows:
+                st.info("Nothing in this queue.")
+                continue
+
+            df_queue = frames.frame_from_rows(queue_page.columns, queue_page.rows)
+            df_queue.insert(0, "done", False)
+            edited = st.data_editor(
+                df_queue,
+                key=f"followup_editor_{bucket}",
+                hide_index=True,
                 use_container_width=True,
+                disabled=[c for c in df_queue.columns if c != "done"],
                 column_config={
+                    "done": st.column_config.CheckboxColumn("Done"),
+                    "id": None,
+                    "customer_id": None,
                     "customer_name": "Customer",
+                    "phone_number": "Phone",
                     "follow_up_date": st.column_config.DatetimeColumn("Follow-Up Date", format="DD/MM/YYYY HH:mm"),
                     "reason": "Reason",
-                    "completed": "Completed",
                     "created_at": st.column_config.DatetimeColumn("Created", format="DD/MM/YYYY HH:mm")
                 }
             )
-        else:
-            st.info("No follow-up records found.")
 
-        st.markdown("---")
+            selected = edited.loc[edited["done"], "id"].astype(int).tolist()
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                st.button("⬅️ Previous", key=f"followup_prev_{bucket}", use_container_width=True,
+                          disabled=not st.session_state.followup_queue[bucket],
+                          on_click=goto_queue_page, args=(bucket, None))
+            with col2:
+                st.button(f"Mark {len(selected)} completed", key=f"followup_done_{bucket}",
+                          disabled=not selected, use_container_width=True,
+                          on_click=complete_follow_ups, args=(bucket, selected))
+            with col3:
+                st.button("Next ➡️", key=f"followup_next_{bucket}", use_container_width=True,
+                          disabled=queue_page.next_key is None,
+                          on_click=goto_queue_page, args=(bucket, queue_page.next_key))
+
+    st.markdown("---")
 
 elif selected_page == "query":
     st.header("🔍 Custom Database Query")
     
     # Predefined safe queries
     st.subheader("Quick Queries")
-    query_options = {
-        "All Customers": "SELECT * FROM Customer ORDER BY created_at DESC",
-        "Available Vehicles": "SELECT * FROM Vehicle WHERE status = 'Available'",
-        "Sales Summary": """SELECT 
-        CONCAT(v.manufacturer, ' ', v.model, ' (', v.year, ')') AS vehicle,
-        COUNT(c.customer_id) AS customers_count,
-        SUM(v.price) AS total_value
-        FROM Customer c
-        JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
-        GROUP BY v.vehicle_id, v.manufacturer, v.model, v.year
-        ORDER BY customers_count DESC
-""",
-
-        "Customer Vehicle Report": """
-            SELECT 
-                c.name,
-                c.email_id,
-                c.phone_number,
-                CONCAT(v.manufacturer, ' ', v.model, ' (', v.year, ')') as vehicle,
-                v.price
-            FROM Customer c
-            LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
-            ORDER BY c.name
-        """
-    }
-    
-    selected_query = st.selectbox("Select a predefined query:", list(query_options.keys()))
+    selected_query = st.selectbox("Select a predefined query:", list(queries.QUICK_QUERIES))
     
     if st.button(f"Run Query: {selected_query}"):
         try:
-            with get_db_connection() as conn:
-                df = pd.read_sql(query_options[selected_query], conn)
+            with get_db_connection(read_only=True) as conn, instrumentation.named(f"quick: {selected_query}"):
+                df = frames.read_frame(conn, queries.QUICK_QUERIES[selected_query].sql)
                 st.dataframe(df, use_container_width=True)
         except Exception as e:
             st.error(f"Query error: {e}")
@@ -857,3 +705,11 @@ st.markdown(
     "<div style='text-align: center; color: #666;'>CRM Dashboard v2.0 - Enhanced with Vehicle Management & Error Handling</div>",
     unsafe_allow_html=True
 )
+
+# --- Query Statistics ---
+query_summary = instrumentation.end()
+profiling.stop()
+if query_summary and os.getenv("CRM_SHOW_QUERY_STATS", "").lower() in ("1", "true", "yes", "on"):
+    with st.sidebar.expander(f"🗄️ {query_summary['queries']} queries, {query_summary['db_ms']} ms"):
+        st.caption(f"Rerun {query_summary['elapsed_ms']} ms; waited {query_summary['acquire_ms']} ms for connections")
+        st.dataframe(pd.DataFrame(query_summary["by_query"]), hide_index=True, use_container_width=True)
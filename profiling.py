@@ -0,0 +1,152 @@
+import cProfile
+import itertools
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# CRM_PROFILE=cprofile  deterministic; writes .prof (pstats) and caller;callee .collapsed
+# CRM_PROFILE=sample    low-overhead stack sampling; writes full-stack .collapsed
+MODE = os.getenv("CRM_PROFILE", "off").strip().lower()
+PROFILE_DIR = os.getenv("CRM_PROFILE_DIR", "profiles")
+SAMPLE_FRACTION = float(os.getenv("CRM_PROFILE_FRACTION", 1.0))  # share of requests/reruns profiled
+SAMPLE_INTERVAL = float(os.getenv("CRM_PROFILE_INTERVAL_MS", 5)) / 1000
+MODES = ("cprofile", "sample")
+
+_local = threading.local()
+_sequence = itertools.count(1)
+
+
+def enabled() -> bool:
+    return MODE in MODES
+
+
+def _frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval"""
+
+    def __init__(self, target_id: int, interval: float):
+        super().__init__(name="crm-profile-sampler", daemon=True)
+        self.target_id = target_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Session:
+    """One profiled Flask request or Streamlit rerun"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+
+        if MODE == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = _Sampler(threading.get_ident(), SAMPLE_INTERVAL)
+            self._sampler.start()
+
+    def _path(self, elapsed_ms: float, extension: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.name)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        return os.path.join(PROFILE_DIR, f"{stamp}-{safe_name}-{os.getpid()}-{self.sequence}-"
+                                         f"{elapsed_ms:.0f}ms.{extension}")
+
+    def stop(self) -> Dict[str, str]:
+        """Stop profiling and write the profile files; returns their paths by format"""
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.sequence = next(_sequence)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        written = {}
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            written["pstats"] = self._path(elapsed_ms, "prof")
+            self._profiler.dump_stats(written["pstats"])
+            stats = pstats.Stats(self._profiler)
+            lines = []
+            # cProfile keeps caller->callee edges, not whole stacks: emit two-frame stacks
+            for (filename, _, function), (_, _, _, _, callers) in stats.stats.items():
+                callee = f"{os.path.splitext(os.path.basename(filename))[0]}:{function}"
+                for (caller_file, _, caller_function), edge in callers.items():
+                    micros = int(edge[2] * 1_000_000)  # callee's own time under this caller
+                    if micros:
+                        caller = f"{os.path.splitext(os.path.basename(caller_file))[0]}:{caller_function}"
+                        lines.append(f"{caller};{callee} {micros}")
+            written["collapsed"] = self._path(elapsed_ms, "collapsed")
+            with open(written["collapsed"], "w") as f:
+                f.write("\n".join(lines) + "\n")
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            written["collapsed"] = self._path(elapsed_ms, "collapsed")
+            with open(written["collapsed"], "w") as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+        logger.info(f"Profiled {self.name} ({elapsed_ms:.0f} ms): {', '.join(written.values())}")
+        return written
+
+
+# --- Hooks ---
+def start(name: str) -> Optional[Session]:
+    """Begin profiling the current thread if enabled and this run is sampled"""
+    stop()  # a previous rerun in this thread ended early (st.rerun, st.stop or an error)
+    if not enabled() or random.random() >= SAMPLE_FRACTION:
+        return None
+    try:
+        session = Session(name)
+    except ValueError as e:
+        # Python 3.12+ allows one cProfile at a time per process
+        logger.debug(f"Skipped profiling {name}: {e}")
+        return None
+    _local.session = session
+    return session
+
+
+def current() -> Optional[Session]:
+    return getattr(_local, "session", None)
+
+
+def stop() -> Optional[Dict[str, str]]:
+    """Finish the current thread's profile, if any"""
+    session = current()
+    if session is None:
+        return None
+    _local.session = None
+    try:
+        return session.stop()
+    except OSError as e:
+        logger.error(f"Could not write profile for {session.name}: {e}")
+        return None
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+# --- Named Dashboard Queries ---
+# SQL the dashboard pages run directly, kept importable so the query-plan
+# suite (benchmarks/query_plans.py) can EXPLAIN and time exactly what ships.
+QUICK_QUERY_ROW_LIMIT = 1000
+
+
+@dataclass(frozen=True)
+class NamedQuery:
+    """A dashboard query with representative parameters and its performance contract"""
+    name: str
+    sql: str
+    params: Tuple[Any, ...] = ()
+    budget_ms: float = 250.0
+    full_scans: Tuple[str, ...] = ()  # tables this query is expected to read in full
+
+
+AVAILABLE_VEHICLES_SQL = """
+    SELECT vehicle_id, CONCAT(manufacturer, ' ', model, ' (', year, ')') as display_name, price
+    FROM Vehicle
+    WHERE status = 'Available' AND stock > 0
+    ORDER BY manufacturer, model, year
+"""
+
+# Customer counts are maintained on Vehicle by each sale, so the grid never
+# joins Customer; the buyers themselves load per vehicle on demand
+# (customers.fetch_vehicle_customers).
+VEHICLE_INVENTORY_SQL = """
+    SELECT
+        v.vehicle_id,
+        v.manufacturer,
+        v.model,
+        v.year,
+        v.price,
+        v.stock,
+        CASE
+            WHEN v.stock <= 0 THEN 'Sold'
+            ELSE v.status
+        END AS status,
+        v.customers_assigned
+    FROM Vehicle v
+    ORDER BY v.manufacturer, v.model, v.year
+"""
+
+# Shown on the query page; the row limit keeps a large CRM from being pulled
+# into the browser in one go.
+QUICK_QUERIES: Dict[str, NamedQuery] = {
+    query.name: query for query in (
+        NamedQuery(
+            "All Customers",
+            f"""
+            SELECT * FROM Customer
+            ORDER BY created_at DESC, customer_id DESC
+            LIMIT {QUICK_QUERY_ROW_LIMIT}
+            """,
+        ),
+        NamedQuery(
+            "Available Vehicles",
+            "SELECT * FROM Vehicle WHERE status = 'Available'",
+            full_scans=("Vehicle",),
+        ),
+        NamedQuery(
+            "Sales Summary (last 90 days)",
+            f"""
+            SELECT
+                CONCAT(v.manufacturer, ' ', v.model, ' (', v.year, ')') AS vehicle,
+                SUM(r.sales_count) AS sales_count,
+                SUM(r.revenue) AS revenue
+            FROM Sales_daily_vehicle r
+            JOIN Vehicle v ON v.vehicle_id = r.vehicle_id
+            WHERE r.sale_date >= CURDATE() - INTERVAL 90 DAY
+            GROUP BY v.vehicle_id, v.manufacturer, v.model, v.year
+            ORDER BY revenue DESC
+            LIMIT {QUICK_QUERY_ROW_LIMIT}
+            """,
+        ),
+        NamedQuery(
+            "Customer Vehicle Report",
+            f"""
+            SELECT
+                c.name,
+                c.email_id,
+                c.phone_number,
+                CONCAT(v.manufacturer, ' ', v.model, ' (', v.year, ')') as vehicle,
+                v.price
+            FROM Customer c
+            LEFT JOIN Vehicle v ON c.vehicle_id = v.vehicle_id
+            ORDER BY c.name
+            LIMIT {QUICK_QUERY_ROW_LIMIT}
+            """,
+            budget_ms=2000.0,
+            full_scans=("Customer",),
+        ),
+    )
+}
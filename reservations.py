@@ -0,0 +1,163 @@
+import argparse
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+import cache
+import customers  # plain import: customers also imports this module
+import db
+import inventory
+import kpi
+import table_versions
+
+logger = logging.getLogger(__name__)
+
+# --- Vehicle Holds ---
+# A hold takes one unit of a vehicle out of sale for a short time without
+# changing its stock. Vehicle.reserved counts live holds; when every remaining
+# unit is held the vehicle shows as 'Reserved'. Expired holds are returned by
+# sweep_expired(), run from cron via `python reservations.py sweep`, and on
+# demand by reserve() and by sales that find only held stock left.
+RESERVATION_TTL_SECONDS = int(os.getenv("CRM_RESERVATION_TTL", 900))
+MAX_RESERVATION_TTL = 24 * 3600
+SWEEP_BATCH_SIZE = 500
+
+INSERT_RESERVATION_SQL = """
+    INSERT INTO Vehicle_reservation (token, vehicle_id, expires_at)
+    VALUES (%s, %s, NOW() + INTERVAL %s SECOND)
+"""
+
+
+@dataclass(frozen=True)
+class Reservation:
+    """A live hold on one unit of a vehicle"""
+    token: str
+    vehicle_id: int
+    expires_at: datetime
+
+
+def _set_reserved(cursor, vehicle: inventory.VehicleForSale, reserved: int) -> bool:
+    status = inventory.next_status(vehicle.status, vehicle.stock, reserved)
+    cursor.execute(inventory.SET_RESERVED_SQL, (reserved, status, vehicle.vehicle_id, vehicle.version))
+    if cursor.rowcount == 0:
+        return False
+    kpi.record(cursor, **inventory.status_deltas(vehicle, vehicle.stock, status))
+    return True
+
+
+def reserve(vehicle_id: int, ttl_seconds: int = RESERVATION_TTL_SECONDS) -> Reservation:
+    """Hold one unreserved unit of a vehicle; pass the token to create_customer to buy it"""
+    ttl_seconds = max(1, min(int(ttl_seconds), MAX_RESERVATION_TTL))
+    token = uuid.uuid4().hex
+
+    def change(vehicle: inventory.VehicleForSale) -> Optional[bool]:
+        if vehicle.free_stock <= 0:
+            return None
+        return _set_reserved(cursor, vehicle, vehicle.reserved + 1)
+
+    with db.get_connection() as conn:
+        cursor = conn.statement_cursor()
+        outcome = inventory.with_vehicle_version(conn, cursor, vehicle_id, change)
+        if outcome.vehicle is None:
+            raise customers.VehicleNotFoundError("Selected vehicle not found.")
+        if not outcome.applied and outcome.vehicle.reserved > 0:
+            conn.rollback()
+            if release_expired(conn, vehicle_id):
+                outcome = inventory.with_vehicle_version(conn, cursor, vehicle_id, change)
+        if not outcome.applied:
+            raise customers.OutOfStockError("Vehicle has no unreserved stock.")
+
+        cursor.execute(INSERT_RESERVATION_SQL, (token, vehicle_id, ttl_seconds))
+        cursor.execute("SELECT expires_at FROM Vehicle_reservation WHERE token = %s", (token,))
+        expires_at = cursor.fetchone()[0]
+        table_versions.bump(cursor, "Vehicle")
+        conn.commit()
+        cursor.close()
+
+    cache.invalidate("Vehicle")
+    logger.info(f"Reserved a unit of vehicle {vehicle_id} until {expires_at}")
+    return Reservation(token, vehicle_id, expires_at)
+
+
+def _release(conn, token: str) -> bool:
+    cursor = conn.cursor(buffered=True)
+    cursor.execute("SELECT vehicle_id FROM Vehicle_reservation WHERE token = %s", (token,))
+    row = cursor.fetchone()
+    if row is None:
+        conn.rollback()
+        return False
+
+    def change(vehicle: inventory.VehicleForSale) -> Optional[bool]:
+        # Deleting first serialises with a sale claiming the same hold
+        cursor.execute("DELETE FROM Vehicle_reservation WHERE token = %s", (token,))
+        if cursor.rowcount == 0:
+            return None
+        return _set_reserved(cursor, vehicle, max(vehicle.reserved - 1, 0))
+
+    outcome = inventory.with_vehicle_version(conn, cursor, row[0], change)
+    if outcome.applied:
+        table_versions.bump(cursor, "Vehicle")
+        conn.commit()
+    else:
+        conn.rollback()
+    cursor.close()
+    return outcome.applied
+
+
+def release(token: str) -> bool:
+    """Give a held unit back to stock; False if the hold no longer exists"""
+    with db.get_connection() as conn:
+        released = _release(conn, token)
+    if released:
+        cache.invalidate("Vehicle")
+    return released
+
+
+def release_expired(conn, vehicle_id: Optional[int] = None, limit: int = SWEEP_BATCH_SIZE) -> int:
+    """sweep_expired on a connection the caller already holds, between its transactions
+
+    Commits each release, so the caller must not have uncommitted work.
+    """
+    sql = "SELECT token FROM Vehicle_reservation WHERE expires_at <= NOW()"
+    params: List = []
+    if vehicle_id is not None:
+        sql += " AND vehicle_id = %s"
+        params.append(vehicle_id)
+    sql += " ORDER BY expires_at LIMIT %s"
+    params.append(limit)
+
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    tokens = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.rollback()  # end the read snapshot before the versioned releases
+    released = sum(_release(conn, token) for token in tokens)
+
+    if released:
+        cache.invalidate("Vehicle")
+        logger.info(f"Released {released} expired vehicle hold(s)")
+    return released
+
+
+def sweep_expired(vehicle_id: Optional[int] = None, limit: int = SWEEP_BATCH_SIZE) -> int:
+    """Release up to limit expired holds, optionally for one vehicle; returns how many"""
+    with db.get_connection() as conn:
+        return release_expired(conn, vehicle_id, limit)
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="CRM vehicle holds")
+    parser.add_argument("command", choices=["sweep"])
+    parser.add_argument("--limit", type=int, default=SWEEP_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"Released {sweep_expired(limit=args.limit)} expired hold(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import logging
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+
+import cache
+import db
+
+logger = logging.getLogger(__name__)
+
+# --- Sales Rollups ---
+# Sales totals per day x vehicle and per day x manufacturer, updated by the
+# sale transaction itself, so revenue reports read one row per day and key
+# instead of aggregating Sales. Manufacturer rows are split into slots (as in
+# kpi.py) because every sale of a brand on one day would otherwise update the
+# same row; a vehicle's row is already serialised by its stock compare-and-swap.
+MANUFACTURER_SLOTS = 8
+FIRST_DATE, LAST_DATE = date(1000, 1, 1), date(9999, 12, 31)  # MySQL DATE range
+BACKFILL_CHUNK_DAYS = 31
+DEFAULT_TREND_DAYS = 90
+MAX_TREND_DAYS = 3660
+
+# Start of the period each day falls in; all DATE arithmetic, so no % to escape
+GRANULARITIES = {
+    "day": "r.sale_date",
+    "week": "r.sale_date - INTERVAL WEEKDAY(r.sale_date) DAY",
+    "month": "r.sale_date - INTERVAL (DAYOFMONTH(r.sale_date) - 1) DAY",
+}
+
+RECORD_VEHICLE_SQL = """
+    INSERT INTO Sales_daily_vehicle (sale_date, vehicle_id, sales_count, revenue)
+    VALUES (CURDATE(), %s, 1, %s)
+    ON DUPLICATE KEY UPDATE sales_count = sales_count + 1, revenue = revenue + %s
+"""
+
+RECORD_MANUFACTURER_SQL = """
+    INSERT INTO Sales_daily_manufacturer (sale_date, manufacturer, slot, sales_count, revenue)
+    VALUES (CURDATE(), %s, %s, 1, %s)
+    ON DUPLICATE KEY UPDATE sales_count = sales_count + 1, revenue = revenue + %s
+"""
+
+TREND_SQL = """
+    SELECT {period} AS period, SUM(r.sales_count) AS sales_count, SUM(r.revenue) AS revenue
+    FROM {table} r
+    WHERE r.sale_date BETWEEN %s AND %s{filter}
+    GROUP BY period
+    ORDER BY period
+"""
+
+
+@dataclass(frozen=True)
+class TrendPoint:
+    """Sales in one day, week or month"""
+    period: date  # first day of the period
+    sales_count: int
+    revenue: Decimal
+
+
+def record_sale(cursor, vehicle_id: int, manufacturer: str, amount: Optional[Decimal]):
+    """Add one sale made today to both rollups inside the caller's transaction"""
+    amount = amount or Decimal(0)
+    cursor.execute(RECORD_VEHICLE_SQL, (vehicle_id, amount, amount))
+    cursor.execute(RECORD_MANUFACTURER_SQL, (manufacturer, random.randrange(MANUFACTURER_SLOTS), amount, amount))
+
+
+def rebuild(cursor, start: date = FIRST_DATE, end: date = LAST_DATE):
+    """Recompute both rollups for sale dates in [start, end] from Sales"""
+    cursor.execute("DELETE FROM Sales_daily_vehicle WHERE sale_date BETWEEN %s AND %s", (start, end))
+    cursor.execute("""
+        INSERT INTO Sales_daily_vehicle (sale_date, vehicle_id, sales_count, revenue)
+        SELECT sale_date, vehicle_id, COUNT(*), COALESCE(SUM(sale_amount), 0)
+        FROM Sales
+        WHERE sale_date BETWEEN %s AND %s
+        GROUP BY sale_date, vehicle_id
+    """, (start, end))
+    cursor.execute("DELETE FROM Sales_daily_manufacturer WHERE sale_date BETWEEN %s AND %s", (start, end))
+    cursor.execute("""
+        INSERT INTO Sales_daily_manufacturer (sale_date, manufacturer, slot, sales_count, revenue)
+        SELECT r.sale_date, v.manufacturer, 0, SUM(r.sales_count), SUM(r.revenue)
+        FROM Sales_daily_vehicle r
+        JOIN Vehicle v ON v.vehicle_id = r.vehicle_id
+        WHERE r.sale_date BETWEEN %s AND %s
+        GROUP BY r.sale_date, v.manufacturer
+    """, (start, end))
+
+
+def backfill(since: Optional[date] = None, chunk_days: int = BACKFILL_CHUNK_DAYS) -> int:
+    """Rebuild the rollups from Sales a chunk of days per transaction; returns the chunks"""
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(sale_date), MAX(sale_date) FROM Sales")
+        first, last = cursor.fetchone()
+        cursor.close()
+        conn.commit()
+    if first is None:
+        logger.info("No sales to roll up")
+        return 0
+
+    start = max(first, since) if since else first
+    last = max(last, date.today())
+    chunks = 0
+    while start <= last:
+        end = min(start + timedelta(days=chunk_days - 1), last)
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            rebuild(cursor, start, end)
+            conn.commit()
+            cursor.close()
+        logger.info(f"Rolled up sales from {start} to {end}")
+        chunks += 1
+        start = end + timedelta(days=1)
+    cache.invalidate("Sales")
+    return chunks
+
+
+# --- Reports ---
+def trend_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """Default and validate a report's date range"""
+    end = end or date.today()
+    start = start or end - timedelta(days=DEFAULT_TREND_DAYS - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days >= MAX_TREND_DAYS:
+        raise ValueError(f"A trend covers at most {MAX_TREND_DAYS} days")
+    return start, end
+
+
+@cache.cached("sales_trend", ttl=60, tables=("Sales",))
+def sales_trend(granularity: str = "day", start: Optional[date] = None, end: Optional[date] = None,
+                manufacturer: Optional[str] = None, vehicle_id: Optional[int] = None) -> List[TrendPoint]:
+    """Sales count and revenue per period, optionally for one manufacturer or vehicle"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    start, end = trend_range(start, end)
+
+    params: List[Any] = [start, end]
+    if vehicle_id is not None:
+        table, condition = "Sales_daily_vehicle", " AND r.vehicle_id = %s"
+        params.append(int(vehicle_id))
+    elif manufacturer:
+        table, condition = "Sales_daily_manufacturer", " AND r.manufacturer = %s"
+        params.append(manufacturer)
+    else:
+        table, condition = "Sales_daily_manufacturer", ""
+    sql = TREND_SQL.format(period=GRANULARITIES[granularity], table=table, filter=condition)
+
+    with db.get_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    return [TrendPoint(period, int(count), Decimal(revenue)) for period, count, revenue in rows]
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Daily sales rollups")
+    parser.add_argument("command", choices=["backfill", "trend"])
+    parser.add_argument("--since", type=date.fromisoformat, help="backfill: only rebuild from this date")
+    parser.add_argument("--granularity", choices=list(GRANULARITIES), default="month")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "backfill":
+        print(f"Rebuilt sales rollups in {backfill(args.since)} chunk(s)")
+    else:
+        start = date.today() - timedelta(days=365)
+        for point in sales_trend(args.granularity, start):
+            print(f"{point.period}  {point.sales_count:>8}  {point.revenue:>16,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+import argparse
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from mysql.connector import Error
+
+import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_NAME = "crm_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 60  # seconds another process may hold the migration lock
+
+
+# --- Migration Registry ---
+# Each migration runs exactly once per database and is recorded in schema_version.
+# MySQL DDL commits implicitly, so migrations must be safe to re-run if a process
+# dies between applying the change and recording it. A shipped migration is
+# frozen: backfills are written out here rather than calling the live rebuild
+# helpers, so later changes to those cannot alter what an old migration does.
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+
+def migration(version: int, description: str):
+    """Register a schema migration under a unique, increasing version number"""
+    def register(func: Callable) -> Callable:
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return register
+
+
+def _column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = %s
+        AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = %s
+        AND INDEX_NAME = %s
+    """, (table, index))
+    return cursor.fetchone()[0] > 0
+
+
+# --- Migrations ---
+@migration(1, "Create base CRM tables")
+def _create_base_tables(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Customer (
+        customer_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        email_id VARCHAR(100),
+        phone_number VARCHAR(15) UNIQUE NOT NULL,
+        model_purchased VARCHAR(100),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Vehicle (
+        vehicle_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        manufacturer VARCHAR(50) NOT NULL,
+        model VARCHAR(50) NOT NULL,
+        year INT NOT NULL,
+        price DECIMAL(12,2) NOT NULL,
+        stock INT DEFAULT 5,
+        status ENUM('Available', 'Sold', 'Reserved') DEFAULT 'Available',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_status (status),
+        INDEX idx_model (manufacturer, model)
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Interactions (
+        interaction_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        customer_id BIGINT,
+        vehicle_id BIGINT,
+        date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        type TEXT,
+        notes TEXT,
+        FOREIGN KEY (customer_id) REFERENCES Customer(customer_id) ON DELETE CASCADE,
+        FOREIGN KEY (vehicle_id) REFERENCES Vehicle(vehicle_id) ON DELETE SET NULL
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Follow_ups (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        customer_id BIGINT NOT NULL,
+        follow_up_date TIMESTAMP NOT NULL,
+        reason TEXT NOT NULL,
+        completed BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (customer_id) REFERENCES Customer(customer_id) ON DELETE CASCADE
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Sales (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        customer_id BIGINT NOT NULL,
+        vehicle_id BIGINT NOT NULL,
+        sale_date DATE NOT NULL,
+        payment_status ENUM('Pending', 'Partial', 'Completed') DEFAULT 'Pending',
+        sale_amount DECIMAL(12,2),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (customer_id) REFERENCES Customer(customer_id) ON DELETE CASCADE,
+        FOREIGN KEY (vehicle_id) REFERENCES Vehicle(vehicle_id) ON DELETE CASCADE
+    )
+    """)
+
+
+@migration(2, "Seed sample vehicle inventory")
+def _seed_vehicles(cursor):
+    cursor.execute("SELECT COUNT(*) FROM Vehicle")
+    if cursor.fetchone()[0] > 0:
+        return
+
+    vehicle_data = [
+        ("Ford", "Mustang", 2020, 2750000.00, "Available"),
+        ("Tata", "Altroz", 2023, 1200000.00, "Available"),
+        ("Tata", "Nexon", 2023, 1350000.00, "Available"),
+        ("Tata", "Tiago", 2023, 1100000.00, "Available"),
+        ("Toyota", "Urban Cruiser Taisor", 2023, 1700000.00, "Available"),
+        ("Toyota", "Glanza", 2023, 1600000.00, "Available"),
+        ("Hyundai", "Creta", 2022, 2100000.00, "Available"),
+        ("Mahindra", "XUV700", 2023, 2600000.00, "Available"),
+        ("Kia", "Seltos", 2020, 1950000.00, "Available"),
+        ("Nissan", "Magnite", 2022, 1650000.00, "Available"),
+        ("Toyota", "Vellfire", 2023, 3500000.00, "Available"),
+        ("Renault", "Triber", 2023, 1250000.00, "Available"),
+        ("Kia", "EV9", 2023, 4000000.00, "Available")
+    ]
+    cursor.executemany("""
+        INSERT INTO Vehicle (manufacturer, model, year, price, status)
+        VALUES (%s, %s, %s, %s, %s)
+    """, vehicle_data)
+
+
+@migration(3, "Link customers to vehicles")
+def _add_customer_vehicle_link(cursor):
+    if not _column_exists(cursor, "Customer", "vehicle_id"):
+        cursor.execute("ALTER TABLE Customer ADD COLUMN vehicle_id BIGINT NULL")
+
+    if not _column_exists(cursor, "Customer", "updated_at"):
+        cursor.execute("""
+            ALTER TABLE Customer
+            ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        """)
+
+    if not _index_exists(cursor, "Customer", "idx_vehicle"):
+        cursor.execute("CREATE INDEX idx_vehicle ON Customer(vehicle_id)")
+
+
+@migration(4, "Index customers for keyset pagination")
+def _add_customer_created_index(cursor):
+    if not _index_exists(cursor, "Customer", "idx_customer_created"):
+        cursor.execute("CREATE INDEX idx_customer_created ON Customer(created_at, customer_id)")
+
+
+@migration(5, "Full-text index for customer search")
+def _add_customer_search_index(cursor):
+    if not _index_exists(cursor, "Customer", "ft_customer_name_email"):
+        cursor.execute("CREATE FULLTEXT INDEX ft_customer_name_email ON Customer(name, email_id)")
+
+
+@migration(6, "Maintain per model-year stock totals")
+def _add_vehicle_stock_totals(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Vehicle_stock (
+        manufacturer VARCHAR(50) NOT NULL,
+        model VARCHAR(50) NOT NULL,
+        year INT NOT NULL,
+        total_stock INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (manufacturer, model, year)
+    )
+    """)
+
+    if not _index_exists(cursor, "Vehicle", "idx_model_year"):
+        cursor.execute("CREATE INDEX idx_model_year ON Vehicle(manufacturer, model, year)")
+    if _index_exists(cursor, "Vehicle", "idx_model"):
+        cursor.execute("DROP INDEX idx_model ON Vehicle")  # prefix of idx_model_year
+
+    cursor.execute("DELETE FROM Vehicle_stock")
+    cursor.execute("""
+        INSERT INTO Vehicle_stock (manufacturer, model, year, total_stock)
+        SELECT manufacturer, model, year, COALESCE(SUM(stock), 0)
+        FROM Vehicle
+        GROUP BY manufacturer, model, year
+    """)
+
+
+@migration(7, "Index created_at for incremental table exports")
+def _add_created_at_indexes(cursor):
+    for table, key, index in (("Vehicle", "vehicle_id", "idx_vehicle_created"),
+                              ("Follow_ups", "id", "idx_followups_created"),
+                              ("Sales", "id", "idx_sales_created")):
+        if not _index_exists(cursor, table, index):
+            cursor.execute(f"CREATE INDEX {index} ON {table}(created_at, {key})")
+
+
+@migration(8, "Dashboard KPI summary counters")
+def _add_dashboard_summary(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Dashboard_summary (
+        slot TINYINT PRIMARY KEY,
+        total_customers BIGINT NOT NULL DEFAULT 0,
+        customers_with_vehicles BIGINT NOT NULL DEFAULT 0,
+        sales_count BIGINT NOT NULL DEFAULT 0,
+        total_sales_value DECIMAL(18,2) NOT NULL DEFAULT 0,
+        vehicles_total BIGINT NOT NULL DEFAULT 0,
+        vehicles_available BIGINT NOT NULL DEFAULT 0,
+        vehicles_sold BIGINT NOT NULL DEFAULT 0,
+        vehicle_price_sum DECIMAL(18,2) NOT NULL DEFAULT 0
+    )
+    """)
+    cursor.execute("DELETE FROM Dashboard_summary")
+    cursor.executemany("INSERT INTO Dashboard_summary (slot) VALUES (%s)", [(slot,) for slot in range(16)])
+    cursor.execute("""
+        UPDATE Dashboard_summary d
+        CROSS JOIN (
+            SELECT
+                COUNT(*) AS total_customers,
+                COALESCE(SUM(vehicle_id IS NOT NULL OR model_purchased IS NOT NULL), 0) AS customers_with_vehicles
+            FROM Customer
+        ) c
+        CROSS JOIN (
+            SELECT COUNT(*) AS sales_count, COALESCE(SUM(sale_amount), 0) AS total_sales_value
+            FROM Sales
+        ) s
+        CROSS JOIN (
+            SELECT
+                COUNT(*) AS vehicles_total,
+                COALESCE(SUM(stock > 0 AND status = 'Available'), 0) AS vehicles_available,
+                COALESCE(SUM(stock <= 0 OR status = 'Sold'), 0) AS vehicles_sold,
+                COALESCE(SUM(price), 0) AS vehicle_price_sum
+            FROM Vehicle
+        ) v
+        SET d.total_customers = c.total_customers,
+            d.customers_with_vehicles = c.customers_with_vehicles,
+            d.sales_count = s.sales_count,
+            d.total_sales_value = s.total_sales_value,
+            d.vehicles_total = v.vehicles_total,
+            d.vehicles_available = v.vehicles_available,
+            d.vehicles_sold = v.vehicles_sold,
+            d.vehicle_price_sum = v.vehicle_price_sum
+        WHERE d.slot = 0
+    """)
+
+
+@migration(9, "Index open follow-ups by due date")
+def _add_follow_up_queue_index(cursor):
+    if not _index_exists(cursor, "Follow_ups", "idx_followups_queue"):
+        cursor.execute("CREATE INDEX idx_followups_queue ON Follow_ups(completed, follow_up_date, id)")
+
+
+@migration(10, "Versioned vehicle stock and reservations")
+def _add_vehicle_reservations(cursor):
+    if not _column_exists(cursor, "Vehicle", "version"):
+        cursor.execute("ALTER TABLE Vehicle ADD COLUMN version INT NOT NULL DEFAULT 0")
+    if not _column_exists(cursor, "Vehicle", "reserved"):
+        cursor.execute("ALTER TABLE Vehicle ADD COLUMN reserved INT NOT NULL DEFAULT 0")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Vehicle_reservation (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        token CHAR(32) NOT NULL UNIQUE,
+        vehicle_id BIGINT NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_reservation_expiry (expires_at),
+        INDEX idx_reservation_vehicle (vehicle_id, expires_at),
+        FOREIGN KEY (vehicle_id) REFERENCES Vehicle(vehicle_id) ON DELETE CASCADE
+    )
+    """)
+
+
+@migration(11, "Daily sales rollups by vehicle and manufacturer")
+def _add_sales_rollups(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Sales_daily_vehicle (
+        sale_date DATE NOT NULL,
+        vehicle_id BIGINT NOT NULL,
+        sales_count INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(18,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (sale_date, vehicle_id),
+        INDEX idx_sales_daily_vehicle (vehicle_id, sale_date)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Sales_daily_manufacturer (
+        sale_date DATE NOT NULL,
+        manufacturer VARCHAR(50) NOT NULL,
+        slot TINYINT NOT NULL DEFAULT 0,
+        sales_count INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(18,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (sale_date, manufacturer, slot),
+        INDEX idx_sales_daily_manufacturer (manufacturer, sale_date)
+    )
+    """)
+    cursor.execute("DELETE FROM Sales_daily_vehicle")
+    cursor.execute("""
+        INSERT INTO Sales_daily_vehicle (sale_date, vehicle_id, sales_count, revenue)
+        SELECT sale_date, vehicle_id, COUNT(*), COALESCE(SUM(sale_amount), 0)
+        FROM Sales
+        GROUP BY sale_date, vehicle_id
+    """)
+    cursor.execute("DELETE FROM Sales_daily_manufacturer")
+    cursor.execute("""
+        INSERT INTO Sales_daily_manufacturer (sale_date, manufacturer, slot, sales_count, revenue)
+        SELECT r.sale_date, v.manufacturer, 0, SUM(r.sales_count), SUM(r.revenue)
+        FROM Sales_daily_vehicle r
+        JOIN Vehicle v ON v.vehicle_id = r.vehicle_id
+        GROUP BY r.sale_date, v.manufacturer
+    """)
+
+
+@migration(12, "Customer counts on Vehicle")
+def _add_vehicle_customer_counts(cursor):
+    if not _column_exists(cursor, "Vehicle", "customers_assigned"):
+        cursor.execute("ALTER TABLE Vehicle ADD COLUMN customers_assigned INT NOT NULL DEFAULT 0")
+    cursor.execute("UPDATE Vehicle SET customers_assigned = 0 WHERE customers_assigned <> 0")
+    cursor.execute("""
+        UPDATE Vehicle v
+        JOIN (
+            SELECT vehicle_id, COUNT(*) AS assigned
+            FROM Customer
+            WHERE vehicle_id IS NOT NULL
+            GROUP BY vehicle_id
+        ) c ON c.vehicle_id = v.vehicle_id
+        SET v.customers_assigned = c.assigned
+    """)
+
+
+@migration(13, "Table change versions for HTTP validators")
+def _add_table_versions(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Table_version (
+        table_name VARCHAR(64) NOT NULL,
+        slot TINYINT NOT NULL,
+        version BIGINT NOT NULL DEFAULT 0,
+        changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (table_name, slot)
+    )
+    """)
+    cursor.executemany(
+        "INSERT IGNORE INTO Table_version (table_name, slot) VALUES (%s, %s)",
+        [(table, slot) for table in ("Customer", "Vehicle", "Follow_ups", "Sales") for slot in range(16)]
+    )
+
+
+@migration(14, "Idempotency keys for API writes")
+def _add_idempotency_keys(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Idempotency_key (
+        idem_key VARCHAR(255) NOT NULL PRIMARY KEY,
+        fingerprint CHAR(64) NOT NULL,
+        status_code SMALLINT NOT NULL,
+        response TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        INDEX idx_idempotency_expiry (expires_at)
+    )
+    """)
+
+
+# --- Migration Runner ---
+def _ensure_version_table(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def _applied_versions(cursor) -> Dict[int, str]:
+    cursor.execute("SELECT version, description FROM schema_version")
+    return {version: description for version, description in cursor.fetchall()}
+
+
+def run_migrations() -> List[int]:
+    """Apply every pending migration and return the versions that were applied"""
+    applied_now = []
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise db.DatabaseError("Timed out waiting for the schema migration lock")
+        try:
+            _ensure_version_table(cursor)
+            applied = _applied_versions(cursor)
+
+            for version, description, apply in MIGRATIONS:
+                if version in applied:
+                    continue
+                logger.info(f"Applying schema migration {version}: {description}")
+                apply(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+                applied_now.append(version)
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+            cursor.fetchone()
+
+    if applied_now:
+        logger.info(f"Schema migrated to version {applied_now[-1]}")
+    return applied_now
+
+
+# --- Schema Capabilities ---
+@dataclass(frozen=True)
+class SchemaCapabilities:
+    """Columns present in the live schema, loaded once after migrations"""
+    version: int
+    columns: Dict[str, FrozenSet[str]]
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in self.columns.get(table, frozenset())
+
+    @property
+    def has_customer_vehicle_id(self) -> bool:
+        return self.has_column("Customer", "vehicle_id")
+
+
+def load_capabilities() -> SchemaCapabilities:
+    """Read the current schema version and column catalog in two queries"""
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        version = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+        """)
+        columns: Dict[str, set] = {}
+        for table, column in cursor.fetchall():
+            columns.setdefault(table, set()).add(column)
+    return SchemaCapabilities(
+        version=version,
+        columns={table: frozenset(cols) for table, cols in columns.items()}
+    )
+
+
+_capabilities: Optional[SchemaCapabilities] = None
+_capabilities_lock = threading.Lock()
+
+
+def ensure_schema() -> SchemaCapabilities:
+    """Migrate the database once per process and return the cached capabilities"""
+    global _capabilities
+    if _capabilities is None:
+        with _capabilities_lock:
+            if _capabilities is None:
+                run_migrations()
+                _capabilities = load_capabilities()
+    return _capabilities
+
+
+def reset_capabilities():
+    """Forget the cached capabilities so the next call re-reads the catalog"""
+    global _capabilities
+    with _capabilities_lock:
+        _capabilities = None
+
+
+# --- CLI ---
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="CRM database schema management")
+    parser.add_argument("command", choices=["migrate", "status"])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "migrate":
+        applied = run_migrations()
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    else:
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            _ensure_version_table(cursor)
+            applied = _applied_versions(cursor)
+        for version, description, _ in MIGRATIONS:
+            state = "applied" if version in applied else "pending"
+            print(f"{version:>4}  {state:<8} {description}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import base64
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import db
+import frames
+import schema
+
+logger = logging.getLogger(__name__)
+
+FETCH_BATCH_SIZE = int(os.getenv("CRM_STREAM_BATCH_SIZE", 500))
+MAX_PAGE_LIMIT = 100000
+
+# Tables that may be streamed, with the primary key used for keyset pagination
+STREAMABLE_TABLES = {
+    "Customer": "customer_id",
+    "Vehicle": "vehicle_id",
+    "Follow_ups": "id",
+    "Sales": "id",
+}
+CREATED_COLUMN = "created_at"
+
+
+class StreamRequestError(ValueError):
+    """Raised for table, column, cursor or filter arguments that cannot be served"""
+    pass
+
+
+@dataclass(frozen=True)
+class TableQuery:
+    """A validated, bounded read of one table"""
+    table: str
+    key: str
+    columns: Tuple[str, ...]
+    limit: Optional[int]
+    after: Optional[Tuple[Any, ...]]
+    since: Optional[datetime]
+
+    @property
+    def order_columns(self) -> Tuple[str, ...]:
+        # With a since filter, walk (created_at, pk) so the created_at index serves
+        # both the filter and the order; otherwise walk the primary key.
+        return (CREATED_COLUMN, self.key) if self.since else (self.key,)
+
+
+# --- Cursor Tokens ---
+def encode_cursor(values: Tuple[Any, ...]) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, with_created: bool) -> Tuple[Any, ...]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if with_created:
+            created_at, key = values
+            return datetime.fromisoformat(created_at), int(key)
+        (key,) = values
+        return (int(key),)
+    except (ValueError, TypeError) as e:
+        raise StreamRequestError(f"Invalid cursor: {e}")
+
+
+# --- Query Building ---
+def build_query(table: str, columns: Optional[List[str]] = None, limit: Optional[int] = None,
+                cursor: Optional[str] = None, since: Optional[str] = None) -> TableQuery:
+    """Validate request arguments against the live schema"""
+    if table not in STREAMABLE_TABLES:
+        raise StreamRequestError(f"Unknown table '{table}'")
+    key = STREAMABLE_TABLES[table]
+    available = schema.ensure_schema().columns.get(table, frozenset())
+
+    if columns:
+        unknown = [c for c in columns if c not in available]
+        if unknown:
+            raise StreamRequestError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+        selected = tuple(dict.fromkeys([key, *columns]))
+    else:
+        selected = tuple(sorted(available, key=lambda c: (c != key, c)))
+
+    if limit is not None and not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise StreamRequestError(f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+
+    since_at = None
+    if since:
+        try:
+            since_at = datetime.fromisoformat(since)
+        except ValueError:
+            raise StreamRequestError("since must be an ISO 8601 timestamp")
+
+    if since_at and CREATED_COLUMN not in selected:
+        selected = selected + (CREATED_COLUMN,)
+
+    after = decode_cursor(cursor, with_created=since_at is not None) if cursor else None
+    return TableQuery(table, key, selected, limit, after, since_at)
+
+
+def _sql(query: TableQuery) -> Tuple[str, List[Any]]:
+    where, params = [], []
+    if query.since:
+        where.append(f"`{CREATED_COLUMN}` >= %s")
+        params.append(query.since)
+    if query.after:
+        if query.since:
+            where.append(f"(`{CREATED_COLUMN}` > %s OR (`{CREATED_COLUMN}` = %s AND `{query.key}` > %s))")
+            params.extend([query.after[0], query.after[0], query.after[1]])
+        else:
+            where.append(f"`{query.key}` > %s")
+            params.append(query.after[0])
+
+    sql = f"SELECT {', '.join(f'`{c}`' for c in query.columns)} FROM `{query.table}`"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY " + ", ".join(f"`{c}`" for c in query.order_columns)
+    if query.limit:
+        sql += " LIMIT %s"
+        params.append(query.limit + 1)
+    return sql, params
+
+
+# --- Streaming ---
+def iter_rows(query: TableQuery, batch_size: int = FETCH_BATCH_SIZE) -> Iterator[dict]:
+    """Yield rows as dicts through an unbuffered cursor, fetchmany() at a time"""
+    sql, params = _sql(query)
+    with db.get_read_connection() as conn:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        finished = False
+        try:
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    finished = True
+                    break
+                for row in batch:
+                    yield dict(zip(names, row))
+        finally:
+            if finished or query.limit:
+                # At most the look-ahead row is left; draining keeps the connection reusable
+                cursor.fetchall()
+                cursor.close()
+            else:
+                # An unbounded stream abandoned mid-way (client gone): draining or
+                # closing the cursor would read the rest of the table, so the
+                # connection is shut unread and dropped from the pool instead
+                conn.discard()
+
+
+def stream_ndjson(query: TableQuery, dumps: Callable[[Any], str]) -> Iterator[str]:
+    """NDJSON lines for one page; a trailing {"next_cursor": ...} line marks more rows"""
+    sent = 0
+    last = None
+    for row in iter_rows(query):
+        if query.limit and sent == query.limit:
+            token = encode_cursor(tuple(last[c] for c in query.order_columns))
+            yield dumps({"next_cursor": token}) + "\n"
+            break
+        yield dumps(row) + "\n"
+        last = row
+        sent += 1
+
+
+def stream_arrow(query: TableQuery) -> Iterator[bytes]:
+    """Arrow IPC stream of every matching row, typed and batched by frames"""
+    sql, params = _sql(query)
+    with db.get_read_connection() as conn:
+        yield from frames.iter_arrow_stream(conn, sql, params)
+
+
+def stream_tables_json(tables: Iterable[str], dumps: Callable[[Any], str]) -> Iterator[str]:
+    """One JSON object {table: [rows...]} emitted incrementally, batch by batch"""
+    yield "{"
+    for i, table in enumerate(tables):
+        yield ("," if i else "") + dumps(table) + ":["
+        buffer: List[str] = []
+        first = True
+        for row in iter_rows(build_query(table)):
+            buffer.append(dumps(row))
+            if len(buffer) >= FETCH_BATCH_SIZE:
+                yield ("" if first else ",") + ",".join(buffer)
+                buffer, first = [], False
+        if buffer:
+            yield ("" if first else ",") + ",".join(buffer)
+        yield "]"
+    yield "}"
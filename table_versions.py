@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import cache
+import db
+
+logger = logging.getLogger(__name__)
+
+# --- Table Change Versions ---
+# Every write transaction to a tracked table bumps that table's version in
+# Table_version before it commits, so HTTP validators (ETag, Last-Modified)
+# come from a few dozen small rows instead of the tables themselves. Versions
+# are split into slots like the KPI counters (kpi.py) so concurrent writers
+# rarely wait on the same row; a table's version is the sum of its slots.
+TRACKED_TABLES = ("Customer", "Vehicle", "Follow_ups", "Sales")
+VERSION_SLOTS = 16
+# Validators are withheld until a change is this old: Last-Modified has whole
+# second resolution, and replicas may not have the change yet (cache.SETTLE_SECONDS)
+MIN_CHANGE_AGE = max(1.0, cache.SETTLE_SECONDS)
+
+BUMP_SQL = """
+    UPDATE Table_version
+    SET version = version + 1, changed_at = CURRENT_TIMESTAMP
+    WHERE slot = %s AND table_name IN ({names})
+"""
+
+SNAPSHOT_SQL = """
+    SELECT table_name, SUM(version), UNIX_TIMESTAMP(MAX(changed_at)), UNIX_TIMESTAMP()
+    FROM Table_version
+    WHERE table_name IN ({names})
+    GROUP BY table_name
+"""
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Versions of a set of tables at one moment"""
+    versions: Dict[str, int]
+    changed_at: float  # epoch seconds of the newest change to any of them
+    now: float  # database clock when read
+
+    @property
+    def etag(self) -> str:
+        state = ";".join(f"{table}={version}" for table, version in sorted(self.versions.items()))
+        return hashlib.sha1(state.encode()).hexdigest()[:20]
+
+    @property
+    def last_modified(self) -> datetime:
+        return datetime.fromtimestamp(int(self.changed_at), timezone.utc)
+
+    @property
+    def settled(self) -> bool:
+        return self.now - self.changed_at >= MIN_CHANGE_AGE
+
+
+def _check(tables: Iterable[str]) -> List[str]:
+    names = sorted(set(tables))
+    unknown = [t for t in names if t not in TRACKED_TABLES]
+    if unknown:
+        raise ValueError(f"Untracked table(s): {', '.join(unknown)}")
+    return names
+
+
+def bump(cursor, *tables: str):
+    """Record a change to tables inside the caller's transaction"""
+    names = _check(tables)
+    if not names:
+        return
+    cursor.execute(
+        BUMP_SQL.format(names=", ".join(["%s"] * len(names))),
+        (random.randrange(VERSION_SLOTS), *names)
+    )
+
+
+def seed(cursor):
+    """Create any missing version rows; existing versions are kept"""
+    cursor.executemany(
+        "INSERT IGNORE INTO Table_version (table_name, slot) VALUES (%s, %s)",
+        [(table, slot) for table in TRACKED_TABLES for slot in range(VERSION_SLOTS)]
+    )
+
+
+def snapshot(tables: Iterable[str]) -> Optional[Snapshot]:
+    """Current versions of tables from the primary; None if any is not tracked"""
+    names = sorted(set(tables))
+    if not names or any(t not in TRACKED_TABLES for t in names):
+        return None
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SNAPSHOT_SQL.format(names=", ".join(["%s"] * len(names))), names)
+        rows = cursor.fetchall()
+        cursor.close()
+    if len(rows) != len(names):
+        return None
+    return Snapshot(
+        versions={table: int(version) for table, version, _, _ in rows},
+        changed_at=max(float(changed_at) for _, _, changed_at, _ in rows),
+        now=float(rows[0][3]),
+    )